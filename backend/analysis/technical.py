@@ -2,20 +2,270 @@
 import pandas as pd
 import numpy as np
 
+# 可选加速：安装了 numba 时走单遍 JIT 内核，否则回退到 pandas 实现
+try:
+    from numba import njit, prange
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+
+if HAS_NUMBA:
+    @njit(cache=True)
+    def _sma_running(x, n, min_periods):
+        """滑动窗口求和：进一个、出一个；NaN 不计数（与 rolling().mean() 一致）"""
+        N = x.shape[0]
+        out = np.full(N, np.nan)
+        s = 0.0
+        cnt = 0
+        for i in range(N):
+            v = x[i]
+            if not np.isnan(v):
+                s += v
+                cnt += 1
+            if i >= n:
+                u = x[i - n]
+                if not np.isnan(u):
+                    s -= u
+                    cnt -= 1
+            if cnt >= min_periods:
+                out[i] = s / cnt
+        return out
+
+    @njit(cache=True)
+    def _tr_at(h, l, c, i):
+        """第 i 根的 TR；与 concat(...).max(axis=1) 相同：跳过 NaN 项取最大"""
+        tr = h[i] - l[i]
+        if i > 0:
+            a = abs(h[i] - c[i - 1])
+            b = abs(l[i] - c[i - 1])
+            if np.isnan(tr) or a > tr:
+                tr = a
+            if np.isnan(tr) or b > tr:
+                tr = b
+        return tr
+
+    @njit(cache=True)
+    def _atr_running(h, l, c, n, min_periods):
+        """TR 逐根内联计算 + 环形缓冲维护窗口和，一遍扫描得到 SMA(TR)"""
+        N = h.shape[0]
+        out = np.full(N, np.nan)
+        tr_buf = np.full(n, np.nan)
+        s = 0.0
+        cnt = 0
+        for i in range(N):
+            tr = _tr_at(h, l, c, i)
+            k = i % n
+            u = tr_buf[k]
+            if not np.isnan(u):
+                s -= u
+                cnt -= 1
+            tr_buf[k] = tr
+            if not np.isnan(tr):
+                s += tr
+                cnt += 1
+            if cnt >= min_periods:
+                out[i] = s / cnt
+        return out
+
+    @njit(cache=True)
+    def _atr_wilder(h, l, c, n, min_periods):
+        """TR 逐根内联 + Wilder 递推，语义同 ewm(alpha=1/n, adjust=False, min_periods)"""
+        N = h.shape[0]
+        out = np.full(N, np.nan)
+        # 同 pandas：alpha 先换算成 com 再换回，与 1/n 可能差 1ulp，照做以逐位一致
+        alpha = 1.0 / n
+        alpha = 1.0 / (1.0 + (1.0 - alpha) / alpha)
+        old_wt_factor = 1.0 - alpha
+        weighted = np.nan
+        old_wt = 1.0
+        nobs = 0
+        for i in range(N):
+            tr = _tr_at(h, l, c, i)
+            is_obs = not np.isnan(tr)
+            if is_obs:
+                nobs += 1
+            if not np.isnan(weighted):
+                # 缺失值期间旧权重继续衰减（ignore_na=False）
+                old_wt *= old_wt_factor
+                if is_obs:
+                    if weighted != tr:
+                        weighted = (old_wt * weighted + alpha * tr) / (old_wt + alpha)
+                    old_wt = 1.0
+            elif is_obs:
+                weighted = tr
+            if nobs >= min_periods:
+                out[i] = weighted
+        return out
+
+    # 导入时预热，避免首个请求承担编译开销
+    _warm = np.ones(2)
+    _sma_running(_warm, 2, 2)
+    _atr_running(_warm, _warm, _warm, 2, 2)
+    _atr_wilder(_warm, _warm, _warm, 2, 2)
+    del _warm
+
+    @njit(cache=True, parallel=True)
+    def _atr_wilder_rows(H, L, C, n, min_periods):
+        """(N, T) 按行并行跑 _atr_wilder，逐行结果与单序列调用逐位一致"""
+        out = np.empty(H.shape)
+        for r in prange(H.shape[0]):
+            out[r] = _atr_wilder(H[r], L[r], C[r], n, min_periods)
+        return out
+
+
+def _prefix_sums(x: np.ndarray):
+    """前缀和与有效计数（NaN 视为缺失），供多个窗口共享"""
+    valid = ~np.isnan(x)
+    cs = np.concatenate(([0.0], np.cumsum(np.where(valid, x, 0.0))))
+    cn = np.concatenate(([0], np.cumsum(valid)))
+    return cs, cn
+
+
+def _window_mean(cs: np.ndarray, cn: np.ndarray, n: int, min_periods: int) -> np.ndarray:
+    N = cs.shape[0] - 1
+    lo = np.maximum(np.arange(1, N + 1) - n, 0)
+    s = cs[1:] - cs[lo]
+    cnt = cn[1:] - cn[lo]
+    out = np.full(N, np.nan)
+    ok = cnt >= min_periods
+    out[ok] = s[ok] / cnt[ok]
+    return out
+
+
+def _rolling_mean(x: np.ndarray, n: int, min_periods: int) -> np.ndarray:
+    """基于累积和的滑动均值；NaN 不计数，语义同 rolling(n, min_periods).mean()"""
+    cs, cn = _prefix_sums(x)
+    return _window_mean(cs, cn, n, min_periods)
+
+
 def ma(series: pd.Series, n: int) -> pd.Series:
+    if HAS_NUMBA:
+        out = _sma_running(series.to_numpy(dtype=np.float64), n, max(2, n//2))
+        return pd.Series(out, index=series.index, name=series.name)
     return series.rolling(n, min_periods=max(2, n//2)).mean()
 
-def atr(df: pd.DataFrame, n: int = 14) -> pd.Series:
-    """df 需含: high, low, close"""
-    high, low, close = df["high"], df["low"], df["close"]
-    prev_close = close.shift(1)
-    tr = pd.concat([
-        (high - low),
-        (high - prev_close).abs(),
-        (low - prev_close).abs()
-    ], axis=1).max(axis=1)
-    return tr.rolling(n, min_periods=max(2, n//2)).mean()
-
-def pct(a: float, b: float) -> float:
-    if b == 0: return 0.0
-    return (a - b) / b
+def ma_many(series: pd.Series, ns) -> dict:
+    """
+    同一序列的多条均线一次算出：{n: ma(series, n)}
+    共享一次前缀和，每个窗口只做 O(N) 差分，避免对同一序列反复 rolling
+    """
+    cs, cn = _prefix_sums(series.to_numpy(dtype=np.float64))
+    return {
+        n: pd.Series(_window_mean(cs, cn, n, max(2, n//2)), index=series.index, name=series.name)
+        for n in ns
+    }
+
+def ma_tail(x, n: int, k: int = 1) -> np.ndarray:
+    """
+    只算 ma(series, n) 的最后 k 个值（口径相同：NaN 不计数，min_periods=max(2, n//2)）
+    供只读末几根均线的调用方使用，免去整列滑动；与整列结果可能有末位舍入差异
+    x 可为 (T,) 或按行堆叠的 (N, T)，结果形状为 (..., k)；逐行结果与单独调用一致
+    """
+    x = np.asarray(x, dtype=np.float64)
+    T = x.shape[-1]
+    minp = max(2, n//2)
+    k = min(k, T)
+    out = np.full(x.shape[:-1] + (k,), np.nan)
+    for j in range(k):
+        end = T - k + j + 1
+        w = x[..., max(0, end - n):end]
+        valid = ~np.isnan(w)
+        cnt = valid.sum(axis=-1)
+        tot = np.where(valid, w, 0.0).sum(axis=-1)
+        np.divide(tot, cnt, out=out[..., j], where=(cnt >= minp))
+    return out
+
+def _true_range(df: pd.DataFrame) -> np.ndarray:
+    h = df["high"].to_numpy(dtype=np.float64)
+    l = df["low"].to_numpy(dtype=np.float64)
+    c = df["close"].to_numpy(dtype=np.float64)
+    pc = np.empty_like(c)
+    pc[:1] = np.nan
+    pc[1:] = c[:-1]
+    # 预分配两块缓冲，ufunc 全部写回 out=，不再产生中间数组
+    tr = np.subtract(h, l)
+    tmp = np.subtract(h, pc)
+    np.abs(tmp, out=tmp)
+    # fmax 跳过 NaN，首根 TR 仍为 high-low（与 concat(...).max(axis=1) 一致）
+    np.fmax(tr, tmp, out=tr)
+    np.subtract(l, pc, out=tmp)
+    np.abs(tmp, out=tmp)
+    np.fmax(tr, tmp, out=tr)
+    return tr
+
+def atr(df: pd.DataFrame, n: int = 14, method: str = "rma") -> pd.Series:
+    """
+    df 需含: high, low, close
+    method:
+      - "rma"（默认）：Wilder 平滑，等价 ewm(alpha=1/n, adjust=False)，前 n-1 根为 NaN；
+        单次递推 O(N)，与 TradingView / pandas-ta 口径一致
+      - "sma"：旧口径，TR 的简单滑动均值（min_periods=max(2, n//2)），保留以兼容历史数值
+    """
+    if method not in ("rma", "sma"):
+        raise ValueError(f"unknown atr method: {method}")
+    if HAS_NUMBA:
+        kernel = _atr_wilder if method == "rma" else _atr_running
+        out = kernel(
+            df["high"].to_numpy(dtype=np.float64),
+            df["low"].to_numpy(dtype=np.float64),
+            df["close"].to_numpy(dtype=np.float64),
+            n, n if method == "rma" else max(2, n//2)
+        )
+        return pd.Series(out, index=df.index)
+    tr = _true_range(df)
+    if method == "rma":
+        return pd.Series(tr, index=df.index).ewm(alpha=1.0 / n, adjust=False, min_periods=n).mean()
+    return pd.Series(_rolling_mean(tr, n, max(2, n//2)), index=df.index)
+
+def atr_rows(high, low, close, n: int = 14) -> np.ndarray:
+    """
+    多只标的的 rma ATR：high/low/close 为按行堆叠的 (N, T) 数组，返回 (N, T)
+    逐行结果与 atr(df_i, n) 一致；有 numba 时按行并行，否则在时间轴上递推、各行同时向量化推进
+    """
+    H = np.ascontiguousarray(high, dtype=np.float64)
+    L = np.ascontiguousarray(low, dtype=np.float64)
+    C = np.ascontiguousarray(close, dtype=np.float64)
+    if HAS_NUMBA:
+        return _atr_wilder_rows(H, L, C, n, n)
+
+    N, T = H.shape
+    PC = np.empty_like(C)
+    PC[:, :1] = np.nan
+    PC[:, 1:] = C[:, :-1]
+    tr = np.fmax(np.fmax(H - L, np.abs(H - PC)), np.abs(L - PC))
+
+    # 与 pandas ewm(alpha=1/n, adjust=False, min_periods=n) 同一递推（alpha 同样经 com 换算）
+    alpha = 1.0 / n
+    alpha = 1.0 / (1.0 + (1.0 - alpha) / alpha)
+    old_wt_factor = 1.0 - alpha
+    out = np.full((N, T), np.nan)
+    weighted = np.full(N, np.nan)
+    old_wt = np.ones(N)
+    nobs = np.zeros(N, dtype=np.int64)
+    for t in range(T):
+        cur = tr[:, t]
+        is_obs = ~np.isnan(cur)
+        nobs += is_obs
+        started = ~np.isnan(weighted)
+        old_wt = np.where(started, old_wt * old_wt_factor, old_wt)
+        upd = started & is_obs & (weighted != cur)
+        new = (old_wt * weighted + alpha * cur) / (old_wt + alpha)
+        weighted = np.where(upd, new, weighted)
+        old_wt = np.where(started & is_obs, 1.0, old_wt)
+        weighted = np.where(~started & is_obs, cur, weighted)
+        out[:, t] = np.where(nobs >= n, weighted, np.nan)
+    return out
+
+def pct_scalar(a: float, b: float) -> float:
+    return 0.0 if b == 0 else (a - b) / b
+
+# 兼容旧名
+pct = pct_scalar
+
+def pct_arr(a, b) -> np.ndarray:
+    """向量化 pct：逐元素 (a-b)/b，b==0 处为 0.0"""
+    a = np.asarray(a, dtype=np.float64)
+    b = np.asarray(b, dtype=np.float64)
+    out = np.zeros(np.broadcast(a, b).shape)
+    return np.divide(a - b, b, out=out, where=(b != 0))
@@ -1,4 +1,7 @@
 # -*- coding: utf-8 -*-
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import numpy as np
 from flask import Blueprint, jsonify, request
 from datetime import datetime, timedelta
 from backend.core.macro_filter import MacroFilter
@@ -8,29 +11,38 @@ from backend.core.entry_signals import evaluate_signal, build_trade_plan
 from backend.core.risk_manager import RiskManager
 from backend.core.sentry import MarketSentry
 from backend.data.fetcher import get_ohlcv
+from backend.config.settings import thresholds_version
 
 api_bp = Blueprint("api", __name__)
 
+@lru_cache(maxsize=16)
+def _build(cls, version):
+    return cls.load_from_config()
+
+def _cached(cls):
+    """按阈值文件版本（各模块 load_from_config() 均读取该文件）复用实例；文件被修改后自动重建。"""
+    return _build(cls, thresholds_version())
+
 @api_bp.get("/health")
 def health():
     return {"status": "ok"}
 
 @api_bp.get("/macro/status")
 def macro_status():
-    mf = MacroFilter.load_from_config()
+    mf = _cached(MacroFilter)
     return jsonify(mf.evaluate())
 
 @api_bp.get("/sectors/rotation")
 def sectors_rotation():
     sector = request.args.get("sector", "AI")
-    rot = SectorRotation.load_from_config()
+    rot = _cached(SectorRotation)
     return jsonify(rot.evaluate(sector))
 
 @api_bp.get("/stocks/leaders")
 def stocks_leaders():
     stype = request.args.get("type", "first-line")
     sector = request.args.get("sector", "AI")
-    sel = StockSelector.load_from_config()
+    sel = _cached(StockSelector)
 
     if stype == "first-line":
         return jsonify(sel.identify_first_line(sector=sector))
@@ -39,25 +51,60 @@ def stocks_leaders():
     else:
         return jsonify({"error": "unknown type", "type": stype}), 400
 
+# 行情 payload 的缓存时长（秒）：当日 K 线盘中会变化，按时间桶过期
+_OHLCV_PAYLOAD_TTL = 300
+
+@lru_cache(maxsize=2048)
+def _ohlcv_payload(symbol: str, start: str, end: str, bucket: int) -> dict:
+    """拉取日线并转换为 evaluate_signal 的 ohlcv 格式（列式 NumPy 数组，日期在 C 层转字符串）"""
+    df = get_ohlcv(symbol, start, end)
+    payload = {
+        "t": np.datetime_as_string(df.index.values, unit="D"),
+        "o": df["open"].to_numpy(),
+        "h": df["high"].to_numpy(),
+        "l": df["low"].to_numpy(),
+        "c": df["close"].to_numpy(),
+        "v": df["volume"].to_numpy(),
+    }
+    # 缓存对象在请求间共享，置为只读防止被下游原地修改
+    for arr in payload.values():
+        arr.setflags(write=False)
+    return payload
+
+def _fetch_ohlcv_payload(symbol: str) -> dict:
+    """近 90 天日线的 ohlcv payload（同一交易日内按 _OHLCV_PAYLOAD_TTL 复用）"""
+    now = datetime.now()
+    end = now.strftime("%Y-%m-%d")
+    start = (now - timedelta(days=90)).strftime("%Y-%m-%d")
+    return _ohlcv_payload(symbol, start, end, int(now.timestamp() // _OHLCV_PAYLOAD_TTL))
+
 @api_bp.post("/trades/signal")
 def trade_signal():
     payload = request.get_json(silent=True) or {}
     symbol = payload.get("symbol")
     if symbol and not payload.get("ohlcv"):
-        end = datetime.now().strftime("%Y-%m-%d")
-        start = (datetime.now() - timedelta(days=90)).strftime("%Y-%m-%d")
-        df = get_ohlcv(symbol, start, end)
-        # 将 DataFrame 转换为传给 evaluate_signal 的格式
-        payload["ohlcv"] = {
-            "t": df.index.strftime("%Y-%m-%d").tolist(),
-            "o": df["open"].tolist(),
-            "h": df["high"].tolist(),
-            "l": df["low"].tolist(),
-            "c": df["close"].tolist(),
-            "v": df["volume"].tolist(),
-        }
+        payload["ohlcv"] = _fetch_ohlcv_payload(symbol)
     return jsonify(evaluate_signal(payload))
 
+@api_bp.post("/trades/signals")
+def trade_signals():
+    """
+    批量信号评估（POST JSON）：
+    {"items": [{"symbol": "002415", "mode": "breakout"}, {"symbol": "600000", "mode": "pullback"}]}
+    未携带 ohlcv 的条目并发拉取行情（网络等待相互重叠），再逐个评估；返回与 items 顺序一致的列表
+    """
+    body = request.get_json(silent=True) or {}
+    items = (body.get("items") or []) if isinstance(body, dict) else None
+    if not isinstance(items, list) or not all(isinstance(it, dict) for it in items):
+        return jsonify({"error": "items must be a list of objects"}), 400
+    need = [it for it in items if it.get("symbol") and not it.get("ohlcv")]
+    if need:
+        with ThreadPoolExecutor(max_workers=min(8, len(need))) as executor:
+            fetched = executor.map(_fetch_ohlcv_payload, [it["symbol"] for it in need])
+            for it, ohlcv in zip(need, fetched):
+                it["ohlcv"] = ohlcv
+    return jsonify([evaluate_signal(it) for it in items])
+
 @api_bp.post("/risk/evaluate")
 def risk_evaluate():
     """
@@ -69,7 +116,7 @@ def risk_evaluate():
     }
     """
     payload = request.get_json(silent=True) or {}
-    rm = RiskManager.load_from_config()
+    rm = _cached(RiskManager)
     return jsonify(rm.evaluate_trade_gates(payload))
 
 @api_bp.post("/risk/position")
@@ -85,7 +132,7 @@ def risk_position():
     }
     """
     payload = request.get_json(silent=True) or {}
-    rm = RiskManager.load_from_config()
+    rm = _cached(RiskManager)
     return jsonify(rm.suggest_position(payload))
 
 @api_bp.post("/risk/exit-plan")
@@ -101,7 +148,7 @@ def risk_exit_plan():
     }
     """
     payload = request.get_json(silent=True) or {}
-    rm = RiskManager.load_from_config()
+    rm = _cached(RiskManager)
     return jsonify(rm.build_exit_plan(payload))
 
 @api_bp.post("/trades/plan")
@@ -130,7 +177,7 @@ def paper_open():
     """
     payload = request.get_json(silent=True) or {}
     plan = build_trade_plan(payload)
-    rm = RiskManager.load_from_config()
+    rm = _cached(RiskManager)
 
     if plan.get("decision") == "ENTER":
         pos = plan["position"]        # 来自 suggest_position(...)
@@ -152,20 +199,20 @@ def paper_open():
 def paper_step():
     """推进一步：{"price":12.45,"high":12.55,"low":12.30}"""
     j = request.get_json(silent=True) or {}
-    rm = RiskManager.load_from_config()
+    rm = _cached(RiskManager)
     r = rm.paper_step(price=float(j.get("price")), high=j.get("high"), low=j.get("low"))
     return jsonify(r)
 
 @api_bp.get("/paper/state")
 def paper_state():
     """查看纸上状态"""
-    rm = RiskManager.load_from_config()
+    rm = _cached(RiskManager)
     return jsonify(rm.paper_state())
 
 @api_bp.get("/sentry/status")
 def sentry_status():
     """市场哨兵状态查询（硬熔断 + 软情绪）。"""
-    ms = MarketSentry.load_from_config()
+    ms = _cached(MarketSentry)
     return jsonify(ms.evaluate())
 
 @api_bp.post("/sentry/check")
@@ -175,7 +222,7 @@ def sentry_check():
     - 输入可为空（走 stub）。
     - 输出只返回 allowed / halt，便于前端聚合。
     """
-    ms = MarketSentry.load_from_config()
+    ms = _cached(MarketSentry)
     ev = ms.evaluate()
     return jsonify({
         "allowed": bool(ev["summary"]["allowed"]),
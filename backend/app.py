@@ -1,11 +1,34 @@
 # -*- coding: utf-8 -*-
 from flask import Flask
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from loguru import logger
 from backend.api.routes import api_bp
 
+# 可选：orjson 序列化（NumPy 数组/标量可直接输出），未安装时沿用 Flask 默认 json
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    """基于 orjson 的 app.json；日期/Decimal 等仍交给 Flask 默认的 default 处理，输出口径不变"""
+
+    def dumps(self, obj, **kwargs):
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if kwargs.get("sort_keys", self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
 def create_app() -> Flask:
     app = Flask(__name__)
+    if HAS_ORJSON:
+        app.json = ORJSONProvider(app)
     CORS(app)
     app.register_blueprint(api_bp, url_prefix="/api/v1")
 
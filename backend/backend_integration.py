@@ -4,7 +4,7 @@
 
 使用方式:
 1. 在现有代码开头导入: from backend.backend_integration import *
-2. 现有的 pd.read_csv() 调用自动切换到新数据源
+2. 在 adaptive_read_csv() 作用域内，pd.read_csv() 调用自动切换到新数据源
 3. 现有的 CSV 写入调用自动切换到 write_zipline_csv()
 """
 
@@ -12,14 +12,74 @@ import pandas as pd
 import numpy as np
 from pathlib import Path
 from typing import Optional, Union, Dict, List, Any, Callable
+import os
+import re
+import threading
 import warnings
 import logging
 import functools
+from contextlib import contextmanager
 from datetime import datetime
 
+# 可选：pyarrow 的多线程 C++ CSV 读写及 Parquet 读取
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# 可选：google-re2 的线性时间 DFA 引擎，未安装时回退标准库 re
+try:
+    import re2 as _regex
+    HAS_RE2 = True
+except ImportError:
+    _regex = re
+    HAS_RE2 = False
+
 # 配置日志
 logger = logging.getLogger(__name__)
 
+# 股票代码模式（模块加载时编译为单个合并模式，各分支互斥）
+_SYMBOL_PATTERN = _regex.compile(
+    r'^(?:'
+    r'(\d{6}\.(?:SZ|SH))'   # 000001.SZ
+    r'|(\d{6})_(?:SZ|SH)'   # 000001_SZ
+    r'|([A-Z]{1,5})'        # AAPL
+    r'|(\d{6})'             # 000001
+    r')$'
+)
+
+# 路径中的股票相关关键词
+_STOCK_PATH_KEYWORDS = ('stock', 'equity', 'data', 'ohlc', 'price', 'zipline')
+
+
+def _normalize_symbol(symbol: str) -> str:
+    """标准化格式：6位纯数字代码根据代码段补全市场后缀"""
+    if len(symbol) == 6 and symbol.isdigit():
+        # 根据代码判断市场
+        if symbol.startswith(('000', '002', '300')):
+            return f"{symbol}.SZ"
+        elif symbol.startswith(('600', '601', '603', '688')):
+            return f"{symbol}.SH"
+    return symbol
+
+
+@functools.lru_cache(maxsize=4096)
+def _symbol_from_stem(stem: str) -> Optional[str]:
+    """按文件名（不含扩展名）提取并标准化股票代码；结果按文件名缓存"""
+    match = _SYMBOL_PATTERN.match(stem.upper())
+    if match:
+        return _normalize_symbol(match.group(match.lastindex))
+    return None
+
+
+def _symbols_from_paths(paths: List[Path]) -> List[str]:
+    """批量提取股票代码（跳过无法识别的文件名）"""
+    matches = [_SYMBOL_PATTERN.match(p.stem.upper()) for p in paths]
+    return [_normalize_symbol(m.group(m.lastindex)) for m in matches if m]
+
 class BackendIntegrationAdapter:
     """
     后端集成适配器
@@ -32,8 +92,7 @@ class BackendIntegrationAdapter:
         self.fallback_enabled = True
         self.csv_data_path = None
         
-        # 记录原始函数
-        self._original_pd_read_csv = pd.read_csv
+        # 是否对所有线程启用 read_csv 适配（auto_patch）
         self._patched = False
         
         # 统计信息
@@ -70,25 +129,19 @@ class BackendIntegrationAdapter:
         logger.info("后端集成已禁用")
     
     def _patch_pandas_functions(self):
-        """patch pandas函数"""
+        """对所有线程启用 read_csv 适配（进程级，建议优先使用 adaptive_read_csv()）"""
         if self._patched:
             return
         
-        # 保存原始函数
-        self._original_pd_read_csv = pd.read_csv
-        
-        # 替换为适配后的函数
-        pd.read_csv = self._adaptive_read_csv
-        
+        _install_read_csv_dispatch()
         self._patched = True
         logger.info("pandas函数已被patch")
     
     def _restore_pandas_functions(self):
-        """恢复pandas原始函数"""
+        """关闭进程级 read_csv 适配；adaptive_read_csv() 作用域不受影响"""
         if not self._patched:
             return
         
-        pd.read_csv = self._original_pd_read_csv
         self._patched = False
         logger.info("pandas函数已恢复")
     
@@ -111,57 +164,29 @@ class BackendIntegrationAdapter:
                     return self._read_stock_data_with_new_fetcher(file_path, **kwargs)
             
             # 不是股票数据文件，使用原始函数
-            return self._original_pd_read_csv(filepath_or_buffer, **kwargs)
+            return _original_pd_read_csv(filepath_or_buffer, **kwargs)
             
         except Exception as e:
             logger.warning(f"自适应read_csv失败，回退到原始函数: {e}")
             self.stats['fallback_calls'] += 1
-            return self._original_pd_read_csv(filepath_or_buffer, **kwargs)
+            return _original_pd_read_csv(filepath_or_buffer, **kwargs)
     
     def _is_stock_data_file(self, file_path: Path) -> bool:
         """判断是否为股票数据文件"""
-        # 基于文件路径和名称的启发式判断
-        indicators = [
-            # 文件名模式
-            file_path.name.lower().endswith(('.csv',)),
-            # 路径中包含股票相关关键词
-            any(keyword in str(file_path).lower() for keyword in [
-                'stock', 'equity', 'data', 'ohlc', 'price', 'zipline'
-            ]),
-            # 股票代码模式
-            self._extract_symbol_from_path(file_path) is not None
-        ]
-        
-        return any(indicators)
+        # 基于文件路径和名称的启发式判断，按开销从低到高依次短路
+        # 文件名模式
+        if file_path.name.lower().endswith(('.csv', '.parquet')):
+            return True
+        # 股票代码模式
+        if self._extract_symbol_from_path(file_path) is not None:
+            return True
+        # 路径中包含股票相关关键词
+        path_str = str(file_path).lower()
+        return any(keyword in path_str for keyword in _STOCK_PATH_KEYWORDS)
     
     def _extract_symbol_from_path(self, file_path: Path) -> Optional[str]:
         """从文件路径提取股票代码"""
-        import re
-        
-        filename = file_path.stem
-        
-        # 股票代码模式
-        patterns = [
-            r'^(\d{6}\.(SZ|SH))$',  # 000001.SZ
-            r'^(\d{6})_(SZ|SH)$',   # 000001_SZ
-            r'^([A-Z]{1,5})$',      # AAPL
-            r'^(\d{6})$'            # 000001
-        ]
-        
-        for pattern in patterns:
-            match = re.match(pattern, filename.upper())
-            if match:
-                symbol = match.group(1)
-                # 标准化格式
-                if len(symbol) == 6 and symbol.isdigit():
-                    # 根据代码判断市场
-                    if symbol.startswith(('000', '002', '300')):
-                        return f"{symbol}.SZ"
-                    elif symbol.startswith(('600', '601', '603', '688')):
-                        return f"{symbol}.SH"
-                return symbol
-        
-        return None
+        return _symbol_from_stem(file_path.stem)
     
     def _read_stock_data_with_new_fetcher(self, file_path: Path, **kwargs) -> pd.DataFrame:
         """使用新数据获取器读取股票数据"""
@@ -175,7 +200,8 @@ class BackendIntegrationAdapter:
             # 使用新的数据获取器
             from backend.data_fetcher_facade import get_global_fetcher
             
-            fetcher = get_global_fetcher(csv_data_path=self.csv_data_path)
+            csv_data_path = getattr(_read_csv_scope, 'csv_data_path', None) or self.csv_data_path
+            fetcher = get_global_fetcher(csv_data_path=csv_data_path)
             
             # 尝试从kwargs中获取日期范围
             start_date = kwargs.pop('start_date', None)
@@ -194,8 +220,11 @@ class BackendIntegrationAdapter:
             logger.warning(f"新数据获取器失败，回退到CSV: {e}")
             self.stats['fallback_calls'] += 1
             
-            # 回退到原始CSV读取
-            return self._original_pd_read_csv(file_path, **kwargs)
+            # 回退到本地文件：已迁移为 Parquet 的优先读取列式文件
+            parquet_path = file_path.with_suffix('.parquet')
+            if HAS_PYARROW and not kwargs and parquet_path.exists():
+                return pq.read_table(str(parquet_path)).to_pandas()
+            return _original_pd_read_csv(file_path, **kwargs)
 
 # 全局适配器实例
 _global_adapter = BackendIntegrationAdapter()
@@ -211,13 +240,13 @@ def enable_backend_integration(csv_data_path: Optional[str] = None,
     
     Args:
         csv_data_path: 原始CSV数据路径
-        auto_patch: 是否自动patch pandas函数
+        auto_patch: 是否对所有线程启用 read_csv 适配；只需局部切换时使用 adaptive_read_csv()
     
     Example:
         # 在main函数或应用启动时调用
         enable_backend_integration(csv_data_path="./data/stocks/")
         
-        # 之后所有的 pd.read_csv() 调用都会自动使用新数据源
+        # 之后所有线程的 pd.read_csv() 调用都会自动使用新数据源
         data = pd.read_csv("data/000001.SZ.csv")  # 自动切换到新获取器
     """
     global _global_adapter
@@ -306,12 +335,81 @@ def write_stock_csv(data: pd.DataFrame,
             logger.info(f"使用Zipline格式写入: {file_path}")
         else:
             # 回退到普通CSV写入
-            data.to_csv(file_path, index=False, **kwargs)
+            _write_plain_csv(data, file_path, **kwargs)
             logger.info(f"使用普通格式写入: {file_path}")
             
     except Exception as e:
         logger.warning(f"write_stock_csv失败，回退到普通CSV: {e}")
-        data.to_csv(file_path, index=False, **kwargs)
+        _write_plain_csv(data, file_path, **kwargs)
+
+def _write_plain_csv(data: pd.DataFrame, file_path: Union[str, Path], **kwargs):
+    """普通CSV写入：无额外 to_csv 参数时使用 pyarrow 写入器，否则或失败时使用 pandas"""
+    if HAS_PYARROW and not kwargs:
+        try:
+            table = pa.Table.from_pandas(data, preserve_index=False)
+            pacsv.write_csv(table, str(file_path),
+                            write_options=pacsv.WriteOptions(include_header=True))
+            return
+        except Exception as e:
+            logger.debug(f"pyarrow写入失败，使用pandas写入: {e}")
+    
+    data.to_csv(file_path, index=False, **kwargs)
+
+def _read_plain_csv(file_path: Union[str, Path]) -> pd.DataFrame:
+    """普通CSV读取：优先 pyarrow 读取器"""
+    if HAS_PYARROW:
+        return pacsv.read_csv(str(file_path)).to_pandas()
+    return pd.read_csv(file_path)
+
+# pd.read_csv 的线程级适配：仅在 adaptive_read_csv() 作用域内的线程（或显式 auto_patch 后）拦截
+_read_csv_scope = threading.local()
+_read_csv_patch_lock = threading.Lock()
+_original_pd_read_csv = pd.read_csv
+
+def _scoped_read_csv(filepath_or_buffer, *args, **kwargs):
+    """作用域外直接调用原始 read_csv；作用域内交给适配器判断是否走新数据获取器"""
+    active = getattr(_read_csv_scope, 'depth', 0) > 0 or _global_adapter._patched
+    # 适配读取期间（数据获取器内部的 read_csv）不再重复拦截
+    if not active or args or getattr(_read_csv_scope, 'busy', False):
+        return _original_pd_read_csv(filepath_or_buffer, *args, **kwargs)
+    
+    _read_csv_scope.busy = True
+    try:
+        return _global_adapter._adaptive_read_csv(filepath_or_buffer, **kwargs)
+    finally:
+        _read_csv_scope.busy = False
+
+def _install_read_csv_dispatch():
+    """安装一次 pd.read_csv 分发函数（幂等）"""
+    with _read_csv_patch_lock:
+        if pd.read_csv is not _scoped_read_csv:
+            pd.read_csv = _scoped_read_csv
+
+@contextmanager
+def adaptive_read_csv(csv_data_path: Optional[str] = None):
+    """
+    上下文管理器：在当前线程内把股票数据的 pd.read_csv 调用切换到新数据获取器
+    
+    其他线程（如并发的Flask请求）不受影响，仍直接使用pandas原始实现。
+    
+    Args:
+        csv_data_path: 原始CSV数据路径（用于回退），默认沿用全局适配器配置
+    
+    Example:
+        with adaptive_read_csv(csv_data_path="./data/stocks/"):
+            data = pd.read_csv("data/000001.SZ.csv")  # 自动切换到新获取器
+    """
+    _install_read_csv_dispatch()
+    
+    prev_path = getattr(_read_csv_scope, 'csv_data_path', None)
+    _read_csv_scope.depth = getattr(_read_csv_scope, 'depth', 0) + 1
+    if csv_data_path:
+        _read_csv_scope.csv_data_path = csv_data_path
+    try:
+        yield
+    finally:
+        _read_csv_scope.depth -= 1
+        _read_csv_scope.csv_data_path = prev_path
 
 # === 装饰器 - 用于逐步迁移现有函数 ===
 
@@ -331,33 +429,65 @@ def use_new_data_source(csv_data_path: Optional[str] = None):
     def decorator(func: Callable) -> Callable:
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            # 临时启用集成
-            original_enabled = _global_adapter.enabled
-            original_path = _global_adapter.csv_data_path
-            
-            try:
-                _global_adapter.csv_data_path = csv_data_path or original_path
-                _global_adapter.enabled = True
-                
-                if not _global_adapter._patched:
-                    _global_adapter._patch_pandas_functions()
-                
-                result = func(*args, **kwargs)
-                return result
-                
-            finally:
-                # 恢复原始状态
-                _global_adapter.enabled = original_enabled
-                _global_adapter.csv_data_path = original_path
+            # 仅在本次调用的线程内启用，不修改全局适配器状态
+            with adaptive_read_csv(csv_data_path):
+                return func(*args, **kwargs)
         
         return wrapper
     return decorator
 
+# DataFrame.to_csv 的线程级适配：仅在 adapt_to_csv() 作用域内的线程改走 write_stock_csv
+_to_csv_scope = threading.local()
+_to_csv_patch_lock = threading.Lock()
+_original_df_to_csv = pd.DataFrame.to_csv
+
+@functools.wraps(_original_df_to_csv)
+def _scoped_to_csv(self, path_or_buf=None, *args, **csv_kwargs):
+    """作用域外直接调用原始 to_csv；作用域内对股票CSV路径改用Zipline写入器（带位置参数的调用原样转发）"""
+    if args:
+        return _original_df_to_csv(self, path_or_buf, *args, **csv_kwargs)
+    if getattr(_to_csv_scope, 'depth', 0) > 0 and isinstance(path_or_buf, (str, Path)):
+        path = Path(path_or_buf)
+        if path.suffix.lower() == '.csv':
+            symbol = _global_adapter._extract_symbol_from_path(path)
+            if symbol:
+                # 写入期间暂停适配，避免写入器内部的 to_csv 再次被拦截
+                depth, _to_csv_scope.depth = _to_csv_scope.depth, 0
+                try:
+                    write_stock_csv(self, path_or_buf, symbol=symbol, **csv_kwargs)
+                finally:
+                    _to_csv_scope.depth = depth
+                return
+    
+    return _original_df_to_csv(self, path_or_buf, **csv_kwargs)
+
+@contextmanager
+def adapt_to_csv():
+    """
+    上下文管理器：在当前线程内把股票数据的 DataFrame.to_csv 调用切换到Zipline写入器
+    
+    其他线程（如并发的Flask请求）不受影响，仍直接使用pandas原始实现。
+    新代码建议直接调用 write_stock_csv()。
+    
+    Example:
+        with adapt_to_csv():
+            data.to_csv("output/000001_SZ.csv")  # 自动使用Zipline写入器
+    """
+    with _to_csv_patch_lock:
+        if pd.DataFrame.to_csv is not _scoped_to_csv:
+            pd.DataFrame.to_csv = _scoped_to_csv
+    
+    _to_csv_scope.depth = getattr(_to_csv_scope, 'depth', 0) + 1
+    try:
+        yield
+    finally:
+        _to_csv_scope.depth -= 1
+
 def migrate_csv_operations(output_dir: Union[str, Path]):
     """
     装饰器：迁移函数中的CSV操作到新后端
     
-    自动处理函数中的CSV读写操作
+    自动处理函数中的CSV读写操作（读写适配均只作用于当前线程，见 adaptive_read_csv / adapt_to_csv）
     
     Example:
         @migrate_csv_operations(output_dir="./output/")
@@ -373,32 +503,8 @@ def migrate_csv_operations(output_dir: Union[str, Path]):
     def decorator(func: Callable) -> Callable:
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            # 启用后端集成
-            enable_backend_integration()
-            
-            # 临时替换DataFrame.to_csv方法
-            original_to_csv = pd.DataFrame.to_csv
-            
-            def adaptive_to_csv(self, path_or_buf=None, **csv_kwargs):
-                if isinstance(path_or_buf, (str, Path)):
-                    path = Path(path_or_buf)
-                    if path.suffix.lower() == '.csv':
-                        symbol = _global_adapter._extract_symbol_from_path(path)
-                        if symbol:
-                            write_stock_csv(self, path_or_buf, symbol=symbol, **csv_kwargs)
-                            return
-                
-                # 回退到原始方法
-                return original_to_csv(self, path_or_buf, **csv_kwargs)
-            
-            pd.DataFrame.to_csv = adaptive_to_csv
-            
-            try:
-                result = func(*args, **kwargs)
-                return result
-            finally:
-                # 恢复原始方法
-                pd.DataFrame.to_csv = original_to_csv
+            with adaptive_read_csv(), adapt_to_csv():
+                return func(*args, **kwargs)
         
         return wrapper
     return decorator
@@ -410,11 +516,24 @@ class BatchMigrationTool:
     
     def __init__(self, 
                  csv_input_dir: Union[str, Path],
-                 csv_output_dir: Union[str, Path]):
+                 csv_output_dir: Union[str, Path],
+                 batch_size: int = 64,
+                 max_workers: Optional[int] = None,
+                 output_format: str = 'csv'):
         self.csv_input_dir = Path(csv_input_dir)
         self.csv_output_dir = Path(csv_output_dir) 
         self.csv_output_dir.mkdir(parents=True, exist_ok=True)
         
+        # 并发转换参数（传给 ZiplineCsvWriter）
+        self.batch_size = batch_size
+        self.max_workers = max_workers or os.cpu_count() or 4
+        
+        # 输出格式：'csv'（默认，Zipline csvdir 可直接摄取）或 'parquet'
+        self.output_format = output_format
+        
+        # 输入CSV文件列表（首次使用时扫描一次，refresh() 后重新扫描）
+        self._cached_inputs: Optional[List[Path]] = None
+        
         self.migration_stats = {
             'files_processed': 0,
             'files_migrated': 0,
@@ -423,6 +542,20 @@ class BatchMigrationTool:
             'end_time': None
         }
     
+    def _inputs(self) -> List[Path]:
+        """输入目录下的CSV文件列表（os.scandir 单次遍历，结果缓存）"""
+        if self._cached_inputs is None:
+            with os.scandir(self.csv_input_dir) as entries:
+                self._cached_inputs = [
+                    Path(e.path) for e in entries
+                    if e.name.endswith('.csv') and e.is_file()
+                ]
+        return self._cached_inputs
+    
+    def refresh(self):
+        """输入目录内容变化后调用，丢弃缓存的文件列表"""
+        self._cached_inputs = None
+    
     def migrate_all_csv_files(self, 
                              overwrite: bool = False,
                              validate: bool = True) -> Dict[str, Any]:
@@ -441,23 +574,24 @@ class BatchMigrationTool:
         self.migration_stats['start_time'] = datetime.now()
         
         # 找到所有CSV文件
-        csv_files = list(self.csv_input_dir.glob("*.csv"))
+        csv_files = self._inputs()
         logger.info(f"发现 {len(csv_files)} 个CSV文件")
         
         if not csv_files:
             return self.migration_stats
         
         # 提取股票代码列表
-        symbols = []
-        for csv_file in csv_files:
-            symbol = _global_adapter._extract_symbol_from_path(csv_file)
-            if symbol:
-                symbols.append(symbol)
+        symbols = _symbols_from_paths(csv_files)
         
         logger.info(f"提取到 {len(symbols)} 个有效股票代码")
         
-        # 使用Zipline写入器批量处理
-        writer = ZiplineCsvWriter(output_dir=self.csv_output_dir)
+        # 使用Zipline写入器批量处理（超过一个批次时走写入器的并发路径）
+        writer = ZiplineCsvWriter(
+            output_dir=self.csv_output_dir,
+            batch_size=self.batch_size,
+            max_workers=self.max_workers,
+            output_format=self.output_format
+        )
         
         # 配置数据获取器使用原始CSV作为数据源
         enable_backend_integration(csv_data_path=str(self.csv_input_dir))
@@ -489,8 +623,9 @@ class BatchMigrationTool:
     
     def validate_migration(self) -> Dict[str, Any]:
         """验证迁移结果"""
-        original_files = list(self.csv_input_dir.glob("*.csv"))
-        migrated_files = list(self.csv_output_dir.glob("*.csv"))
+        original_files = self._inputs()
+        suffix = f".{self.output_format}"
+        migrated_files = list(self.csv_output_dir.glob(f"*{suffix}"))
         
         validation_result = {
             'original_count': len(original_files),
@@ -503,7 +638,7 @@ class BatchMigrationTool:
         for original_file in original_files:
             symbol = _global_adapter._extract_symbol_from_path(original_file)
             if symbol:
-                migrated_file = self.csv_output_dir / f"{symbol.replace('.', '_')}.csv"
+                migrated_file = self.csv_output_dir / f"{symbol.replace('.', '_')}{suffix}"
                 if not migrated_file.exists():
                     validation_result['missing_files'].append(symbol)
         
@@ -512,11 +647,14 @@ class BatchMigrationTool:
             symbol = _global_adapter._extract_symbol_from_path(original_file)
             if symbol:
                 try:
-                    original_data = pd.read_csv(original_file)
-                    migrated_file = self.csv_output_dir / f"{symbol.replace('.', '_')}.csv"
+                    original_data = _read_plain_csv(original_file)
+                    migrated_file = self.csv_output_dir / f"{symbol.replace('.', '_')}{suffix}"
                     
                     if migrated_file.exists():
-                        migrated_data = pd.read_csv(migrated_file)
+                        if self.output_format == 'parquet':
+                            migrated_data = pq.read_table(str(migrated_file)).to_pandas()
+                        else:
+                            migrated_data = _read_plain_csv(migrated_file)
                         
                         # 简单的数据量对比
                         consistency_check = {
@@ -536,6 +674,7 @@ class BatchMigrationTool:
 
 def quick_migration(csv_input_dir: Union[str, Path],
                    csv_output_dir: Union[str, Path],
+                   output_format: str = 'csv',
                    **kwargs) -> Dict[str, Any]:
     """
     快速迁移工具
@@ -549,7 +688,7 @@ def quick_migration(csv_input_dir: Union[str, Path],
         )
         print(f"迁移完成: {result['files_migrated']} 个文件")
     """
-    tool = BatchMigrationTool(csv_input_dir, csv_output_dir)
+    tool = BatchMigrationTool(csv_input_dir, csv_output_dir, output_format=output_format)
     return tool.migrate_all_csv_files(**kwargs)
 
 def create_migration_script(csv_input_dir: Union[str, Path],
@@ -646,9 +785,8 @@ if __name__ == "__main__":
             })
             
             # 确保价格关系正确
-            for i in range(len(test_data)):
-                test_data.loc[i, 'high'] = max(test_data.loc[i, ['open', 'close', 'high']])
-                test_data.loc[i, 'low'] = min(test_data.loc[i, ['open', 'close', 'low']])
+            test_data['high'] = test_data[['open', 'close', 'high']].max(axis=1)
+            test_data['low'] = test_data[['open', 'close', 'low']].min(axis=1)
             
             csv_file = input_dir / f"{symbol.replace('.', '_')}.csv"
             test_data.to_csv(csv_file, index=False)
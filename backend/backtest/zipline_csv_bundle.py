@@ -10,71 +10,63 @@ import sys
 import json
 import numpy as np
 import pandas as pd
-import exchange_calendars as ecals 
 from typing import Dict
-from backend.backtest.zipline_integration import ensure_zipline_root
+from backend.backtest.zipline_integration import ensure_zipline_root, write_ohlcv_csv
+from backend.data.normalize import get_sessions_index
 
 # —— 工具：获取/创建 ZIPLINE_ROOT —— #
 def get_zipline_root() -> str:
     # 优先使用环境变量；否则放到项目内 var/zipline
     return os.environ.get("ZIPLINE_ROOT") or os.path.join(os.getcwd(), "var", "zipline")
 
-def write_stub_csv(csv_dir: str, symbol: str = "TEST") -> str:
+def write_stub_csv(csv_dir: str, symbol: str = "TEST", seed: int | None = 42) -> str:
     """
     写入 Zipline csvdir_equities 兼容的示例日线 CSV（A股交易日）。
     必须与注册时的 calendar_name 一致（XSHG）。
     
     改进版：生成包含横盘整理和突破的价格模式
+    seed：噪音/成交量的随机种子；固定种子时重复生成的 CSV 完全一致（ingest 幂等），None 则每次不同
     """
     os.makedirs(csv_dir, exist_ok=True)
+    # 独立的 Generator（PCG64），不碰全局 RandomState，多线程并发生成时互不干扰
+    rng = np.random.default_rng(seed)
     path = os.path.join(csv_dir, f"{symbol}.csv")
 
     # ★ 使用 XSHG 交易日历，自动排除中国法定休市/节假日
-    cal = ecals.get_calendar("XSHG")
-    sessions = cal.sessions_in_range("2024-01-01", "2024-03-31")
-
-    # Zipline 要求 index 为无时区日期
-    idx = sessions.tz_localize(None) if getattr(sessions, "tz", None) is not None else sessions
+    # Zipline 要求 index 为无时区日期（get_sessions_index 已去时区，且按区间缓存）
+    idx = get_sessions_index("2024-01-01", "2024-03-31", "XSHG")
 
     # ★ 改进的价格生成逻辑：创建横盘整理后突破的模式
+    # 三段曲线都按下标 t 写成整段表达式，再用 np.select 按区间拼接（无分段切片赋值）
+    #   第一阶段（前20天）：横盘整理在 10-11 之间（一个完整正弦周期）
+    #   第二阶段（20-30天）：小幅上涨，准备突破（10.8 -> 11.5 线性）
+    #   第三阶段（30天后）：明显突破并持续上涨
     n = len(idx)
-    prices = np.zeros(n)
-    
-    # 第一阶段（前20天）：横盘整理在 10-11 之间
+    t = np.arange(n, dtype=np.float64)
     phase1_days = min(20, n)
-    prices[:phase1_days] = 10.5 + 0.5 * np.sin(np.linspace(0, 2*np.pi, phase1_days))
-    
-    # 第二阶段（20-30天）：小幅上涨，准备突破
-    if n > 20:
-        phase2_days = min(10, n - 20)
-        phase2_end = 20 + phase2_days
-        prices[20:phase2_end] = np.linspace(10.8, 11.5, phase2_days)
-    
-    # 第三阶段（30天后）：明显突破并持续上涨
-    if n > 30:
-        phase3_start = 30
-        prices[phase3_start:] = 11.5 + 0.3 * np.arange(n - phase3_start)
+    phase2_days = min(10, max(n - 20, 0))
+    phase1 = 10.5 + 0.5 * np.sin(t * (2 * np.pi / max(phase1_days - 1, 1)))
+    phase2 = 10.8 + (t - 20) * ((11.5 - 10.8) / max(phase2_days - 1, 1))
+    phase3 = 11.5 + 0.3 * (t - 30)
     
     # 添加少量噪音使数据更真实
-    prices = prices + np.random.normal(0, 0.02, n)
+    prices = np.select([t < 20, t < 30], [phase1, phase2], phase3) + rng.normal(0, 0.02, n)
     
-    # 生成 OHLC 数据
+    # 生成 OHLC 数据：open/high/low 相对 close 的偏移一次 round
     close = np.round(prices, 4)
-    open_  = np.round(close - 0.05, 4)
-    high   = np.round(close + 0.15, 4)  # 高点留有空间
-    low    = np.round(open_ - 0.10, 4)
-    vol    = np.random.randint(800, 1200, n)
+    open_, high, low = np.round(close[:, None] + np.array([-0.05, 0.15, -0.15]), 4).T  # 高点留有空间
+    vol    = rng.integers(800, 1200, n, dtype=np.int32)
 
     df = pd.DataFrame({
+        "date":  idx.strftime("%Y-%m-%d"),
         "open":  open_,
         "high":  high,
         "low":   low,
         "close": close,
         "volume": vol,
-    }, index=idx)
-    df.index.name = "date"
+    })
 
-    df.to_csv(path, float_format="%.4f")
+    write_ohlcv_csv(df, path)
     
     # 打印数据特征便于调试
     print(f"Generated CSV with {len(df)} trading days from {idx[0]} to {idx[-1]}")
@@ -111,14 +103,45 @@ register(
     calendar_name='XSHG'  # 只在 register 函数中指定 calendar_name
 )
 '''
-    with open(ext_path, "w", encoding="utf-8") as f:
-        f.write(content)
-    
-    print(f"Created extension.py with calendar_name='XSHG'")
+    # 内容未变则不重写（不动 mtime）；否则先写临时文件再 os.replace 原子替换，
+    # 并发 ingest 的进程要么读到旧文件、要么读到新文件，不会导入写了一半的模块
+    try:
+        with open(ext_path, "r", encoding="utf-8") as f:
+            unchanged = f.read() == content
+    except OSError:
+        unchanged = False
+
+    if unchanged:
+        print("extension.py unchanged, skip writing")
+    else:
+        tmp_path = f"{ext_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, ext_path)
+        print(f"Created extension.py with calendar_name='XSHG'")
     
     return {"zipline_root": root, "extension": ext_path, "csv_dir": csv_dir, "bundle": bundle_name}
 
-# —— 触发 ingest（通过 python -m zipline 调用 CLI）—— #
+# —— 触发 ingest：优先进程内调用 zipline API，不可用时退回 python -m zipline CLI —— #
+def _ingest_in_process(bundle_name: str, env: Dict[str, str]) -> int:
+    """
+    进程内 ingest：省去每次起解释器 + 冷导入 zipline 的开销（多次 ingest 时只付一次）
+    - 先按 CLI 的方式加载 ZIPLINE_ROOT/extension.py，完成 bundle 注册
+      （reload=True：install_csv_bundle 可能刚改写过 extension.py）
+    - CSVDIR 通过 environ 传给 csvdir_equities，不改动本进程的 os.environ
+    zipline 不可导入时抛 ImportError，由调用方退回子进程
+    """
+    from zipline.data import bundles
+    from zipline.utils.run_algo import load_extensions
+
+    load_extensions(True, (), False, env, reload=True)
+    try:
+        bundles.ingest(bundle_name, environ=env, show_progress=False)
+    except Exception as e:
+        print(f"zipline ingest failed: {e!r}")
+        return 1
+    return 0
+
 def ingest_bundle(bundle_name: str = "sss_csv", csv_dir: str | None = None) -> int:
     import subprocess, os, sys
     from backend.backtest.zipline_integration import ensure_zipline_root
@@ -126,7 +149,7 @@ def ingest_bundle(bundle_name: str = "sss_csv", csv_dir: str | None = None) -> i
     # 确保 ZIPLINE_ROOT 已设置
     ensure_zipline_root()
 
-    # 组装子进程环境，并注入 CSVDIR
+    # 组装 ingest 环境，并注入 CSVDIR
     env = os.environ.copy()
     if csv_dir:
         env["CSVDIR"] = csv_dir
@@ -134,9 +157,14 @@ def ingest_bundle(bundle_name: str = "sss_csv", csv_dir: str | None = None) -> i
         # 兜底：使用项目内 data/zipline_csv
         env.setdefault("CSVDIR", os.path.join(os.getcwd(), "data", "zipline_csv"))
 
+    print(">>> zipline ingest output >>>")
+    try:
+        return _ingest_in_process(bundle_name, env)
+    except ImportError:
+        pass
+
     cmd = [sys.executable, "-m", "zipline", "ingest", "-b", bundle_name]
     proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, env=env)
-    print(">>> zipline ingest output >>>")
     print(proc.stdout)
     return proc.returncode
 
@@ -19,8 +19,11 @@ Zipline csvdir_equities 规范：
 
 from __future__ import annotations
 
+import mmap
 import os
+import re
 import warnings
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from typing import Dict, List, Optional, Union, Any
 
@@ -32,9 +35,93 @@ try:
 except ImportError:
     import logging as logger
 
+# 可选：pyarrow（Parquet/Feather 中间缓存）
+try:
+    import pyarrow  # noqa: F401
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# 中间缓存格式 -> 文件后缀
+_CACHE_SUFFIX = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather"}
+
+# csvdir 规范表头与日期格式（快速预检用）
+_CSV_HEADER = b"date,open,high,low,close,volume"
+_DATE_BYTES_RE = re.compile(rb"\d{4}-\d{2}-\d{2}")
+
 # 导入依赖模块
 from backend.data.fetcher import get_ohlcv
 from backend.data.normalize import get_sessions_index
+from backend.backtest.zipline_integration import write_ohlcv_csv
+
+
+def _ffill_bfill(vals: np.ndarray) -> np.ndarray:
+    """
+    按列前向填充、再对开头缺失做后向填充，等价于 DataFrame.ffill().bfill()
+    - 一次算出每个位置应取的行号（maximum.accumulate），再整体 take
+    - 全列缺失时保持 NaN
+    """
+    valid = ~np.isnan(vals)
+    rows = np.arange(len(vals))[:, None]
+    src = np.where(valid, rows, 0)
+    np.maximum.accumulate(src, axis=0, out=src)
+    # 首个有效值之前的位置取首个有效值（bfill）
+    first = valid.argmax(axis=0)
+    np.maximum(src, first, out=src)
+    return np.take_along_axis(vals, src, axis=0)
+
+
+def _any_nan(df: pd.DataFrame) -> bool:
+    """
+    整表是否含缺失值，替代 df.isnull().any().any()
+    - 浮点列拼成一个 float64 数组做一次 np.isnan 归约，不生成布尔 DataFrame
+    - 整数/布尔列不可能含 NaN，直接跳过；其余列（date 字符串、可空扩展类型等）才走 isnull
+    """
+    kinds = [dt.kind if isinstance(dt, np.dtype) else 'O' for dt in df.dtypes]
+    float_idx = [j for j, k in enumerate(kinds) if k == 'f']
+    other_idx = [j for j, k in enumerate(kinds) if k not in 'fiub']
+    if float_idx and np.isnan(df.iloc[:, float_idx].to_numpy(dtype=np.float64)).any():
+        return True
+    return bool(other_idx) and bool(df.iloc[:, other_idx].isnull().to_numpy().any())
+
+
+def _scan_files(directory: Path, suffix: str) -> List[Path]:
+    """os.scandir 流式遍历目录，只保留指定后缀的普通文件（DirEntry 自带类型信息，无需逐个 stat）"""
+    with os.scandir(directory) as it:
+        return [Path(e.path) for e in it if e.name.endswith(suffix) and e.is_file()]
+
+
+def _quick_reject_csv(path: Path) -> Optional[str]:
+    """
+    mmap 只看表头和末行做快速拒绝，不解析整个文件
+    返回：拒绝原因；None 表示预检未发现问题（或无法判断），仍需完整读取校验
+    """
+    try:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            nl = mm.find(b"\n")
+            header = bytes(mm[:nl if nl >= 0 else len(mm)]).rstrip(b"\r")
+            if header != _CSV_HEADER:
+                return f"文件列名不符合规范，实际表头: {header.decode('utf-8', errors='replace')}"
+            end = len(mm)
+            while end > 0 and mm[end - 1] in (0x0A, 0x0D):
+                end -= 1
+            start = mm.rfind(b"\n", 0, end) + 1
+            if nl < 0 or start <= nl:
+                return None   # 只有表头，交给完整读取
+            fields = bytes(mm[start:end]).rstrip(b"\r").split(b",")
+    except (OSError, ValueError):
+        return None   # 空文件等无法 mmap 的情况
+    if len(fields) != len(_CSV_HEADER.split(b",")):
+        return f"末行字段数不正确: {len(fields)}"
+    if not _DATE_BYTES_RE.fullmatch(fields[0]):
+        return f"末行日期格式不正确: {fields[0].decode('utf-8', errors='replace')}"
+    try:
+        values = [float(x) for x in fields[1:]]
+    except ValueError:
+        return "末行包含空值或非数值"
+    if any(np.isnan(values)):
+        return "末行包含NaN值"
+    return None
 
 
 class ZiplineExporter:
@@ -53,7 +140,9 @@ class ZiplineExporter:
         output_dir: str = "data/zipline_csv",
         calendar_name: str = "XSHG",
         validate_data: bool = True,
-        overwrite_existing: bool = True
+        overwrite_existing: bool = True,
+        max_workers: int = 1,
+        cache_format: str = "csv"
     ):
         """
         初始化导出器
@@ -63,11 +152,21 @@ class ZiplineExporter:
           calendar_name     : 交易日历名称
           validate_data     : 是否验证数据质量
           overwrite_existing: 是否覆盖已存在的文件
+          max_workers       : 批量导出的并发线程数；默认 1 顺序执行，>1 时并发调用各数据源（注意限流），需显式开启
+          cache_format      : 中间缓存格式 csv/parquet/feather；非 csv 时另存列式文件供校验/回放读取，
+                              CSV 只在交给 zipline ingest 时生成（见 final_for_ingest / materialize_for_ingest）
         """
+        if cache_format not in _CACHE_SUFFIX:
+            raise ValueError(f"不支持的缓存格式: {cache_format}")
+        if cache_format != "csv" and not HAS_PYARROW:
+            raise ImportError(f"缓存格式 {cache_format} 需要安装 pyarrow")
+        
         self.output_dir = Path(output_dir)
         self.calendar_name = calendar_name
         self.validate_data = validate_data
         self.overwrite_existing = overwrite_existing
+        self.max_workers = max_workers
+        self.cache_format = cache_format
         
         # 创建输出目录
         self.output_dir.mkdir(parents=True, exist_ok=True)
@@ -95,15 +194,16 @@ class ZiplineExporter:
         if missing_cols:
             raise ValueError(f"{symbol}: 缺少必需列 {missing_cols}")
         
-        # 2. 数值类型转换
+        # 2. 数值类型转换（get_ohlcv 通常已是数值列，此时跳过整列扫描）
         for col in required_cols:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
+            if not pd.api.types.is_numeric_dtype(df[col]):
+                df[col] = pd.to_numeric(df[col], errors='coerce')
         
-        # 3. 检查并处理 NaN 值
-        nan_rows = df.isnull().any(axis=1)
+        # 3. 检查并处理 NaN 值（一次掩码 + 一次布尔索引）
+        nan_rows = df.isnull().to_numpy().any(axis=1)
         if nan_rows.any():
             logger.warning(f"{symbol}: 发现 {nan_rows.sum()} 行包含 NaN，将被移除")
-            df = df.dropna()
+            df = df[~nan_rows]
         
         if df.empty:
             logger.warning(f"{symbol}: 清理后数据为空")
@@ -112,23 +212,32 @@ class ZiplineExporter:
         # 4. OHLC 关系验证
         if self.validate_data:
             # 验证 high >= max(open, close) 和 low <= min(open, close)
-            invalid_high = df['high'] < df[['open', 'close']].max(axis=1)
-            invalid_low = df['low'] > df[['open', 'close']].min(axis=1)
+            # open/close 的行最大/最小只算一次，检查与修正共用
+            oc = df[['open', 'close']].to_numpy(dtype=np.float64)
+            oc_max = oc.max(axis=1)
+            oc_min = oc.min(axis=1)
+            high = df['high'].to_numpy(dtype=np.float64, copy=True)
+            low = df['low'].to_numpy(dtype=np.float64, copy=True)
+            invalid_high = high < oc_max
+            invalid_low = low > oc_min
             
             if invalid_high.any():
                 logger.warning(f"{symbol}: {invalid_high.sum()} 行 high 价格异常")
                 # 修正异常值
-                df.loc[invalid_high, 'high'] = df.loc[invalid_high, ['open', 'close']].max(axis=1) * 1.001
+                np.multiply(oc_max, 1.001, out=high, where=invalid_high)
+                df['high'] = high
             
             if invalid_low.any():
                 logger.warning(f"{symbol}: {invalid_low.sum()} 行 low 价格异常")
                 # 修正异常值
-                df.loc[invalid_low, 'low'] = df.loc[invalid_low, ['open', 'close']].min(axis=1) * 0.999
+                np.multiply(oc_min, 0.999, out=low, where=invalid_low)
+                df['low'] = low
         
         # 5. 成交量验证
-        if (df['volume'] < 0).any():
+        neg_volume = df['volume'].to_numpy() < 0
+        if neg_volume.any():
             logger.warning(f"{symbol}: 发现负成交量，将设为0")
-            df.loc[df['volume'] < 0, 'volume'] = 0
+            df.loc[neg_volume, 'volume'] = 0
         
         # 6. 数值精度规范化
         # 价格保留4位小数，成交量取整
@@ -169,17 +278,15 @@ class ZiplineExporter:
             missing_count = missing_sessions.sum()
             logger.info(f"{symbol}: 补齐 {missing_count} 个缺失交易日")
             
-            # 使用前向填充补齐价格（停牌日逻辑）
-            df_aligned[['open', 'high', 'low', 'close']] = df_aligned[['open', 'high', 'low', 'close']].ffill()
+            # 使用前向填充补齐价格（停牌日逻辑）；开头缺失的再用后向填充
+            price_cols = ['open', 'high', 'low', 'close']
+            df_aligned[price_cols] = _ffill_bfill(df_aligned[price_cols].to_numpy(dtype=np.float64))
             
             # 缺失日成交量设为0
-            df_aligned['volume'] = df_aligned['volume'].fillna(0)
-            
-            # 如果前向填充仍有NaN（开头缺失），用后向填充
-            df_aligned[['open', 'high', 'low', 'close']] = df_aligned[['open', 'high', 'low', 'close']].bfill()
+            df_aligned['volume'] = np.nan_to_num(df_aligned['volume'].to_numpy(dtype=np.float64), nan=0.0)
         
         # 最终检查
-        if df_aligned.isnull().any().any():
+        if _any_nan(df_aligned):
             logger.error(f"{symbol}: 对齐后仍有NaN值，可能是数据质量问题")
             df_aligned = df_aligned.dropna()
         
@@ -213,16 +320,20 @@ class ZiplineExporter:
             logger.error(f"{symbol}: 无法识别日期列")
             raise ValueError(f"{symbol}: DataFrame必须有日期索引或date列")
         
-        # 日期格式标准化
-        zipline_df['date'] = pd.to_datetime(zipline_df['date']).dt.strftime('%Y-%m-%d')
+        # 日期格式标准化：datetime64[D] 直接转 'YYYY-MM-DD'（C 层定长转换，替代逐行 strftime）
+        dates = pd.to_datetime(zipline_df['date'])
+        if dates.dt.tz is not None:
+            dates = dates.dt.tz_localize(None)   # 与 strftime 一致：按本地墙钟日期
+        d = dates.to_numpy(dtype='datetime64[D]')
+        date_str = d.astype('U10').astype(object)
+        date_str[np.isnat(d)] = np.nan          # NaT 保持缺失，交给下方日期校验
+        zipline_df['date'] = date_str
         
         # 确保列顺序和类型
         zipline_df = zipline_df[['date', 'open', 'high', 'low', 'close', 'volume']].copy()
         
-        # 确保数值列类型正确
+        # 数值列类型已由 _validate_ohlcv_data 保证，这里不再重复 to_numeric
         numeric_cols = ['open', 'high', 'low', 'close', 'volume']
-        for col in numeric_cols:
-            zipline_df[col] = pd.to_numeric(zipline_df[col], errors='coerce')
         
         # 按日期排序
         zipline_df = zipline_df.sort_values('date').reset_index(drop=True)
@@ -231,7 +342,7 @@ class ZiplineExporter:
         if zipline_df['date'].isnull().any():
             raise ValueError(f"{symbol}: 日期列包含无效值")
         
-        if zipline_df[numeric_cols].isnull().any().any():
+        if _any_nan(zipline_df[numeric_cols]):
             logger.warning(f"{symbol}: 数值列包含NaN")
         
         return zipline_df
@@ -242,17 +353,19 @@ class ZiplineExporter:
         start_date: str,
         end_date: str,
         freq: str = "1d",
-        adjust: str = "pre"
+        adjust: str = "pre",
+        final_for_ingest: bool = True
     ) -> bool:
         """
         导出单个标的到Zipline CSV
         
         参数：
-          symbol     : 标的代码
-          start_date : 开始日期 'YYYY-MM-DD'
-          end_date   : 结束日期 'YYYY-MM-DD'
-          freq       : 数据频率
-          adjust     : 复权类型
+          symbol          : 标的代码
+          start_date      : 开始日期 'YYYY-MM-DD'
+          end_date        : 结束日期 'YYYY-MM-DD'
+          freq            : 数据频率
+          adjust          : 复权类型
+          final_for_ingest: 是否生成供 ingest 的 CSV；cache_format 非 csv 且为 False 时只写中间缓存
           
         返回：
           是否成功导出
@@ -288,14 +401,24 @@ class ZiplineExporter:
             # 5. 生成文件名（使用代码主体，去掉交易所后缀）
             clean_symbol = symbol.split('.')[0].upper()
             output_file = self.output_dir / f"{clean_symbol}.csv"
+            write_csv = self.cache_format == "csv" or final_for_ingest
             
             # 6. 检查是否覆盖
+            if self.cache_format != "csv":
+                cache_file = output_file.with_suffix(_CACHE_SUFFIX[self.cache_format])
+                if self.overwrite_existing or not cache_file.exists():
+                    self._write_cache(zipline_df, cache_file)
+                    logger.info(f"缓存写入: {cache_file} ({len(zipline_df)} 行)")
+            
+            if not write_csv:
+                return True
+            
             if output_file.exists() and not self.overwrite_existing:
                 logger.info(f"文件已存在，跳过: {output_file}")
                 return True
             
             # 7. 写入CSV文件
-            zipline_df.to_csv(output_file, index=False, float_format='%.4f')
+            write_ohlcv_csv(zipline_df, output_file)
             
             logger.info(f"导出成功: {output_file} ({len(zipline_df)} 行)")
             return True
@@ -311,7 +434,8 @@ class ZiplineExporter:
         end_date: str,
         freq: str = "1d",
         adjust: str = "pre",
-        max_failures: int = 5
+        max_failures: int = 5,
+        final_for_ingest: bool = True
     ) -> Dict[str, bool]:
         """
         批量导出多个标的
@@ -323,6 +447,7 @@ class ZiplineExporter:
           freq        : 数据频率
           adjust      : 复权类型
           max_failures: 最大失败数，超过则停止
+          final_for_ingest: 是否生成供 ingest 的 CSV（见 export_single_symbol）
           
         返回：
           {symbol: success} 导出结果字典
@@ -332,34 +457,132 @@ class ZiplineExporter:
         
         logger.info(f"开始批量导出: {len(symbols)} 个标的")
         
-        for i, symbol in enumerate(symbols, 1):
-            try:
-                success = self.export_single_symbol(symbol, start_date, end_date, freq, adjust)
-                results[symbol] = success
+        if self.max_workers > 1 and len(symbols) > 1:
+            results = self._export_batch_parallel(symbols, start_date, end_date, freq, adjust,
+                                                  max_failures, final_for_ingest)
+        else:
+            for i, symbol in enumerate(symbols, 1):
+                try:
+                    success = self.export_single_symbol(symbol, start_date, end_date, freq, adjust,
+                                                        final_for_ingest)
+                    results[symbol] = success
+                    
+                    if not success:
+                        failures += 1
+                        if failures > max_failures:
+                            logger.error(f"失败次数超过限制 ({max_failures})，停止批量导出")
+                            break
+                    
+                    # 进度提示
+                    if i % 10 == 0 or i == len(symbols):
+                        success_count = sum(results.values())
+                        logger.info(f"进度: {i}/{len(symbols)}, 成功: {success_count}, 失败: {i - success_count}")
+                        
+                except KeyboardInterrupt:
+                    logger.info("用户中断批量导出")
+                    break
+                except Exception as e:
+                    logger.error(f"批量导出异常: {symbol}, 错误: {e}")
+                    results[symbol] = False
+                    failures += 1
+        
+        success_count = sum(results.values())
+        logger.info(f"批量导出完成: 总计 {len(results)}, 成功 {success_count}, 失败 {len(results) - success_count}")
+        
+        return results
+
+    def _export_batch_parallel(
+        self,
+        symbols: List[str],
+        start_date: str,
+        end_date: str,
+        freq: str,
+        adjust: str,
+        max_failures: int,
+        final_for_ingest: bool
+    ) -> Dict[str, bool]:
+        """
+        并发导出：取数以网络 I/O 为主，线程池即可重叠各标的的等待时间
+        失败数超过 max_failures 时取消尚未开始的任务；结果按输入顺序返回
+        """
+        done: Dict[str, bool] = {}
+        failures = 0
+        
+        executor = ThreadPoolExecutor(max_workers=min(self.max_workers, len(symbols)))
+        try:
+            futures = {
+                executor.submit(self.export_single_symbol, symbol, start_date, end_date, freq, adjust,
+                                final_for_ingest): symbol
+                for symbol in symbols
+            }
+            for i, future in enumerate(as_completed(futures), 1):
+                symbol = futures[future]
+                try:
+                    success = future.result()
+                except Exception as e:
+                    logger.error(f"批量导出异常: {symbol}, 错误: {e}")
+                    success = False
+                done[symbol] = success
                 
                 if not success:
                     failures += 1
                     if failures > max_failures:
                         logger.error(f"失败次数超过限制 ({max_failures})，停止批量导出")
+                        for f in futures:
+                            f.cancel()
                         break
                 
                 # 进度提示
                 if i % 10 == 0 or i == len(symbols):
-                    success_count = sum(results.values())
+                    success_count = sum(done.values())
                     logger.info(f"进度: {i}/{len(symbols)}, 成功: {success_count}, 失败: {i - success_count}")
-                    
-            except KeyboardInterrupt:
-                logger.info("用户中断批量导出")
-                break
-            except Exception as e:
-                logger.error(f"批量导出异常: {symbol}, 错误: {e}")
-                results[symbol] = False
-                failures += 1
+        except KeyboardInterrupt:
+            logger.info("用户中断批量导出")
+            for f in futures:
+                f.cancel()
+        finally:
+            executor.shutdown(wait=True)
+        
+        return {symbol: done[symbol] for symbol in symbols if symbol in done}
+
+    def _write_cache(self, df: pd.DataFrame, path: Path) -> None:
+        """写中间缓存（列式，按 cache_format）"""
+        if self.cache_format == "parquet":
+            df.to_parquet(path, engine="pyarrow", compression="zstd", index=False)
+        else:
+            df.to_feather(path)
+
+    def _read_exported(self, path: Path) -> pd.DataFrame:
+        """按后缀读取导出文件（CSV 或中间缓存）"""
+        if path.suffix == ".parquet":
+            return pd.read_parquet(path)
+        if path.suffix == ".feather":
+            return pd.read_feather(path)
+        if HAS_PYARROW:
+            # pyarrow 引擎：多线程列式解析；date 保持字符串，格式校验仍由调用方按 %Y-%m-%d 严格检查
+            return pd.read_csv(path, engine="pyarrow", dtype={"date": str})
+        return pd.read_csv(path)
+
+    def materialize_for_ingest(self) -> int:
+        """
+        把中间缓存批量转成 ingest 所需的 CSV（cache_format 为 csv 时无事可做）
         
-        success_count = sum(results.values())
-        logger.info(f"批量导出完成: 总计 {len(results)}, 成功 {success_count}, 失败 {len(results) - success_count}")
+        返回：
+          生成的 CSV 文件数
+        """
+        if self.cache_format == "csv":
+            return 0
         
-        return results
+        count = 0
+        for cache_file in self.output_dir.glob(f"*{_CACHE_SUFFIX[self.cache_format]}"):
+            output_file = cache_file.with_suffix(".csv")
+            if output_file.exists() and not self.overwrite_existing:
+                continue
+            write_ohlcv_csv(self._read_exported(cache_file), output_file)
+            count += 1
+        
+        logger.info(f"已生成 ingest CSV: {count} 个")
+        return count
 
     def validate_zipline_compatibility(self, check_sample: int = 5) -> bool:
         """
@@ -371,7 +594,10 @@ class ZiplineExporter:
         返回：
           是否兼容
         """
-        csv_files = list(self.output_dir.glob("*.csv"))
+        csv_files = _scan_files(self.output_dir, ".csv")
+        if not csv_files and self.cache_format != "csv":
+            # 尚未生成 ingest CSV 时，校验中间缓存文件
+            csv_files = _scan_files(self.output_dir, _CACHE_SUFFIX[self.cache_format])
         if not csv_files:
             logger.warning("输出目录中没有CSV文件")
             return False
@@ -384,8 +610,16 @@ class ZiplineExporter:
         
         for csv_file in sample_files:
             try:
+                # 快速预检：表头/末行不合规的 CSV 直接拒绝，省去整文件解析
+                if csv_file.suffix == ".csv":
+                    reason = _quick_reject_csv(csv_file)
+                    if reason:
+                        logger.error(f"{reason}: {csv_file}")
+                        all_valid = False
+                        continue
+                
                 # 读取文件
-                df = pd.read_csv(csv_file)
+                df = self._read_exported(csv_file)
                 
                 # 检查必需列
                 required_cols = ['date', 'open', 'high', 'low', 'close', 'volume']
@@ -413,7 +647,7 @@ class ZiplineExporter:
                         break
                 
                 # 检查NaN值
-                if df.isnull().any().any():
+                if _any_nan(df):
                     logger.error(f"文件包含NaN值: {csv_file}")
                     all_valid = False
                     continue
@@ -441,7 +675,8 @@ def export_for_zipline(
     freq: str = "1d",
     adjust: str = "pre",
     calendar_name: str = "XSHG",
-    validate: bool = True
+    validate: bool = True,
+    max_workers: int = 1
 ) -> bool:
     """
     便捷函数：导出数据为Zipline CSV格式
@@ -455,6 +690,7 @@ def export_for_zipline(
       adjust       : 复权类型
       calendar_name: 交易日历
       validate     : 是否验证兼容性
+      max_workers  : 并发导出线程数（默认 1 顺序执行）
       
     返回：
       是否成功
@@ -466,7 +702,8 @@ def export_for_zipline(
         output_dir=output_dir,
         calendar_name=calendar_name,
         validate_data=True,
-        overwrite_existing=True
+        overwrite_existing=True,
+        max_workers=max_workers
     )
     
     # 批量导出
@@ -5,6 +5,20 @@ import os
 import pathlib
 from typing import Dict, Any
 
+import numpy as np
+import pandas as pd
+
+# 可选加速：安装了 pyarrow 时用其 C++ CSV 写出器，否则走 np.savetxt
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# csvdir_equities 规范列顺序
+CSVDIR_COLUMNS = ["date", "open", "high", "low", "close", "volume"]
+
 def ensure_zipline_root(root: str | None = None) -> str:
     """
     中文说明：
@@ -44,3 +58,57 @@ def get_zipline_env_info() -> Dict[str, Any]:
 
     info["ZIPLINE_ROOT"] = os.environ.get("ZIPLINE_ROOT", "")
     return info
+
+def write_ohlcv_csv(df: pd.DataFrame, path: str | os.PathLike, engine: str = "auto") -> None:
+    """
+    中文说明：
+    - 按 csvdir 规范写出 date,open,high,low,close,volume（date 列为 YYYY-MM-DD 字符串）
+    - engine="pyarrow"（auto 且已安装 pyarrow 时默认）：浮点列先在 NumPy 中 round 到 4 位，
+      再交给 pyarrow.csv 列式写出；按最短形式书写，不补尾随 0（10.5 而非 10.5000）；
+      np.round 在末位恰为 5 的边界上可能与 "%.4f" 相差 1（如 10.12345 → 10.1234 而非 10.1235）；
+      整值浮点列（如对齐后的 volume）转 int64 按整数写出；pyarrow 对 |x|>=1e10 的浮点会用科学计数法，
+      遇到这类非整值浮点列时整体改走 numpy 引擎
+    - engine="numpy"：用 np.savetxt 按行整体格式化，输出与 to_csv(index=False, float_format="%.4f") 逐字节一致
+    - 数值列含 NaN 时回退 to_csv（保持空单元格写法）
+    """
+    if engine == "auto":
+        engine = "pyarrow" if HAS_PYARROW else "numpy"
+    if engine not in ("pyarrow", "numpy"):
+        raise ValueError(f"unknown engine: {engine}")
+
+    num = df[CSVDIR_COLUMNS[1:]]
+    if num.isna().to_numpy().any():
+        df[CSVDIR_COLUMNS].to_csv(path, index=False, float_format="%.4f")
+        return
+
+    is_int = [pd.api.types.is_integer_dtype(num[c]) for c in CSVDIR_COLUMNS[1:]]
+
+    if engine == "pyarrow":
+        cols = [pa.array(df["date"].to_numpy(dtype=object), type=pa.string())]
+        for c, ii in zip(CSVDIR_COLUMNS[1:], is_int):
+            arr = num[c].to_numpy()
+            if not ii:
+                # 保持 float64：float32 只有约 7 位有效数字，千元以上价格的第 4 位小数会失真
+                arr = np.round(arr.astype(np.float64), 4)
+                mag = np.abs(arr).max(initial=0.0)
+                if mag < 2.0 ** 63 and (arr == np.trunc(arr)).all():
+                    # 整值浮点（如 nan_to_num 后的 volume）按整数写，避免 2e+10 这类科学计数法
+                    arr = arr.astype(np.int64)
+                elif mag >= 1e10:
+                    # 非整值的大数 pyarrow 会写成科学计数法：跳出循环，整体走下方 numpy 引擎
+                    break
+            cols.append(pa.array(arr))
+        else:
+            table = pa.Table.from_arrays(cols, names=CSVDIR_COLUMNS)
+            # 表头自己写（pyarrow 会给表头加引号），数据行不加引号
+            with open(path, "wb") as f:
+                f.write((",".join(CSVDIR_COLUMNS) + "\n").encode("utf-8"))
+                pacsv.write_csv(table, f, write_options=pacsv.WriteOptions(
+                    include_header=False, quoting_style="none"))
+            return
+
+    fmt = ["%s"] + ["%d" if ii else "%.4f" for ii in is_int]
+    rows = np.column_stack([df["date"].to_numpy(dtype=object)] +
+                           [num[c].to_numpy().astype(object) for c in CSVDIR_COLUMNS[1:]])
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        np.savetxt(f, rows, fmt=fmt, delimiter=",", header=",".join(CSVDIR_COLUMNS), comments="")
@@ -1,8 +1,36 @@
 # -*- coding: utf-8 -*-
+import copy
+import os
+from functools import lru_cache
 from pathlib import Path
 import yaml
 
+# 优先用 libyaml 的 C 解析器（比纯 Python 的 SafeLoader 快数倍）；未编译 libyaml 时回退
+try:
+    from yaml import CSafeLoader as _SafeLoader
+except ImportError:
+    from yaml import SafeLoader as _SafeLoader
+
+_THRESHOLDS_PATH = Path(__file__).with_name("thresholds.yaml")
+
+@lru_cache(maxsize=1)
+def _parse_thresholds(mtime_ns) -> dict:
+    with _THRESHOLDS_PATH.open("r", encoding="utf-8") as f:
+        return yaml.load(f, Loader=_SafeLoader) or {}
+
+def thresholds_version():
+    """阈值文件版本号（mtime_ns；文件不存在为 None）。调用方可据此缓存由阈值派生的对象"""
+    try:
+        return os.stat(_THRESHOLDS_PATH).st_mtime_ns
+    except OSError:
+        return None
+
 def load_thresholds() -> dict:
-    cfg_path = Path(__file__).with_name("thresholds.yaml")
-    with cfg_path.open("r", encoding="utf-8") as f:
-        return yaml.safe_load(f) or {}
+    """
+    读取 thresholds.yaml；按文件 mtime 缓存解析结果，文件被修改后自动重新解析。
+    返回深拷贝：调用方可随意修改，不会污染缓存（拷贝远比重新解析 YAML 便宜）。
+    """
+    return copy.deepcopy(_parse_thresholds(thresholds_version()))
+
+# 强制下次重新解析（如测试中替换了阈值文件内容但 mtime 未变）
+load_thresholds.cache_clear = _parse_thresholds.cache_clear
@@ -5,29 +5,122 @@
 - 默认使用入参 ohlcv（字典：t/o/h/l/c/v），未提供则用自带 stub
 """
 
-from typing import Dict, Any, List
+from typing import Dict, Any
+import numpy as np
 import pandas as pd
 
 from .entry_signals import evaluate_signal, load_thresholds  # 复用现有信号判定
 from .risk_manager import RiskManager       # 复用三闸门/止盈止损/仓位逻辑
 
+# 可选加速：安装了 numba 时突破模式的状态机走 JIT 内核，否则用同一份纯 Python 实现
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
 
-def _stub_ohlcv(n: int = 30, start: str = "2024-01-01") -> Dict[str, List[float]]:
-    """用 pandas.date_range 生成合法的连续交易日，避免 2024-01-32 这类非法日期。"""
+# 出场原因编码（内核只处理数值，组装成交记录时再映射回字符串）
+_REASONS = ("target", "stop")
+
+# 传给 evaluate_signal 的滑动窗口在指标所需长度之外多留的 K 线数
+_SIGNAL_WINDOW_PAD = 5
+
+
+def _stub_ohlcv(n: int = 30, start: str = "2024-01-01") -> Dict[str, np.ndarray]:
+    """用 pandas.date_range 生成合法的连续交易日，避免 2024-01-32 这类非法日期；各列为 ndarray。"""
     idx = pd.date_range(start=start, periods=n, freq="D")   # 连续自然日（示例足够）
-    t = [d.strftime("%Y-%m-%d") for d in idx]
+    t = idx.strftime("%Y-%m-%d").to_numpy()
 
-    base = 10.0
-    # 用 enumerate 保证长度与日期一致
-    c = [base + i * 0.2 for i, _ in enumerate(idx)]         # 缓慢上行
-    o = [max(0.01, x - 0.05) for x in c]
-    h = [x * 1.01 for x in c]
-    l = [x * 0.99 for x in c]
-    v = [1000 + i * 20 for i, _ in enumerate(idx)]
+    i = np.arange(n)                                       # 与日期等长
+    c = 10.0 + i * 0.2                                     # 缓慢上行
+    o = np.maximum(0.01, c - 0.05)
+    h = c * 1.01
+    l = c * 0.99
+    v = 1000 + i * 20
 
     return {"t": t, "o": o, "h": h, "l": l, "c": c, "v": v}
 
 
+def _rolling_high(h: np.ndarray, look: int) -> np.ndarray:
+    """
+    每根bar的 N 日最高（含当日），等价于逐bar取 high[:i+1][-look:].max()
+    - 历史不足 look 根时取已有全部历史（min_periods=1）
+    - NaN 跳过，与 Series.max() 一致
+    - rolling().max() 为单调队列 O(N) 实现，与 look 无关
+    """
+    return pd.Series(h).rolling(look, min_periods=1).max().to_numpy()
+
+
+def _breakout_core(h, l, break_px, gate_ok, stop_px, tgt_px, start):
+    """
+    突破模式的逐bar状态机（与 run() 中通用循环的语义逐步一致）：
+    - 空仓且当bar闸门通过 -> 武装 stop-entry，触发价 break_px[i]
+    - 次bar high >= 触发价 -> 以触发价入场，止损/目标取武装那根预计算的 stop_px/tgt_px
+    - 持仓时次bar先看 high >= 目标，再看 low <= 止损
+    返回：(成交笔数, entry_idx, exit_idx, entry_px, exit_px, reason_code)
+    """
+    n = len(h)
+    entry_idx = np.empty(n, dtype=np.int64)
+    exit_idx = np.empty(n, dtype=np.int64)
+    entry_pxs = np.empty(n, dtype=np.float64)
+    exit_pxs = np.empty(n, dtype=np.float64)
+    reasons = np.empty(n, dtype=np.int64)
+    k = 0
+
+    in_pos = False
+    pending = -1          # 武装 stop-entry 的那根 bar；-1 表示未武装
+    e_idx = 0
+    e_px = 0.0
+    stop = 0.0
+    tgt = 0.0
+
+    for i in range(start, n):
+        if not in_pos and gate_ok[i]:
+            pending = i
+        if pending >= 0 and i + 1 < n and not in_pos:
+            if h[i + 1] >= break_px[pending]:
+                e_idx = i + 1
+                e_px = break_px[pending]
+                stop = stop_px[pending]
+                tgt = tgt_px[pending]
+                in_pos = True
+                pending = -1
+        if in_pos and i + 1 < n:
+            code = -1
+            x_px = 0.0
+            if h[i + 1] >= tgt:
+                code = 0
+                x_px = tgt
+            elif l[i + 1] <= stop:
+                code = 1
+                x_px = stop
+            if code >= 0:
+                entry_idx[k] = e_idx
+                exit_idx[k] = i + 1
+                entry_pxs[k] = e_px
+                exit_pxs[k] = x_px
+                reasons[k] = code
+                k += 1
+                in_pos = False
+    return k, entry_idx, exit_idx, entry_pxs, exit_pxs, reasons
+
+
+if HAS_NUMBA:
+    _breakout_core_jit = njit(cache=True)(_breakout_core)
+
+
+def _trade_record(entry_idx, exit_idx, entry_px, exit_px, reason) -> Dict[str, Any]:
+    """成交记录（以每股1股计，只统计每股盈亏）"""
+    return {
+        "entry_index": int(entry_idx),
+        "exit_index": int(exit_idx),
+        "entry_px": round(entry_px, 4),
+        "exit_px": round(exit_px, 4),
+        "reason": reason,
+        "pnl": round(exit_px - entry_px, 4)
+    }
+
+
 class SimpleBacktester:
     """极简回测：逐bar以收盘价作判定，次bar内用 high/low 触发固定目标/止损。"""
 
@@ -44,128 +137,89 @@ class SimpleBacktester:
 
     def run(self, ohlcv: Dict[str, Any] | None = None) -> Dict[str, Any]:
         data = ohlcv or _stub_ohlcv(40)
-        df = pd.DataFrame({
-            "t": data["t"], "open": data["o"], "high": data["h"],
-            "low": data["l"], "close": data["c"], "vol": data["v"]
-        })
+        # 一次性取出各列：ndarray 供切片视图（零拷贝传给 evaluate_signal），list 供逐bar标量访问
+        t_arr = pd.to_datetime(np.asarray(data["t"])).values
+        o_arr = np.asarray(data["o"], dtype=float)
+        h_arr = np.asarray(data["h"], dtype=float)
+        l_arr = np.asarray(data["l"], dtype=float)
+        c_arr = np.asarray(data["c"], dtype=float)
+        v_arr = np.asarray(data["v"])
+        h, l, c = h_arr.tolist(), l_arr.tolist(), c_arr.tolist()
+        n = len(c)
 
         cfg = load_thresholds().get("entry", {})
         b_cfg = cfg.get("breakout", {})
         look = int(b_cfg.get("lookback", 20))
         margin = float(b_cfg.get("margin", 0.005))
-
-        in_pos = False
-        entry_idx = None
-        entry_px = None
-        stop_px = None
-        tgt_px = None
-
-        trades = []
-        equity = [self.account_size]
-        cash = self.account_size
-
-        # 逐bar运行：用“当bar收盘价”生成计划；若满足则在“下一bar”内按 high/low 触发
-        i = 0
-        pending_breakout = None
-
-        while i < len(df):
-            # 至少要有若干历史供指标计算
-            if i < 5:
-                equity.append(cash)
-                i += 1
-                continue
-
-            # === 1) 判定 + 风控 ===
-            sub = df.iloc[: i + 1]
-            price = float(sub["close"].iloc[-1])
-
-            # 计算当前子区间的 N 日最高（含当日），并得出突破触发价
-            high_n = float(sub["high"].iloc[-look:].max())
-            break_price = high_n * (1.0 + margin)
-
-            signal = evaluate_signal({
-                "symbol": self.symbol,
-                "mode": self.mode,
-                "price": price,
-                "ohlcv": {
-                    "t": list(sub["t"]),
-                    "o": list(sub["open"]),
-                    "h": list(sub["high"]),
-                    "l": list(sub["low"]),
-                    "c": list(sub["close"]),
-                    "v": list(sub["vol"]),
-                }
-            })
-
-            gates = self.rm.evaluate_trade_gates({
-                "symbol": self.symbol,
-                "sector": self.sector,
-                "price": price
-            })
-
-            # === 2) 若允许入场，则记录入场价格与目标/止损，实际触发放到下一bar ===
-            # 非持仓时的入场判定
-            if not in_pos and gates.get("pass"):
-                if self.mode == "breakout":
-                    # 突破：当日只“武装”一个 stop-entry，真正入场放到下一根
-                    pending_breakout = break_price
-                else:
-                    # 其它模式：仍按当天信号真通过才即时入场
+        # evaluate_signal 的 pass 只依赖最近一段 K 线：MA 需末两根均线（ma_period+1 根），突破看 lookback 根；
+        # 多留几根余量。每bar只传这段窗口，DataFrame 构建与指标计算不再随回测长度增长
+        ma_period = int(cfg.get("pullback", {}).get("ma_period", 20))
+        win = max(look, ma_period + 1) + _SIGNAL_WINDOW_PAD
+
+        # 每根的 N 日最高（含当日）与突破触发价，整段一次算好
+        break_np = _rolling_high(h_arr, look) * (1.0 + margin)
+        break_arr = break_np.tolist()
+
+        # 三闸门只依赖入场价：收盘价（判定）与突破价（实际入场）两组价格一次算完，
+        # 循环内按下标取值，不再逐bar调用 evaluate_trade_gates
+        stop_np, tgt_np, pass_np = self.rm.vectorized_levels(np.vstack([c_arr, break_np]), self.sector)
+        # 与 evaluate_trade_gates 的 levels 口径一致：转成 Python float 后 round(…, 4)
+        stop_c = [round(x, 4) for x in stop_np[0].tolist()]
+        tgt_c = [round(x, 4) for x in tgt_np[0].tolist()]
+        pass_c = pass_np[0].tolist()
+        stop_b = [round(x, 4) for x in stop_np[1].tolist()]
+        tgt_b = [round(x, 4) for x in tgt_np[1].tolist()]
+
+        if self.mode == "breakout":
+            # 突破：当日只“武装”一个 stop-entry，次bar触发入场；整段状态机交给内核
+            if HAS_NUMBA:
+                res = _breakout_core_jit(h_arr, l_arr, break_np, pass_np[0],
+                                         np.asarray(stop_b), np.asarray(tgt_b), 5)
+            else:
+                res = _breakout_core(h, l, break_arr, pass_c, stop_b, tgt_b, 5)
+            k, ei, xi, ep, xp, rc = res
+            trades = [
+                _trade_record(a, b, e, x, _REASONS[r])
+                for a, b, e, x, r in zip(ei[:k].tolist(), xi[:k].tolist(), ep[:k].tolist(),
+                                         xp[:k].tolist(), rc[:k].tolist())
+            ]
+        else:
+            trades = []
+            in_pos = False
+            entry_idx = entry_px = stop_px = tgt_px = None
+
+            # 逐bar运行：用“当bar收盘价”判定，信号真通过才即时入场；次bar内按 high/low 检查出场
+            # 前 5 根不判定，留出指标计算所需历史
+            for i in range(5, n):
+                price = c[i]
+
+                # === 1) 风控 + 判定（仅空仓时才会用到，持仓期间跳过） ===
+                if not in_pos and pass_c[i]:
+                    lo = max(0, i + 1 - win)
+                    signal = evaluate_signal({
+                        "symbol": self.symbol,
+                        "mode": self.mode,
+                        "price": price,
+                        "ohlcv": {
+                            "t": t_arr[lo: i + 1], "o": o_arr[lo: i + 1], "h": h_arr[lo: i + 1],
+                            "l": l_arr[lo: i + 1], "c": c_arr[lo: i + 1], "v": v_arr[lo: i + 1],
+                        }
+                    })
                     if signal.get("pass"):
                         entry_idx = i
                         entry_px = price
-                        stop_px = float(gates["levels"]["stop"])
-                        tgt_px = float(gates["levels"]["target"])
+                        stop_px = stop_c[i]
+                        tgt_px = tgt_c[i]
                         in_pos = True
-                        pending_breakout = None
-                # 这里不扣现金（简化为不算持仓市值），只统计交易盈亏
-            # === 3) 下一bar内检查触发 ===
-            if pending_breakout is not None and (i + 1 < len(df)) and not in_pos:
-                nb = df.iloc[i + 1]
-                if float(nb["high"]) >= pending_breakout:
-                    # 以突破价入场；用该入场价重新计算风控关口（保持与实际一致）
-                    entry_idx = i + 1
-                    entry_px = float(pending_breakout)
-                    g2 = self.rm.evaluate_trade_gates({
-                        "symbol": self.symbol, "sector": self.sector, "price": entry_px
-                    })
-                    stop_px = float(g2["levels"]["stop"])
-                    tgt_px  = float(g2["levels"]["target"])
-                    in_pos = True
-                    pending_breakout = None
-                    
-            if in_pos and (i + 1 < len(df)):
-                nb = df.iloc[i + 1]
-                exit_idx = None
-                exit_px = None
-                exit_reason = None
-                # 先看是否到达目标
-                if float(nb["high"]) >= tgt_px:
-                    exit_idx = i + 1
-                    exit_px = tgt_px
-                    exit_reason = "target"
-                # 再看是否触发止损
-                elif float(nb["low"]) <= stop_px:
-                    exit_idx = i + 1
-                    exit_px = stop_px
-                    exit_reason = "stop"
-
-                if exit_idx is not None:
-                    pnl = (exit_px - entry_px)
-                    trades.append({
-                        "entry_index": int(entry_idx),
-                        "exit_index": int(exit_idx),
-                        "entry_px": round(entry_px, 4),
-                        "exit_px": round(exit_px, 4),
-                        "reason": exit_reason,
-                        "pnl": round(pnl, 4)
-                    })
-                    cash += pnl  # 简化：以每股1股计，累计每股盈亏
-                    in_pos = False
-                    entry_idx = entry_px = stop_px = tgt_px = None
 
-            equity.append(cash)
-            i += 1
+                # === 2) 下一bar内检查出场：先看目标，再看止损 ===
+                if in_pos and (i + 1 < n):
+                    if h[i + 1] >= tgt_px:
+                        trades.append(_trade_record(entry_idx, i + 1, entry_px, tgt_px, "target"))
+                        in_pos = False
+                    elif l[i + 1] <= stop_px:
+                        trades.append(_trade_record(entry_idx, i + 1, entry_px, stop_px, "stop"))
+                        in_pos = False
 
         wins = sum(1 for t in trades if t["pnl"] > 0)
         wr = (wins / len(trades)) if trades else 0.0
@@ -180,6 +234,6 @@ class SimpleBacktester:
                 "n_trades": len(trades),
                 "win_rate": round(wr, 4),
                 "pnl_total_per_share": round(total_pnl, 4),
-                "equity_points": len(equity)
+                "equity_points": n + 1   # 初始资金 + 每根bar一个点
             }
         }
@@ -4,166 +4,295 @@
 - 输入通过 HTTP POST 的 JSON；若未提供 ohlcv/intraday，则使用可离线自测的 Stub。
 - 输出包含：分时硬校验、策略子型校验、技术参考（MA/ATR）、建议止损位。
 """
+from dataclasses import dataclass
+from functools import lru_cache
+import math
 from typing import Dict, Any, List
+import numpy as np
 import pandas as pd
-from backend.config.settings import load_thresholds
-from backend.analysis.technical import ma, atr, pct
+from backend.config.settings import load_thresholds, thresholds_version
+from backend.analysis.technical import ma_tail, atr, atr_rows, pct
 from backend.core.risk_manager import RiskManager
 
+def _build_stub_df() -> pd.DataFrame:
+    """离线 Stub：构造一段单边略上行的 K 线方便自测（确定性数据，导入时构建一次）"""
+    n = 40                                   # 40 根
+    closes = 10.0 + np.arange(n) * 0.05
+    highs  = closes * (1 + 0.005)
+    lows   = closes * (1 - 0.005)
+    opens  = np.empty(n)
+    opens[0] = closes[0] * 0.998
+    opens[1:] = closes[:-1]
+    vols   = (1000 + np.arange(n) * 10).astype(float)
+    # 尾盘 10% 放量（可由阈值控制是否判警）
+    vols[int(n * 0.9):] *= 1.3
+    idx = pd.date_range("2024-01-01", periods=n, freq="D")
+    return pd.DataFrame({"open":opens,"high":highs,"low":lows,"close":closes,"volume":vols}, index=idx)
+
+_STUB_DF = _build_stub_df()
+
 def _df_from_payload(payload: Dict[str, Any]) -> pd.DataFrame:
+    # ohlcv 各列可为 list 或 ndarray（回测直接传切片视图，避免逐bar重建 list）
     o = (payload or {}).get("ohlcv")
     if o:
         df = pd.DataFrame({
             "open":  o["o"], "high": o["h"], "low": o["l"], "close": o["c"], "volume": o["v"]
         }, index=pd.to_datetime(o["t"]))
         return df
-    # ---- 离线 Stub：构造一段单边略上行的 K 线方便自测 ----
-    base = 10.0
-    closes = [base + i*0.05 for i in range(40)]  # 40 根
-    highs  = [c * (1 + 0.005) for c in closes]
-    lows   = [c * (1 - 0.005) for c in closes]
-    opens  = [closes[i-1] if i>0 else closes[0]*0.998 for i in range(len(closes))]
-    vols   = [1000 + i*10 for i in range(len(closes))]
-    # 尾盘 10% 放量（可由阈值控制是否判警）
-    for i in range(int(len(vols)*0.9), len(vols)):
-        vols[i] *= 1.3
-    idx = pd.date_range("2024-01-01", periods=len(closes), freq="D")
-    return pd.DataFrame({"open":opens,"high":highs,"low":lows,"close":closes,"volume":vols}, index=idx)
+    # ---- 离线 Stub：返回模块级预构建的 K 线（调用方只读，不再追加指标列，无需副本）----
+    return _STUB_DF
 
-def _intraday_from_payload(payload: Dict[str, Any], defaults: Dict[str, float]) -> Dict[str, float]:
+def _intraday_from_payload(payload: Dict[str, Any], defaults: "IntradayCfg") -> Dict[str, float]:
     it = (payload or {}).get("intraday") or {}
     return {
         "early_volume_ratio": float(it.get("first2h_vol_ratio", 0.55)),  # 默认给一个可通过的示例
         "tail_spike_ratio":  float(it.get("close_spike_ratio", 0.18))    # 默认不会触发警戒
     }
 
-def evaluate_signal(payload: Dict[str, Any]) -> Dict[str, Any]:
+# ===== 子型配置：按阈值文件版本构建一次，请求内不再逐项 .get()/float() =====
+@dataclass(frozen=True, slots=True)
+class IntradayCfg:
+    early_volume_min_ratio: float
+    tail_spike_max_ratio: float
+
+@dataclass(frozen=True, slots=True)
+class BreakoutCfg:
+    lookback: int
+    margin: float
+
+@dataclass(frozen=True, slots=True)
+class PullbackCfg:
+    ma_period: int
+    tolerance: float
+
+@dataclass(frozen=True, slots=True)
+class ReversalCfg:
+    min_body_pct: float
+    need_above_ma: bool
+
+@dataclass(frozen=True, slots=True)
+class FollowCfg:
+    min_gain_margin: float
+
+@dataclass(frozen=True, slots=True)
+class EntryCfg:
+    intraday: IntradayCfg
+    breakout: BreakoutCfg
+    pullback: PullbackCfg
+    reversal: ReversalCfg
+    follow: FollowCfg
+
+@lru_cache(maxsize=1)
+def _entry_cfg(version) -> EntryCfg:
+    """version 仅作缓存键（阈值文件 mtime）；文件变更后自动重建"""
     tcfg = load_thresholds().get("entry", {})
     intr_cfg   = tcfg.get("intraday", {})
     b_cfg      = tcfg.get("breakout", {})
     p_cfg      = tcfg.get("pullback", {})
     r_cfg      = tcfg.get("reversal", {})
     f_cfg      = tcfg.get("follow", {})
+    return EntryCfg(
+        intraday=IntradayCfg(
+            early_volume_min_ratio=float(intr_cfg.get("early_volume_min_ratio", 0.50)),
+            tail_spike_max_ratio=float(intr_cfg.get("tail_spike_max_ratio", 0.30)),
+        ),
+        breakout=BreakoutCfg(
+            lookback=int(b_cfg.get("lookback", 20)),
+            margin=float(b_cfg.get("margin", 0.005)),
+        ),
+        pullback=PullbackCfg(
+            ma_period=int(p_cfg.get("ma_period", 20)),
+            tolerance=float(p_cfg.get("tolerance", 0.02)),
+        ),
+        reversal=ReversalCfg(
+            min_body_pct=float(r_cfg.get("min_body_pct", 0.008)),
+            need_above_ma=bool(r_cfg.get("need_above_ma", True)),
+        ),
+        follow=FollowCfg(
+            min_gain_margin=float(f_cfg.get("min_gain_margin", 0.003)),
+        ),
+    )
+
+def load_entry_cfg() -> EntryCfg:
+    return _entry_cfg(thresholds_version())
+
+# ===== 子型规则：统一签名 (cfg, high_arr, close_for_check, last_close, prev_close, last_open, last_low, last_ma20, prev_ma20)
+#       返回 (mode_checks, mode_ok) =====
+def _check_breakout(cfg, high_arr, close_for_check, last_close, prev_close, last_open, last_low, last_ma20, prev_ma20):
+    c = cfg.breakout
+    high_n = np.fmax.reduce(high_arr[-c.lookback:])   # 跳过 NaN，同 Series.max()
+    eps = 1e-9
+    hn = float(high_n * (1 + c.margin))
+    mode_checks = {
+        "close_gt_highN": {
+            "close": close_for_check, 
+            "highN": hn,
+            "pass": (close_for_check + eps) >= hn
+        }
+    }
+    return mode_checks, mode_checks["close_gt_highN"]["pass"]
+
+def _check_pullback(cfg, high_arr, close_for_check, last_close, prev_close, last_open, last_low, last_ma20, prev_ma20):
+    ma_tol = last_ma20 * (1 + cfg.pullback.tolerance)
+    delta = pct(last_close, prev_close)
+    mode_checks = {
+        "above_ma": {
+            "close": last_close, "ma": last_ma20,
+            "pass": last_close > last_ma20
+        },
+        "needle_to_ma": {
+            "low": last_low, "ma_tol": ma_tol,
+            "pass": last_low <= ma_tol
+        },
+        "close_up": {
+            "delta_pct": delta,
+            "pass": delta > 0
+        }
+    }
+    return mode_checks, all(x["pass"] for x in mode_checks.values())
+
+def _check_reversal(cfg, high_arr, close_for_check, last_close, prev_close, last_open, last_low, last_ma20, prev_ma20):
+    c = cfg.reversal
+    body_pct = abs(last_close - last_open) / last_close
+    delta = pct(last_close, prev_close)
+    mode_checks = {
+        "body_min": {
+            "value": body_pct, "min": c.min_body_pct,
+            "pass": body_pct >= c.min_body_pct
+        },
+        "close_gt_prev": {
+            "value": delta,
+            "pass": delta > 0
+        }
+    }
+    if c.need_above_ma:
+        mode_checks["above_ma"] = {
+            "close": last_close, "ma": last_ma20,
+            "pass": last_close > last_ma20
+        }
+    return mode_checks, all(x["pass"] for x in mode_checks.values())
+
+def _check_follow(cfg, high_arr, close_for_check, last_close, prev_close, last_open, last_low, last_ma20, prev_ma20):
+    gain_margin = cfg.follow.min_gain_margin
+    ma_ok = last_close > last_ma20 and last_ma20 > prev_ma20
+    delta = pct(last_close, prev_close)
+    mode_checks = {
+        "ma_trend_up": {"pass": ma_ok},
+        "gain_margin": {
+            "value": delta,
+            "min": gain_margin,
+            "pass": delta >= gain_margin
+        }
+    }
+    return mode_checks, all(x["pass"] for x in mode_checks.values())
+
+_MODE_HANDLERS = {
+    "breakout": _check_breakout,
+    "pullback": _check_pullback,
+    "reversal": _check_reversal,
+    "follow":   _check_follow,
+}
+
+def _signal_result(payload: Dict[str, Any], cfg: EntryCfg, high_arr: np.ndarray,
+                   last_close: float, prev_close: float, last_open: float, last_low: float,
+                   last_ma20: float, prev_ma20: float, last_atr: float) -> Dict[str, Any]:
+    """由末根标量组装单只标的的判定结果（evaluate_signal 与批量版共用）"""
+    intr_cfg = cfg.intraday
 
     symbol = (payload or {}).get("symbol", "TEST")
     mode   = (payload or {}).get("mode", "breakout").lower()
 
-    df = _df_from_payload(payload)
-    df["ma20"]  = ma(df["close"], int(p_cfg.get("ma_period", 20)))
-    df["atr14"] = atr(df, 14)
-    last = df.iloc[-1]
-    prev = df.iloc[-2]
-
     # ★ 追加：统一用于判定的收盘价（若 payload 提供了 price，则优先使用）
     payload_price = float((payload or {}).get("price") or 0.0)
-    close_for_check = payload_price if payload_price > 0 else float(df["close"].iloc[-1])
+    close_for_check = payload_price if payload_price > 0 else last_close
 
     # -------- 分时硬指标 --------
     it = _intraday_from_payload(payload, intr_cfg)
     intr_checks = {
         "early_volume_ratio": {
             "value": it["early_volume_ratio"],
-            "min": float(intr_cfg.get("early_volume_min_ratio", 0.50)),
-            "pass": it["early_volume_ratio"] >= float(intr_cfg.get("early_volume_min_ratio", 0.50))
+            "min": intr_cfg.early_volume_min_ratio,
+            "pass": it["early_volume_ratio"] >= intr_cfg.early_volume_min_ratio
         },
         "tail_spike_ratio": {
             "value": it["tail_spike_ratio"],
-            "max": float(intr_cfg.get("tail_spike_max_ratio", 0.30)),
-            "pass": it["tail_spike_ratio"] <= float(intr_cfg.get("tail_spike_max_ratio", 0.30))
+            "max": intr_cfg.tail_spike_max_ratio,
+            "pass": it["tail_spike_ratio"] <= intr_cfg.tail_spike_max_ratio
         }
     }
     intr_ok = all(x["pass"] for x in intr_checks.values())
 
-    # -------- 子型规则 --------
-    mode_checks: Dict[str, Any] = {}
-    mode_ok = False
-
-    if mode == "breakout":
-        look = int(b_cfg.get("lookback", 20))
-        margin = float(b_cfg.get("margin", 0.005))
-        high_n = df["high"].iloc[-look:].max()
-        eps = 1e-9
-        hn = float(high_n * (1 + margin))
-        mode_checks = {
-            "close_gt_highN": {
-                "close": close_for_check, 
-                "highN": hn,
-                "pass": (close_for_check + eps) >= hn
-            }
-        }
-        mode_ok = mode_checks["close_gt_highN"]["pass"]
-
-    elif mode == "pullback":
-        maper = int(p_cfg.get("ma_period", 20))
-        tol   = float(p_cfg.get("tolerance", 0.02))
-        mode_checks = {
-            "above_ma": {
-                "close": float(last["close"]), "ma": float(last["ma20"]),
-                "pass": float(last["close"]) > float(last["ma20"])
-            },
-            "needle_to_ma": {
-                "low": float(last["low"]), "ma_tol": float(last["ma20"] * (1 + tol)),
-                "pass": float(last["low"]) <= float(last["ma20"] * (1 + tol))
-            },
-            "close_up": {
-                "delta_pct": pct(float(last["close"]), float(prev["close"])),
-                "pass": pct(float(last["close"]), float(prev["close"])) > 0
-            }
-        }
-        mode_ok = all(x["pass"] for x in mode_checks.values())
-
-    elif mode == "reversal":
-        body_pct = abs(float(last["close"]) - float(last["open"])) / float(last["close"])
-        need_above_ma = bool(r_cfg.get("need_above_ma", True))
-        mode_checks = {
-            "body_min": {
-                "value": body_pct, "min": float(r_cfg.get("min_body_pct", 0.008)),
-                "pass": body_pct >= float(r_cfg.get("min_body_pct", 0.008))
-            },
-            "close_gt_prev": {
-                "value": pct(float(last["close"]), float(prev["close"])),
-                "pass": pct(float(last["close"]), float(prev["close"])) > 0
-            }
-        }
-        if need_above_ma:
-            mode_checks["above_ma"] = {
-                "close": float(last["close"]), "ma": float(last["ma20"]),
-                "pass": float(last["close"]) > float(last["ma20"])
-            }
-        mode_ok = all(x["pass"] for x in mode_checks.values())
-
-    elif mode == "follow":
-        gain_margin = float(f_cfg.get("min_gain_margin", 0.003))
-        ma_ok = float(last["close"]) > float(last["ma20"]) and float(df["ma20"].iloc[-1]) > float(df["ma20"].iloc[-2])
-        mode_checks = {
-            "ma_trend_up": {"pass": ma_ok},
-            "gain_margin": {
-                "value": pct(float(last["close"]), float(prev["close"])),
-                "min": gain_margin,
-                "pass": pct(float(last["close"]), float(prev["close"])) >= gain_margin
-            }
-        }
-        mode_ok = all(x["pass"] for x in mode_checks.values())
-
-    else:
-        mode_checks = {"error": f"unknown mode: {mode}"}
+    # -------- 子型规则：一次查表分派 --------
+    handler = _MODE_HANDLERS.get(mode)
+    if handler is None:
+        mode_checks: Dict[str, Any] = {"error": f"unknown mode: {mode}"}
         mode_ok = False
+    else:
+        mode_checks, mode_ok = handler(
+            cfg, high_arr, close_for_check,
+            last_close, prev_close, last_open, last_low, last_ma20, prev_ma20
+        )
 
     # 建议止损（ATR 1.5 倍）
-    atrv = float(last["atr14"]) if pd.notna(last["atr14"]) else 0.0
-    stop = float(last["close"]) - 1.5 * atrv
-    risk_pct = (1.5 * atrv / float(last["close"])) if last["close"] else 0.0
+    atrv = 0.0 if math.isnan(last_atr) else last_atr
+    stop = last_close - 1.5 * atrv
+    risk_pct = (1.5 * atrv / last_close) if last_close else 0.0
 
     return {
         "symbol": symbol,
         "mode": mode,
         "intraday_checks": intr_checks,
         "mode_checks": mode_checks,
-        "tech": {"ma20": float(last["ma20"]), "atr14": atrv},
+        "tech": {"ma20": last_ma20, "atr14": atrv},
         "suggested_stop": {"price": round(stop, 4), "risk_pct": round(risk_pct, 4)},
         "pass": bool(intr_ok and mode_ok)
     }
 
+def evaluate_signal(payload: Dict[str, Any]) -> Dict[str, Any]:
+    cfg = load_entry_cfg()
+
+    df = _df_from_payload(payload)
+    # 下游只读末两根 MA 与末根 ATR：MA 只算尾部两个窗口；ATR 递推需整列，但不再写回 df
+    close_arr = df["close"].to_numpy(dtype=float)
+    prev_ma20, last_ma20 = (float(v) for v in ma_tail(close_arr, cfg.pullback.ma_period, 2))
+    last_atr   = float(atr(df, 14).to_numpy()[-1])
+    # 末两根的标量一次取成 Python float，避免 iloc 行 Series 的构建与逐个标签查找
+    last_close, prev_close = float(close_arr[-1]), float(close_arr[-2])
+    last_open  = float(df["open"].iat[-1])
+    last_low   = float(df["low"].iat[-1])
+
+    return _signal_result(payload, cfg, df["high"].to_numpy(dtype=float),
+                          last_close, prev_close, last_open, last_low, last_ma20, prev_ma20, last_atr)
+
+def evaluate_signals_batch(payloads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    批量版 evaluate_signal（自选股/观察池）：阈值只取一次；等长 K 线按行堆叠成 (N, T)，
+    MA 尾值与 ATR 在矩阵上一次算完，再逐只组装结果。返回顺序与输入一致，单只结果与 evaluate_signal 相同
+    """
+    cfg = load_entry_cfg()
+    payloads = list(payloads or [])
+    frames = [_df_from_payload(p) for p in payloads]
+
+    groups: Dict[int, List[int]] = {}
+    for i, df in enumerate(frames):
+        groups.setdefault(len(df), []).append(i)
+
+    results: List[Dict[str, Any]] = [None] * len(payloads)
+    for idx in groups.values():
+        cols = {c: np.stack([frames[i][c].to_numpy(dtype=float) for i in idx])
+                for c in ("open", "high", "low", "close")}
+        closes = cols["close"]
+        ma2  = ma_tail(closes, cfg.pullback.ma_period, 2)
+        atrs = atr_rows(cols["high"], cols["low"], closes, 14)[:, -1]
+        for r, i in enumerate(idx):
+            results[i] = _signal_result(
+                payloads[i], cfg, cols["high"][r],
+                float(closes[r, -1]), float(closes[r, -2]),
+                float(cols["open"][r, -1]), float(cols["low"][r, -1]),
+                float(ma2[r, 1]), float(ma2[r, 0]), float(atrs[r])
+            )
+    return results
+
 """
 在入场信号模块内，聚合完整交易计划（不新增新文件，遵循 README 架构）。
 """
@@ -192,42 +321,44 @@ def build_trade_plan(payload: Dict[str, Any]) -> Dict[str, Any]:
     signal_pass = bool(signal.get("pass"))
 
     # 2) 风控三闸门（RR/胜率/净期望）
+    #    gates / 仓位 / 撤退剧本在同一 memo_scope 内，共用一次 K 线、宏观与轮动评估
     rm = RiskManager.load_from_config()
-    gates = rm.evaluate_trade_gates({"symbol": symbol, "sector": sector, "price": price})
-    gates_pass = bool(gates.get("pass"))
+    with rm.memo_scope():
+        gates = rm.evaluate_trade_gates({"symbol": symbol, "sector": sector, "price": price})
+        gates_pass = bool(gates.get("pass"))
 
-    # 3) 只有在“信号通过 + 三闸门通过”时才给出仓位与撤退剧本；否则仅返回建议为 HOLD
-    plan = {
-        "symbol": symbol,
-        "sector": sector,
-        "mode": (payload or {}).get("mode"),
-        "signal": signal,
-        "gates": gates,
-        "decision": "HOLD",          # 默认 HOLD
-        "position": None,
-        "exit_plan": None
-    }
+        # 3) 只有在“信号通过 + 三闸门通过”时才给出仓位与撤退剧本；否则仅返回建议为 HOLD
+        plan = {
+            "symbol": symbol,
+            "sector": sector,
+            "mode": (payload or {}).get("mode"),
+            "signal": signal,
+            "gates": gates,
+            "decision": "HOLD",          # 默认 HOLD
+            "position": None,
+            "exit_plan": None
+        }
+
+        if signal_pass and gates_pass:
+            # 3.1 仓位建议（止损优先用 gates 的 stop）
+            pos = rm.suggest_position({
+                "symbol": symbol, "sector": sector,
+                "account_size": account_size,
+                "price": price,
+                "stop": gates["levels"]["stop"]
+            })
+            # 3.2 撤退/执行剧本（目标优先用 gates 的 target）
+            ep = rm.build_exit_plan({
+                "symbol": symbol, "sector": sector,
+                "entry": price,
+                "stop": pos["levels"]["stop"],
+                "target": gates["levels"]["target"]
+            })
 
-    if signal_pass and gates_pass:
-        # 3.1 仓位建议（止损优先用 gates 的 stop）
-        pos = rm.suggest_position({
-            "symbol": symbol, "sector": sector,
-            "account_size": account_size,
-            "price": price,
-            "stop": gates["levels"]["stop"]
-        })
-        # 3.2 撤退/执行剧本（目标优先用 gates 的 target）
-        ep = rm.build_exit_plan({
-            "symbol": symbol, "sector": sector,
-            "entry": price,
-            "stop": pos["levels"]["stop"],
-            "target": gates["levels"]["target"]
-        })
-
-        plan.update({
-            "decision": "ENTER",     # 允许进场
-            "position": pos,
-            "exit_plan": ep
-        })
+            plan.update({
+                "decision": "ENTER",     # 允许进场
+                "position": pos,
+                "exit_plan": ep
+            })
 
     return plan
@@ -5,17 +5,70 @@
 - 所有函数均为纯计算：输入 Series/DataFrame，返回 Series/DataFrame
 - 不做任何数据拉取与缓存
 """
+from functools import partial
 from typing import Tuple, Optional
 import numpy as np
 import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+# 可选加速：安装了 numba 时 Wilder 平滑走单遍 JIT 递推，否则回退 pandas ewm
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+
+if HAS_NUMBA:
+    @njit(cache=True)
+    def _ewm_mean_kernel(x, alpha):
+        """
+        单遍递推，语义同 Series.ewm(alpha=alpha, adjust=False).mean()（ignore_na=False, min_periods=0）：
+        首个有效值之前为 NaN；缺失值期间旧权重继续衰减；递推式与 pandas 相同（含归一化除法），结果逐位一致
+        """
+        N = x.shape[0]
+        out = np.empty(N)
+        old_wt_factor = 1.0 - alpha
+        weighted = np.nan
+        old_wt = 1.0
+        for i in range(N):
+            cur = x[i]
+            is_obs = not np.isnan(cur)
+            if not np.isnan(weighted):
+                old_wt *= old_wt_factor
+                if is_obs:
+                    if weighted != cur:
+                        weighted = (old_wt * weighted + alpha * cur) / (old_wt + alpha)
+                    old_wt = 1.0
+            elif is_obs:
+                weighted = cur
+            out[i] = weighted
+        return out
+
+    # 导入时预热，避免首个请求承担编译开销
+    _ewm_mean_kernel(np.ones(2), 0.5)
+
+
+def _ewm_alpha(alpha: float) -> float:
+    """pandas 内部把 alpha 换算成 com 再换回：alpha' = 1/(1+(1-alpha)/alpha)，与 1/n 可能差 1ulp；照做以逐位一致"""
+    return 1.0 / (1.0 + (1.0 - alpha) / alpha)
+
+
+def _wilder_mean(x: np.ndarray, period: int, index, name=None) -> pd.Series:
+    """Wilder 平滑：EMA(alpha=1/period, adjust=False)"""
+    if HAS_NUMBA:
+        out = _ewm_mean_kernel(np.asarray(x, dtype=np.float64), _ewm_alpha(1.0 / period))
+        return pd.Series(out, index=index, name=name)
+    return pd.Series(x, index=index, name=name).ewm(alpha=1.0 / period, adjust=False).mean()
 
 
 # ===== 基础工具 =====
 def pct(a: float, b: float) -> float:
-    """安全百分比变化：(a-b)/b；对 b==0 做保护。"""
-    if b == 0 or b is None:
+    """安全百分比变化：(a-b)/b；对 b==0 / None 做保护。"""
+    if not b:
         return 0.0
-    return (float(a) - float(b)) / float(b)
+    b = float(b)
+    return (float(a) - b) / b
 
 
 def _as_series(x) -> pd.Series:
@@ -25,11 +78,23 @@ def _as_series(x) -> pd.Series:
     return pd.Series(x, dtype="float64")
 
 
+def _rolling_reduce(s: pd.Series, window: int, reduce) -> pd.Series:
+    """
+    等价 s.rolling(window, min_periods=window).<reduce>()：在 sliding_window_view 上直接沿末轴归约，
+    绕开 pandas rolling 引擎；窗口内含 NaN 时结果为 NaN（与 min_periods=window 一致）
+    """
+    arr = s.to_numpy(dtype=np.float64)
+    out = np.full(arr.shape, np.nan)
+    if 0 < window <= arr.size:
+        out[window - 1:] = reduce(sliding_window_view(arr, window), axis=-1)
+    return pd.Series(out, index=s.index, name=s.name)
+
+
 # ===== 移动平均 =====
 def ma(close: pd.Series, window: int) -> pd.Series:
     """简单移动平均（SMA）"""
     s = _as_series(close)
-    return s.rolling(window=window, min_periods=window).mean()
+    return _rolling_reduce(s, window, np.mean)
 
 
 def ema(close: pd.Series, span: int, adjust: bool = False) -> pd.Series:
@@ -44,19 +109,27 @@ def atr(df: pd.DataFrame, period: int = 14) -> pd.Series:
     Average True Range
     需要 DataFrame 包含列：high/low/close
     """
-    high = _as_series(df["high"])
-    low = _as_series(df["low"])
-    close = _as_series(df["close"])
-    prev_close = close.shift(1)
-
-    tr1 = (high - low).abs()
-    tr2 = (high - prev_close).abs()
-    tr3 = (prev_close - low).abs()
-    tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
+    # 直接取 float64 数组：已是 float 的列零拷贝，不再经 _as_series 生成中间 Series
+    h = df["high"].to_numpy(dtype=np.float64)
+    l = df["low"].to_numpy(dtype=np.float64)
+    c = df["close"].to_numpy(dtype=np.float64)
+    pc = np.empty_like(c)
+    pc[:1] = np.nan
+    pc[1:] = c[:-1]
+
+    # TR = max(|H-L|, |H-PC|, |PC-L|)：预分配缓冲 + out= 原地计算，避免 concat 出三列 DataFrame
+    # fmax 跳过 NaN，与 concat(...).max(axis=1) 口径一致
+    tr = np.subtract(h, l)
+    np.abs(tr, out=tr)
+    tmp = np.subtract(h, pc)
+    np.abs(tmp, out=tmp)
+    np.fmax(tr, tmp, out=tr)
+    np.subtract(pc, l, out=tmp)
+    np.abs(tmp, out=tmp)
+    np.fmax(tr, tmp, out=tr)
 
     # Wilder 平滑：等价于 EMA(alpha=1/period)
-    atr_series = tr.ewm(alpha=1.0 / period, adjust=False).mean()
-    return atr_series
+    return _wilder_mean(tr, period, df.index)
 
 
 def bollinger(close: pd.Series, window: int = 20, n_std: float = 2.0) -> pd.DataFrame:
@@ -64,8 +137,8 @@ def bollinger(close: pd.Series, window: int = 20, n_std: float = 2.0) -> pd.Data
     布林带：返回 mid/upper/lower
     """
     s = _as_series(close)
-    mid = s.rolling(window, min_periods=window).mean()
-    std = s.rolling(window, min_periods=window).std(ddof=0)
+    mid = _rolling_reduce(s, window, np.mean)
+    std = _rolling_reduce(s, window, partial(np.std, ddof=0))
     upper = mid + n_std * std
     lower = mid - n_std * std
     return pd.DataFrame({"mid": mid, "upper": upper, "lower": lower})
@@ -79,8 +152,8 @@ def rsi(close: pd.Series, period: int = 14) -> pd.Series:
     gain = delta.clip(lower=0.0)
     loss = (-delta).clip(lower=0.0)
 
-    avg_gain = gain.ewm(alpha=1.0 / period, adjust=False).mean()
-    avg_loss = loss.ewm(alpha=1.0 / period, adjust=False).mean()
+    avg_gain = _wilder_mean(gain.to_numpy(), period, s.index, s.name)
+    avg_loss = _wilder_mean(loss.to_numpy(), period, s.index, s.name)
 
     eps = 1e-12
     rs = avg_gain / (avg_loss + eps)
@@ -112,34 +185,43 @@ def stoch_kd(df: pd.DataFrame, k: int = 9, d: int = 3) -> pd.DataFrame:
     low = _as_series(df["low"])
     close = _as_series(df["close"])
 
-    ll = low.rolling(k, min_periods=k).min()
-    hh = high.rolling(k, min_periods=k).max()
+    ll = _rolling_reduce(low, k, np.min)
+    hh = _rolling_reduce(high, k, np.max)
     # 避免除以0
     denom = (hh - ll).replace(0, np.nan)
     k_fast = (close - ll) / denom * 100.0
-    k_slow = k_fast.rolling(d, min_periods=d).mean()
-    d_line = k_slow.rolling(d, min_periods=d).mean()
+    k_slow = _rolling_reduce(k_fast, d, np.mean)
+    d_line = _rolling_reduce(k_slow, d, np.mean)
     return pd.DataFrame({"k": k_slow, "d": d_line})
 
 
 # ===== 辅助（交叉判定等）=====
+def _tail2(x) -> np.ndarray:
+    """取末两根为 float 数组；Series/ndarray/list 只切尾部，不做整列 astype 拷贝"""
+    if isinstance(x, pd.Series):
+        return x.iloc[-2:].to_numpy(dtype=np.float64)
+    if isinstance(x, (np.ndarray, list, tuple)):
+        return np.asarray(x[-2:], dtype=np.float64)
+    return _as_series(x).iloc[-2:].to_numpy()
+
+
 def cross_over(a: pd.Series, b: pd.Series) -> bool:
     """
     a 上穿 b：当前 a>b 且上一根 a<=b
     """
-    a = _as_series(a)
-    b = _as_series(b)
+    a = _tail2(a)
+    b = _tail2(b)
     if len(a) < 2 or len(b) < 2:
         return False
-    return bool((a.iloc[-1] > b.iloc[-1]) and (a.iloc[-2] <= b.iloc[-2]))
+    return bool((a[-1] > b[-1]) and (a[-2] <= b[-2]))
 
 
 def cross_under(a: pd.Series, b: pd.Series) -> bool:
     """
     a 下穿 b：当前 a<b 且上一根 a>=b
     """
-    a = _as_series(a)
-    b = _as_series(b)
+    a = _tail2(a)
+    b = _tail2(b)
     if len(a) < 2 or len(b) < 2:
         return False
-    return bool((a.iloc[-1] < b.iloc[-1]) and (a.iloc[-2] >= b.iloc[-2]))
+    return bool((a[-1] < b[-1]) and (a[-2] >= b[-2]))
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from typing import Dict, Any
 from backend.config.settings import load_thresholds
@@ -20,13 +21,20 @@ class MacroFilter:
         hard = t.get("hard", {})
         soft = t.get("soft", {})
 
-        # --- 拉取数据（当前为 stub，可离线运行） ---
-        vix = get_vix()["value"]
-        gf  = get_global_futures_change()["value"]
+        # --- 拉取数据（无 akshare 时为 stub，可离线运行） ---
+        # 五路取数互不依赖且以网络等待为主：并发发起，总耗时取最慢一路而非相加
         ma_period = int(soft.get("ma_period", 50))
-        idx = get_index_above_ma(index="CSI300", period=ma_period)["above_ma"]
-        breadth = get_market_breadth()["value"]
-        nb = get_northbound_score()["value"]
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            vix_f = executor.submit(get_vix)
+            gf_f  = executor.submit(get_global_futures_change)
+            idx_f = executor.submit(get_index_above_ma, index="CSI300", period=ma_period)
+            br_f  = executor.submit(get_market_breadth)
+            nb_f  = executor.submit(get_northbound_score)
+            vix = vix_f.result()["value"]
+            gf  = gf_f.result()["value"]
+            idx = idx_f.result()["above_ma"]
+            breadth = br_f.result()["value"]
+            nb = nb_f.result()["value"]
 
         # --- 判定 ---
         hard_checks = {
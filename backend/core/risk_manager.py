@@ -1,6 +1,10 @@
 # -*- coding: utf-8 -*-
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 import math
+import threading
+import numpy as np
 import pandas as pd
 
 from backend.config.settings import load_thresholds
@@ -11,22 +15,210 @@ from backend.analysis.technical import atr
 from datetime import datetime, timedelta
 from backend.data.fetcher import get_ohlcv
 
+# 可选加速：安装了 numba 时 paper_run 的逐 tick 推进走 JIT 内核，否则用同一份纯 Python 实现
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
 
-_PAPER_STATE = {
-    "position": None,   # 当前持仓：{symbol, qty, entry, stop, target, highest, atr, trail_k, closed, exit_*}
-    "pnl": 0.0,         # 已实现盈亏（元）
-    "logs": []          # 事件日志（字符串）
-}
+
+@dataclass(slots=True)
+class _PaperState:
+    """纸上交易状态（进程内单例）；读写一律在 _PAPER_LOCK 内进行"""
+    position: Optional[dict] = None   # 当前持仓：{symbol, qty, entry, stop, target, highest, atr, trail_k, closed, exit_*}
+    pnl: float = 0.0                  # 已实现盈亏（元）
+    logs: list = field(default_factory=list)   # 事件日志（字符串）
+
+    def snapshot(self) -> Dict[str, Any]:
+        """对外返回（JSON）的浅拷贝，避免调用方在锁外看到或改动进行中的状态"""
+        return {
+            "position": dict(self.position) if self.position is not None else None,
+            "pnl": self.pnl,
+            "logs": list(self.logs),
+        }
+
+_PAPER = _PaperState()
+_PAPER_LOCK = threading.RLock()   # 多线程 Flask worker 并发开仓/推进时串行化
+
+# 出场原因编码（内核只处理数值，回到 Python 再映射成字符串）
+_PAPER_REASONS = ("target", "stop")
+
+def _paper_run_core(highs, lows, highest, stop, target, trail_k, atrv):
+    """
+    逐 tick 推进（与 paper_step 逐次调用同一口径）：更新最高价 → 移动止损 → 先止损后止盈
+    返回 (出场下标 或 -1, 出场价, 原因编码 或 -1, 最终最高价)
+    """
+    for i in range(highs.shape[0]):
+        hi = highs[i]
+        lo = lows[i]
+        if hi > highest:
+            highest = hi
+        trail_stop = highest - trail_k * atrv
+        curr_stop = trail_stop if trail_stop > stop else stop
+        if lo <= curr_stop:
+            return i, curr_stop, 1, highest
+        if hi >= target:
+            return i, target, 0, highest
+    return -1, 0.0, -1, highest
+
+if HAS_NUMBA:
+    _paper_run_core_jit = njit(cache=True)(_paper_run_core)
+
+def _build_stub_df() -> pd.DataFrame:
+    """离线 stub K 线（与 entry_signals 的 Stub 一致），附带 atr14；确定性数据，导入时构建一次"""
+    n = 40
+    closes = 10.0 + np.arange(n) * 0.05
+    opens = np.empty(n)
+    opens[0] = closes[0] * 0.998
+    opens[1:] = closes[:-1]
+    vols = (1000 + np.arange(n) * 10).astype(float)
+    vols[int(n * 0.9):] *= 1.3          # 尾盘 10% 放量
+    df = pd.DataFrame({
+        "open": opens, "high": closes * (1 + 0.005), "low": closes * (1 - 0.005),
+        "close": closes, "volume": vols
+    }, index=pd.date_range("2024-01-01", periods=n, freq="D"))
+    df["atr14"] = atr(df, 14)
+    return df
+
+def _tail_close_atr(df: pd.DataFrame):
+    """K 线末根 (close, atr14)，Python float；atr14 缺失时按 0.0"""
+    atrv = float(df["atr14"].to_numpy()[-1])
+    return float(df["close"].to_numpy()[-1]), (0.0 if math.isnan(atrv) else atrv)
+
+_STUB_DF = _build_stub_df()
+_STUB_LAST = _tail_close_atr(_STUB_DF)   # stub 确定不变，末根标量也只取一次
+
+# ===== 阈值常量：构造 RiskManager 时解析一次，各方法直接读字段，不再逐次 .get()/float() =====
+@dataclass(frozen=True, slots=True)
+class GatesCfg:
+    rr_min: float
+    pwin_min: float
+    ev_min: float
+    k_up: float
+    k_dn: float
+    clamp_pwin: tuple          # (lo, hi)，原样保留配置值
+
+@dataclass(frozen=True, slots=True)
+class PositionCfg:
+    lot_size: int
+    min_shares: int
+    fee_pct: float
+    slippage_pct: float
+    risk_pct_per_trade: float
+    max_position_pct: float
+
+@dataclass(frozen=True, slots=True)
+class ExitCfg:
+    k_up: float                # 已按 use_gates_k 在 gates / fallback 间取定
+    k_dn: float
+    trail_atr_k: float
+    time_stop_days: int
+    soft_break_even_R: float
+    partials: tuple            # ((r_multiple, pct), ...)
+    reconsider_macro_flip: bool
+    reconsider_rotation_fail: bool
+    reconsider_abnormal_gap_dn: bool
+
+def _gates_cfg(th: dict) -> GatesCfg:
+    cfg = th.get("gates", {})
+    lo, hi = cfg.get("clamp_pwin", [0.30, 0.80])
+    return GatesCfg(
+        rr_min=float(cfg.get("rr_min", 2.0)),
+        pwin_min=float(cfg.get("pwin_min", 0.60)),
+        ev_min=float(cfg.get("ev_net_min", 0.006)),
+        k_up=float(cfg.get("atr_k_up", 2.0)),
+        k_dn=float(cfg.get("atr_k_dn", 1.0)),
+        clamp_pwin=(lo, hi),
+    )
+
+def _position_cfg(th: dict) -> PositionCfg:
+    pcfg = th.get("position", {})
+    return PositionCfg(
+        lot_size=int(pcfg.get("lot_size", 100)),
+        min_shares=int(pcfg.get("min_shares", 100)),
+        fee_pct=float(pcfg.get("fee_pct", 0.0005)),
+        slippage_pct=float(pcfg.get("slippage_pct", 0.001)),
+        risk_pct_per_trade=float(pcfg.get("risk_pct_per_trade", 0.01)),
+        max_position_pct=float(pcfg.get("max_position_pct", 0.25)),
+    )
+
+def _exit_cfg(th: dict) -> ExitCfg:
+    gcfg = th.get("gates", {})
+    ecfg = th.get("exit") or {}
+    # exit.use_gates_k 时取 gates 的 ATR 倍数，否则取 exit 的 fallback
+    if bool(ecfg.get("use_gates_k", True)):
+        k_up = float(gcfg.get("atr_k_up", ecfg.get("fallback_atr_k_up", 2.0)))
+        k_dn = float(gcfg.get("atr_k_dn", ecfg.get("fallback_atr_k_dn", 1.0)))
+    else:
+        k_up = float(ecfg.get("fallback_atr_k_up", 2.0))
+        k_dn = float(ecfg.get("fallback_atr_k_dn", 1.0))
+    reconsider = (th.get("playbook") or {}).get("reconsider_on", {})
+    return ExitCfg(
+        k_up=k_up, k_dn=k_dn,
+        trail_atr_k=float(ecfg.get("trail_atr_k", 1.5)),
+        time_stop_days=int(ecfg.get("time_stop_days", 5)),
+        soft_break_even_R=float(ecfg.get("soft_break_even_R", 0.8)),
+        partials=tuple(
+            (float(p.get("r_multiple", 1.0)), float(p.get("pct", 0.5)))
+            for p in (ecfg.get("partial_take_profit", []) or [])
+        ),
+        reconsider_macro_flip=bool(reconsider.get("macro_flip", True)),
+        reconsider_rotation_fail=bool(reconsider.get("rotation_fail", True)),
+        reconsider_abnormal_gap_dn=bool(reconsider.get("abnormal_gap_dn", True)),
+    )
 
 class RiskManager:
     """风控模块：承载三闸门评估（RR / 胜率 / 净期望）"""
     def __init__(self, thresholds: dict):
         self.thresholds = thresholds
+        self.gates_cfg = _gates_cfg(thresholds)
+        self.position_cfg = _position_cfg(thresholds)
+        self.exit_cfg = _exit_cfg(thresholds)
+        self._memo = None   # memo_scope() 内有效：{key: 结果}
 
     @classmethod
     def load_from_config(cls):
         return cls(load_thresholds())
 
+    @contextmanager
+    def memo_scope(self):
+        """
+        在一次交易计划内复用 K 线 / 宏观 / 板块轮动的取数结果（gates → 仓位 → 撤退剧本会重复调用）。
+        退出即丢弃，跨请求不缓存；实例被多线程共享时不要使用（如 routes 里按 mtime 复用的实例）。
+        """
+        outer = self._memo is not None
+        if not outer:
+            self._memo = {}
+        try:
+            yield self
+        finally:
+            if not outer:
+                self._memo = None
+
+    def _memoized(self, key, fn, *args):
+        if self._memo is None:
+            return fn(*args)
+        if key not in self._memo:
+            self._memo[key] = fn(*args)
+        return self._memo[key]
+
+    def _df(self):
+        return self._memoized(("df",), self._load_df_stub)
+
+    def _macro(self) -> Dict[str, Any]:
+        return self._memoized(("macro",), lambda: MacroFilter.load_from_config().evaluate())
+
+    def _rot(self, sector) -> Dict[str, Any]:
+        return self._memoized(("rot", sector), lambda: SectorRotation.load_from_config().evaluate(sector))
+
+    def _last_bar(self):
+        """K 线末根 (close, atr14) 一次取成 Python float；atr14 缺失时按 0.0"""
+        def _read():
+            df = self._df()
+            return _STUB_LAST if df is _STUB_DF else _tail_close_atr(df)
+        return self._memoized(("last_bar",), _read)
+
     def _load_df_stub(self, symbol="000001.XSHE"):
         try:
             end = datetime.now().strftime("%Y-%m-%d")
@@ -35,30 +227,42 @@ class RiskManager:
             df["atr14"] = atr(df, 14)
             return df
         except Exception:
-            # 若网络或 Akshare 调用失败，沿用原来的 stub
-            base = 10.0
-            closes = [base + i*0.05 for i in range(40)]
-            ...
-            df["atr14"] = atr(df, 14)
-            return df
+            # 若网络或 Akshare 调用失败，沿用原来的 stub（导入时已算好 atr14；内部只读，直接返回共享对象）
+            return _STUB_DF
+
+    def _gate_context(self, sector: str) -> Dict[str, Any]:
+        """三闸门中与入场价无关的部分：阈值、ATR/最新收盘、胜率估计（宏观 + 板块）"""
+        cfg = self.gates_cfg
+        ctx = {
+            "rr_min":   cfg.rr_min,
+            "pwin_min": cfg.pwin_min,
+            "ev_min":   cfg.ev_min,
+            "k_up":     cfg.k_up,
+            "k_dn":     cfg.k_dn,
+        }
 
-    def evaluate_trade_gates(self, payload: Dict[str, Any]) -> Dict[str, Any]:
-        cfg = self.thresholds.get("gates", {})
-        rr_min    = float(cfg.get("rr_min", 2.0))
-        pwin_min  = float(cfg.get("pwin_min", 0.60))
-        ev_min    = float(cfg.get("ev_net_min", 0.006))
-        k_up      = float(cfg.get("atr_k_up", 2.0))
-        k_dn      = float(cfg.get("atr_k_dn", 1.0))
-        clamp_rng = cfg.get("clamp_pwin", [0.30, 0.80])
+        ctx["last_close"], ctx["atr"] = self._last_bar()
+
+        base_p = 0.50
+        mf = self._macro()
+        if bool(mf["summary"]["trade_permitted"]):
+            base_p += 0.10
+        rot = self._rot(sector or "AI")
+        if bool(rot["summary"]["recommend"]):
+            base_p += 0.05
+        lo, hi = cfg.clamp_pwin
+        ctx["pwin"] = max(lo, min(hi, base_p))
+        return ctx
 
+    def evaluate_trade_gates(self, payload: Dict[str, Any]) -> Dict[str, Any]:
         symbol = (payload or {}).get("symbol", "TEST")
         sector = (payload or {}).get("sector", "AI")
         price  = float((payload or {}).get("price") or 0.0)
 
-        df = self._load_df_stub()
-        last_close = float(df["close"].iloc[-1])
-        atrv = float(df["atr14"].iloc[-1]) if pd.notna(df["atr14"].iloc[-1]) else 0.0
-        close = price or last_close
+        ctx = self._gate_context(sector)
+        rr_min, pwin_min, ev_min = ctx["rr_min"], ctx["pwin_min"], ctx["ev_min"]
+        k_up, k_dn, atrv, pwin = ctx["k_up"], ctx["k_dn"], ctx["atr"], ctx["pwin"]
+        close = price or ctx["last_close"]
 
         target = close + k_up * atrv
         stop   = close - k_dn * atrv
@@ -68,16 +272,6 @@ class RiskManager:
 
         eps = 1e-9
 
-        base_p = 0.50
-        mf = MacroFilter.load_from_config().evaluate()
-        if bool(mf["summary"]["trade_permitted"]):
-            base_p += 0.10
-        rot = SectorRotation.load_from_config().evaluate(sector or "AI")
-        if bool(rot["summary"]["recommend"]):
-            base_p += 0.05
-        lo, hi = clamp_rng
-        pwin = max(lo, min(hi, base_p))
-
         ev_net = (pwin * upside - (1 - pwin) * downside) / close if close else 0.0
 
         checks = {
@@ -96,6 +290,39 @@ class RiskManager:
             "pass": bool(ok)
         }
 
+    def evaluate_trade_gates_batch(self, payloads) -> list:
+        """
+        批量版 evaluate_trade_gates：整批共用一个 memo_scope，K 线 / 宏观只评估一次，
+        板块轮动按板块各评估一次；逐只结果与单独调用一致，顺序与输入相同
+        """
+        with self.memo_scope():
+            return [self.evaluate_trade_gates(p) for p in (payloads or [])]
+
+    def vectorized_levels(self, prices, sector: str = "AI"):
+        """
+        evaluate_trade_gates 的数组版：一次取 ATR/胜率，对任意形状的价格数组逐元素给出
+        (stop, target, pass)，与逐个调用 evaluate_trade_gates 的结果一致（stop/target 未取整）。
+        价格为 0 时与标量版相同，回退到最新收盘价。
+        """
+        ctx = self._gate_context(sector)
+        k_up, k_dn, atrv, pwin = ctx["k_up"], ctx["k_dn"], ctx["atr"], ctx["pwin"]
+
+        prices = np.asarray(prices, dtype=float)
+        close = np.where(prices == 0, ctx["last_close"], prices)
+
+        target = close + k_up * atrv
+        stop   = close - k_dn * atrv
+        upside   = np.maximum(0.0, target - close)
+        downside = np.maximum(1e-12, close - stop)
+        rr = upside / downside
+
+        eps = 1e-9
+        ev_num = pwin * upside - (1 - pwin) * downside
+        ev_net = np.divide(ev_num, close, out=np.zeros_like(close), where=(close != 0))
+
+        ok = (rr + eps >= ctx["rr_min"]) & (pwin >= ctx["pwin_min"]) & (ev_net >= ctx["ev_min"])
+        return stop, target, ok
+
 # ===== 内部工具：提供 ATR/close，支持“离线可跑” =====
     def _ensure_price_atr(self, payload: Dict[str, Any]) -> Dict[str, float]:
         """
@@ -103,17 +330,9 @@ class RiskManager:
         返回：{"price": float, "atr": float}
         """
         price = float((payload or {}).get("price") or 0.0)
-        if price > 0:
-            # 有价格但无 ATR 时，仍需提供一个 ATR：用 stub 近似
-            df = self._load_df_stub()
-            atrv = float(df["atr14"].iloc[-1]) if pd.notna(df["atr14"].iloc[-1]) else 0.0
-            return {"price": price, "atr": atrv}
-
-        # 无价格 → 使用 stub
-        df = self._load_df_stub()
-        close = float(df["close"].iloc[-1])
-        atrv  = float(df["atr14"].iloc[-1]) if pd.notna(df["atr14"].iloc[-1]) else 0.0
-        return {"price": close, "atr": atrv}
+        close, atrv = self._last_bar()
+        # 有价格但无 ATR 时，仍需提供一个 ATR：用 stub 近似；无价格 → 使用 stub 收盘价
+        return {"price": price if price > 0 else close, "atr": atrv}
 
     # ===== 7.1 仓位管理：给出建议股数/名义金额/最大亏损 等 =====
     def suggest_position(self, payload: Dict[str, Any]) -> Dict[str, Any]:
@@ -128,43 +347,36 @@ class RiskManager:
           }
         返回：shares/qty/notional/max_loss/risk_pct_used 等
         """
-        cfg_all = self.thresholds
-        pcfg = cfg_all.get("position", {})
-        gcfg = cfg_all.get("gates", {})
-        ecfg = cfg_all.get("exit", {})
-
-        lot      = int(pcfg.get("lot_size", 100))
-        min_sh   = int(pcfg.get("min_shares", 100))
-        fee_pct  = float(pcfg.get("fee_pct", 0.0005))
-        slip_pct = float(pcfg.get("slippage_pct", 0.001))
-        risk_pct = float(pcfg.get("risk_pct_per_trade", 0.01))
-        max_pos  = float(pcfg.get("max_position_pct", 0.25))
+        pcfg = self.position_cfg
+        lot      = pcfg.lot_size
+        min_sh   = pcfg.min_shares
+        fee_pct  = pcfg.fee_pct
+        slip_pct = pcfg.slippage_pct
+        risk_pct = pcfg.risk_pct_per_trade
+        max_pos  = pcfg.max_position_pct
 
         acc = float((payload or {}).get("account_size") or 0.0)
         info = self._ensure_price_atr(payload)
         price, atrv = info["price"], info["atr"]
 
         # 止损：优先 payload.stop；否则基于 ATR 与 gates/exit 配置推导
+        k_up, k_dn = self.exit_cfg.k_up, self.exit_cfg.k_dn
         stop = (payload or {}).get("stop")
-        if stop is None:
-            use_gates_k = bool(ecfg.get("use_gates_k", True))
-            k_dn = float(gcfg.get("atr_k_dn", ecfg.get("fallback_atr_k_dn", 1.0))) if use_gates_k else float(ecfg.get("fallback_atr_k_dn", 1.0))
-            stop = price - k_dn * atrv
-        stop = float(stop)
+        stop = price - k_dn * atrv if stop is None else float(stop)
 
         # 风险 / 股数估算
         r_per_share = max(1e-6, price - stop)          # 单股风险（含滑点与费用可略微加大）
         r_per_share *= (1 + slip_pct)                  # 滑点近似
         risk_budget = acc * risk_pct                   # 单笔允许亏损
-        qty_raw     = math.floor(risk_budget / r_per_share)  # 理论股数
-        # 手数对齐与最小股数限制
-        qty = max(min_sh, (qty_raw // lot) * lot)
+        # 理论股数 → 手数对齐 → 最小股数限制，一步完成
+        # 商为负时 int() 截断与 floor 不同，但对齐后都 ≤0，被 min_sh 兜住；不用浮点 //，它与先除后取整会差 1
+        qty = max(min_sh, int(risk_budget / r_per_share) // lot * lot)
 
         # 最大仓位限制
         notional = qty * price
         max_notional = acc * max_pos
         if notional > max_notional:
-            qty = max(min_sh, (math.floor(max_notional / price) // lot) * lot)
+            qty = max(min_sh, int(max_notional / price) // lot * lot)
             notional = qty * price
 
         # 费用估计与最大亏损估计（含双边费率与滑点）
@@ -173,8 +385,6 @@ class RiskManager:
         risk_used_pct = max_loss / acc if acc > 0 else 0.0
 
         # 目标位（用于输出 R 参考）
-        use_gates_k = bool(ecfg.get("use_gates_k", True))
-        k_up = float(gcfg.get("atr_k_up", ecfg.get("fallback_atr_k_up", 2.0))) if use_gates_k else float(ecfg.get("fallback_atr_k_up", 2.0))
         target = price + k_up * atrv
         r_value = price - stop
 
@@ -212,47 +422,36 @@ class RiskManager:
           }
         返回：分批止盈、移动止损、时间止损、复核条件 等
         """
-        cfg_all = self.thresholds
-        gcfg = cfg_all.get("gates", {})
-        ecfg = cfg_all.get("exit", {})
-        pcfg = cfg_all.get("position", {})
+        ecfg = self.exit_cfg
 
         info = self._ensure_price_atr(payload)
         atrv = info["atr"]
         entry = float((payload or {}).get("entry") or info["price"])
 
-        # 目标与止损（复用 gates 或 fallback 配置）
-        use_gates_k = bool(ecfg.get("use_gates_k", True))
-        k_up = float(gcfg.get("atr_k_up", ecfg.get("fallback_atr_k_up", 2.0))) if use_gates_k else float(ecfg.get("fallback_atr_k_up", 2.0))
-        k_dn = float(gcfg.get("atr_k_dn", ecfg.get("fallback_atr_k_dn", 1.0))) if use_gates_k else float(ecfg.get("fallback_atr_k_dn", 1.0))
-
+        # 目标与止损（复用 gates 或 fallback 配置）；payload 给出的值才需要 float()
+        k_up, k_dn = ecfg.k_up, ecfg.k_dn
         stop   = (payload or {}).get("stop")
         target = (payload or {}).get("target")
-        if stop is None:   stop   = entry - k_dn * atrv
-        if target is None: target = entry + k_up * atrv
-        stop, target = float(stop), float(target)
+        stop   = entry - k_dn * atrv if stop is None else float(stop)
+        target = entry + k_up * atrv if target is None else float(target)
 
         # 分批止盈（以 R 倍与比例定义）
-        partials_cfg = ecfg.get("partial_take_profit", []) or []
         partials = []
-        for p in partials_cfg:
-            r_mul = float(p.get("r_multiple", 1.0))
-            pct   = float(p.get("pct", 0.5))
+        for r_mul, pct in ecfg.partials:
             level = entry + r_mul * (entry - stop)
             partials.append({"at_R": r_mul, "take_pct": pct, "price": round(level, 4)})
 
         # 移动止损（基于最高价 - trail_atr_k * ATR）
-        trail_k = float(ecfg.get("trail_atr_k", 1.5))
+        trail_k = ecfg.trail_atr_k
         trail_formula = "trailing_stop = rolling_max_high - trail_atr_k * ATR"
         # 时间止损/保本
-        time_stop_days = int(ecfg.get("time_stop_days", 5))
-        soft_be_R      = float(ecfg.get("soft_break_even_R", 0.8))
+        time_stop_days = ecfg.time_stop_days
+        soft_be_R      = ecfg.soft_break_even_R
         soft_be_price  = entry + soft_be_R * (entry - stop)
 
         # 复核条件（取宏观与轮动）
-        reconsider_cfg = (cfg_all.get("playbook") or {}).get("reconsider_on", {})
-        macro_ok = MacroFilter.load_from_config().evaluate()["summary"]["trade_permitted"]
-        rot_ok   = SectorRotation.load_from_config().evaluate((payload or {}).get("sector","AI"))["summary"]["recommend"]
+        macro_ok = self._macro()["summary"]["trade_permitted"]
+        rot_ok   = self._rot((payload or {}).get("sector","AI"))["summary"]["recommend"]
 
         return {
             "symbol": (payload or {}).get("symbol", "TEST"),
@@ -274,9 +473,9 @@ class RiskManager:
                 "rule": f"进场后{time_stop_days}日未达到0.5R~1R（示例为0.8R=软保本）则离场或降权"
             },
             "reconsider": {
-                "macro_flip_watch": bool(reconsider_cfg.get("macro_flip", True)),
-                "rotation_fail_watch": bool(reconsider_cfg.get("rotation_fail", True)),
-                "abnormal_gap_dn_watch": bool(reconsider_cfg.get("abnormal_gap_dn", True)),
+                "macro_flip_watch": ecfg.reconsider_macro_flip,
+                "rotation_fail_watch": ecfg.reconsider_rotation_fail,
+                "abnormal_gap_dn_watch": ecfg.reconsider_abnormal_gap_dn,
                 "current_macro_permitted": bool(macro_ok),
                 "current_rotation_recommend": bool(rot_ok)
             }
@@ -285,42 +484,44 @@ class RiskManager:
     # ===== 9.1 重置 / 查询 纸上状态 =====
     def paper_reset(self):
         """重置纸上交易状态（开发期便于反复测试）"""
-        global _PAPER_STATE
-        _PAPER_STATE = {"position": None, "pnl": 0.0, "logs": []}
-        return _PAPER_STATE
+        with _PAPER_LOCK:
+            _PAPER.position = None
+            _PAPER.pnl = 0.0
+            _PAPER.logs = []
+            return _PAPER.snapshot()
 
     def paper_state(self):
         """查看纸上交易当前状态"""
-        return _PAPER_STATE
+        with _PAPER_LOCK:
+            return _PAPER.snapshot()
 
     # ===== 9.2 开仓：依据聚合计划中的数量/价位建立持仓 =====
     def paper_open(self, *, symbol: str, qty: int, entry: float, stop: float, target: float, atr: float):
         """
         若已有持仓则拒绝；最小可跑，不做撮合细节。
         """
-        global _PAPER_STATE
-        if _PAPER_STATE["position"] is not None and not _PAPER_STATE["position"].get("closed"):
-            return {"ok": False, "error": "position_exists", "state": _PAPER_STATE}
-
         # trail_k 来自 exit 配置
-        ecfg = (self.thresholds.get("exit") or {})
-        trail_k = float(ecfg.get("trail_atr_k", 1.5))
-
-        _PAPER_STATE["position"] = {
-            "symbol": symbol,
-            "qty": int(qty),
-            "entry": float(entry),
-            "stop": float(stop),
-            "target": float(target),
-            "highest": float(entry),
-            "atr": float(atr),
-            "trail_k": trail_k,
-            "closed": False,
-            "exit_price": None,
-            "exit_reason": None,
-        }
-        _PAPER_STATE["logs"].append(f"OPEN {symbol} qty={qty} entry={entry} stop={stop} target={target}")
-        return {"ok": True, "state": _PAPER_STATE}
+        trail_k = self.exit_cfg.trail_atr_k
+
+        with _PAPER_LOCK:
+            if _PAPER.position is not None and not _PAPER.position.get("closed"):
+                return {"ok": False, "error": "position_exists", "state": _PAPER.snapshot()}
+
+            _PAPER.position = {
+                "symbol": symbol,
+                "qty": int(qty),
+                "entry": float(entry),
+                "stop": float(stop),
+                "target": float(target),
+                "highest": float(entry),
+                "atr": float(atr),
+                "trail_k": trail_k,
+                "closed": False,
+                "exit_price": None,
+                "exit_reason": None,
+            }
+            _PAPER.logs.append(f"OPEN {symbol} qty={qty} entry={entry} stop={stop} target={target}")
+            return {"ok": True, "state": _PAPER.snapshot()}
 
     # ===== 9.3 推进一步：更新最高价/移动止损；触发止损或止盈则平仓 =====
     def paper_step(self, *, price: float, high: float = None, low: float = None):
@@ -329,36 +530,74 @@ class RiskManager:
           - 若未持仓直接返回
           - 优先检查止损（含移动止损），再检查止盈；触发则以触发价成交
         """
-        global _PAPER_STATE
-        pos = _PAPER_STATE["position"]
-        if not pos or pos.get("closed"):
-            return {"ok": True, "state": _PAPER_STATE}
-
         px = float(price)
         hi = float(high) if high is not None else px
         lo = float(low)  if low  is not None else px
 
-        # 更新最高价与移动止损
-        pos["highest"] = max(pos["highest"], hi)
-        trail_stop = pos["highest"] - pos["trail_k"] * pos["atr"]
-        curr_stop = max(pos["stop"], trail_stop)
+        with _PAPER_LOCK:
+            pos = _PAPER.position
+            if not pos or pos.get("closed"):
+                return {"ok": True, "state": _PAPER.snapshot()}
+
+            # 更新最高价与移动止损（持仓字段一次取成局部变量）
+            highest = max(pos["highest"], hi)
+            pos["highest"] = highest
+            trail_stop = highest - pos["trail_k"] * pos["atr"]
+            stop, target = pos["stop"], pos["target"]
+            curr_stop = max(stop, trail_stop)
+
+            exit_reason = None
+            exit_price = None
+
+            # 先看止损（含移动止损），再看止盈（全量了结示例）
+            if lo <= curr_stop:
+                exit_reason, exit_price = "stop", curr_stop
+            elif hi >= target:
+                exit_reason, exit_price = "target", target
+
+            if exit_reason:
+                pnl = (exit_price - pos["entry"]) * pos["qty"]
+                _PAPER.pnl += pnl
+                pos.update({"closed": True, "exit_price": exit_price, "exit_reason": exit_reason})
+                _PAPER.logs.append(
+                    f"EXIT {pos['symbol']} reason={exit_reason} px={exit_price} pnl={pnl:.2f}"
+                )
+
+            return {"ok": True, "state": _PAPER.snapshot()}
+
+    # ===== 9.4 批量推进：整段行情一次跑完（回放/回测用），结果与逐 tick 调用 paper_step 一致 =====
+    def paper_run(self, prices, highs=None, lows=None):
+        """
+        prices/highs/lows 为等长序列；highs/lows 缺省时取 prices（同 paper_step 的 high/low 缺省）。
+        平仓即停止，返回 exit_index（未触发为 -1）与最新状态。
+        """
+        px = np.asarray(prices, dtype=np.float64)
+        hs = px if highs is None else np.asarray(highs, dtype=np.float64)
+        ls = px if lows is None else np.asarray(lows, dtype=np.float64)
+        # 内核按 highs 长度逐根读取 lows，长度不一会在 numba 下静默越界读取
+        if hs.shape != px.shape or ls.shape != px.shape:
+            raise ValueError(
+                f"prices/highs/lows 长度不一致: {px.shape} / {hs.shape} / {ls.shape}"
+            )
 
-        exit_reason = None
-        exit_price = None
+        with _PAPER_LOCK:
+            pos = _PAPER.position
+            if not pos or pos.get("closed"):
+                return {"ok": True, "exit_index": -1, "state": _PAPER.snapshot()}
 
-        # 先看止损（含移动止损），再看止盈（全量了结示例）
-        if lo <= curr_stop:
-            exit_reason, exit_price = "stop", curr_stop
-        elif hi >= pos["target"]:
-            exit_reason, exit_price = "target", pos["target"]
-
-        if exit_reason:
-            qty = pos["qty"]
-            pnl = (exit_price - pos["entry"]) * qty
-            _PAPER_STATE["pnl"] += pnl
-            pos.update({"closed": True, "exit_price": exit_price, "exit_reason": exit_reason})
-            _PAPER_STATE["logs"].append(
-                f"EXIT {pos['symbol']} reason={exit_reason} px={exit_price} pnl={pnl:.2f}"
+            core = _paper_run_core_jit if HAS_NUMBA else _paper_run_core
+            idx, exit_price, code, highest = core(
+                hs, ls, pos["highest"], pos["stop"], pos["target"], pos["trail_k"], pos["atr"]
             )
-
-        return {"ok": True, "state": _PAPER_STATE}
+            pos["highest"] = float(highest)
+
+            if idx >= 0:
+                exit_reason, exit_price = _PAPER_REASONS[code], float(exit_price)
+                pnl = (exit_price - pos["entry"]) * pos["qty"]
+                _PAPER.pnl += pnl
+                pos.update({"closed": True, "exit_price": exit_price, "exit_reason": exit_reason})
+                _PAPER.logs.append(
+                    f"EXIT {pos['symbol']} reason={exit_reason} px={exit_price} pnl={pnl:.2f}"
+                )
+
+            return {"ok": True, "exit_index": int(idx), "state": _PAPER.snapshot()}
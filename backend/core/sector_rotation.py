@@ -1,22 +1,51 @@
 # -*- coding: utf-8 -*-
-from dataclasses import dataclass
-from typing import Dict, Any
+from dataclasses import dataclass, field
+from typing import Any, Dict
 from backend.config.settings import load_thresholds
 from backend.data.fetcher import (
     get_sector_strength, get_sector_breadth, get_sector_time_continuation,
     get_sector_capital_ratio, get_sector_endorsements, get_hidden_funds
 )
 
-@dataclass
+@dataclass(frozen=True, slots=True)
+class _RotationCfg:
+    """rotation 阈值（构造时解析一次；保留配置原值，输出里的 min_* 与配置一致）"""
+    rank_change_min: Any
+    strength_score_min: Any
+    breadth_min: Any
+    time_days_min: Any
+    capital_ratio_min: Any
+    endorse_min_count: Any
+    hidden_funds_min: Any
+
+    @classmethod
+    def from_thresholds(cls, thresholds: dict) -> "_RotationCfg":
+        t = thresholds.get("rotation", {})
+        return cls(
+            rank_change_min=t.get("rank_change_min", 5),
+            strength_score_min=t.get("strength_score_min", 0.70),
+            breadth_min=t.get("breadth_min", 0.60),
+            time_days_min=t.get("time_continuation_days", 2),
+            capital_ratio_min=t.get("capital_ratio_min", 0.50),
+            endorse_min_count=t.get("endorsement_min_count", 1),
+            hidden_funds_min=t.get("hidden_funds_min", 0.55),
+        )
+
+@dataclass(frozen=True, slots=True)
 class SectorRotation:
     thresholds: dict
+    _cfg: _RotationCfg = field(init=False, repr=False)
+
+    # frozen：实例构造后不可改；阈值变更时重建实例（API 层按阈值文件 mtime 复用/重建，见 routes._cached）
+    def __post_init__(self):
+        object.__setattr__(self, "_cfg", _RotationCfg.from_thresholds(self.thresholds))
 
     @classmethod
     def load_from_config(cls):
         return cls(load_thresholds())
 
     def evaluate(self, sector: str = "AI") -> Dict[str, Any]:
-        t = self.thresholds.get("rotation", {})
+        t = self._cfg
         # 取数（当前为 stub，可离线）
         s = get_sector_strength(sector)
         b = get_sector_breadth(sector)
@@ -26,45 +55,54 @@ class SectorRotation:
         hf = get_hidden_funds(sector)
 
         # 阈值
-        rank_change_min     = t.get("rank_change_min", 5)
-        strength_score_min  = t.get("strength_score_min", 0.70)
-        breadth_min         = t.get("breadth_min", 0.60)
-        time_days_min       = t.get("time_continuation_days", 2)
-        capital_ratio_min   = t.get("capital_ratio_min", 0.50)
-        endorse_min_count   = t.get("endorsement_min_count", 1)
-        hidden_funds_min    = t.get("hidden_funds_min", 0.55)
+        rank_change_min     = t.rank_change_min
+        strength_score_min  = t.strength_score_min
+        breadth_min         = t.breadth_min
+        time_days_min       = t.time_days_min
+        capital_ratio_min   = t.capital_ratio_min
+        endorse_min_count   = t.endorse_min_count
+        hidden_funds_min    = t.hidden_funds_min
 
-        # 六步验证
+        # 六步验证：先算一次通过标志，checks 与计数共用
+        pass_flags = (
+            (s["rank_change"] >= rank_change_min) and (s["score"] >= strength_score_min),
+            b["pct"] >= breadth_min,
+            tc["days"] >= time_days_min,
+            cr["ratio"] >= capital_ratio_min,
+            en["count"] >= endorse_min_count,
+            hf["score"] >= hidden_funds_min,
+        )
+        p_strength, p_breadth, p_time, p_capital, p_endorse, p_hidden = pass_flags
         checks = {
             "strength": {
                 "rank": s["rank"], "rank_change": s["rank_change"], "score": s["score"],
                 "min_rank_change": rank_change_min, "min_score": strength_score_min,
-                "pass": (s["rank_change"] >= rank_change_min) and (s["score"] >= strength_score_min),
+                "pass": p_strength,
             },
             "breadth": {
                 "value": b["pct"], "min": breadth_min,
-                "pass": b["pct"] >= breadth_min,
+                "pass": p_breadth,
             },
             "time_continuation": {
                 "days": tc["days"], "min_days": time_days_min,
-                "pass": tc["days"] >= time_days_min,
+                "pass": p_time,
             },
             "capital_ratio": {
                 "value": cr["ratio"], "min": capital_ratio_min,
-                "pass": cr["ratio"] >= capital_ratio_min,
+                "pass": p_capital,
             },
             "endorsement": {
                 "lupang": en["lupang"], "etf_creation": en["etf_creation"], "northbound": en["northbound"],
                 "count": en["count"], "min_count": endorse_min_count,
-                "pass": en["count"] >= endorse_min_count,
+                "pass": p_endorse,
             },
             "hidden_funds": {
                 "value": hf["score"], "min": hidden_funds_min,
-                "pass": hf["score"] >= hidden_funds_min,
+                "pass": p_hidden,
             },
         }
 
-        passed = sum(1 for c in checks.values() if c["pass"])
+        passed = sum(pass_flags)
         total = len(checks)
         confirm = round(passed / total, 2)
 
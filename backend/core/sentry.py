@@ -19,30 +19,37 @@ class MarketSentry:
     """市场哨兵：负责硬性熔断与软性情绪评分的统一判定。"""
 
     def __init__(self, thresholds: Dict[str, Any] | None = None) -> None:
-        tcfg = thresholds or {}
-        scfg = (tcfg.get("sentry") or {})
+        scfg = (thresholds or {}).get("sentry") or {}
+        hard = scfg.get("hard") or {}
+        soft = scfg.get("soft") or {}
         # -------- 硬阈值（任一失败即 halt）--------
-        self.vix_max: float = float(scfg.get("hard", {}).get("vix_max", 25.0))
-        self.index_dd_max: float = float(scfg.get("hard", {}).get("index_dd_max", 0.08))  # 指数回撤最大值
+        self.vix_max: float = float(hard.get("vix_max", 25.0))
+        self.index_dd_max: float = float(hard.get("index_dd_max", 0.08))  # 指数回撤最大值
         # -------- 软阈值（通过越多越好）--------
-        self.breadth_min: float = float(scfg.get("soft", {}).get("breadth_min", 55.0))
-        self.north_min: float = float(scfg.get("soft", {}).get("northbound_min", 50.0))
-        self.sentiment_min: float = float(scfg.get("soft", {}).get("sentiment_min", 0.50))
-        self.soft_needed: int = int(scfg.get("soft", {}).get("min_pass_count", 2))  # 建议至少通过 2 项
+        self.breadth_min: float = float(soft.get("breadth_min", 55.0))
+        self.north_min: float = float(soft.get("northbound_min", 50.0))
+        self.sentiment_min: float = float(soft.get("sentiment_min", 0.50))
+        self.soft_needed: int = int(soft.get("min_pass_count", 2))  # 建议至少通过 2 项
 
     # ======= 数据源（当前为 Stub，与 MacroFilter 一致，后续接真数）=======
-    def _fetch_stub(self) -> Dict[str, float]:
+    # 硬/软指标分开拉取：硬指标失败即 halt，软指标无需再取
+    def _fetch_hard_stub(self) -> Dict[str, float]:
         """
-        返回一组与现有 MacroFilter stub 对齐的演示指标：
         - VIX ~ 18.4（低于 25）
         - 指数回撤（CSI300 相对年内高点回撤）~ 6%
+        """
+        return {
+            "vix": 18.4,
+            "index_drawdown": 0.06,
+        }
+
+    def _fetch_soft_stub(self) -> Dict[str, float]:
+        """
         - 市场宽度 ~ 52%
         - 北向净流入评分 ~ 62
         - 情绪分 ~ 0.58（0~1）
         """
         return {
-            "vix": 18.4,
-            "index_drawdown": 0.06,
             "breadth": 52.0,
             "northbound": 62.0,
             "sentiment": 0.58,
@@ -50,7 +57,7 @@ class MarketSentry:
 
     # ======= 主判定函数 =======
     def evaluate(self) -> Dict[str, Any]:
-        m = self._fetch_stub()
+        m = self._fetch_hard_stub()
 
         # 硬指标判定（任何一个失败 -> halt）
         hard = {
@@ -65,7 +72,22 @@ class MarketSentry:
         }
         hard_pass = all(x["pass"] for x in hard.values())
 
+        # 硬指标失败即停手：软指标不再拉取/评分
+        if not hard_pass:
+            return {
+                "hard": hard,
+                "soft": {},
+                "summary": {
+                    "hard_pass": False,
+                    "soft_pass_count": 0,
+                    "soft_total": 3,
+                    "halt": True,
+                    "allowed": False
+                }
+            }
+
         # 软指标判定（建议：至少通过 soft_needed 项）
+        m = self._fetch_soft_stub()
         soft = {
             "breadth": {
                 "value": m["breadth"], "min": self.breadth_min,
@@ -7,54 +7,129 @@
   3) 日内强度分 >= 阈值
   4) 约束：若连板天数 >= 3，则不作为入场启动标的一线（但可作为风向标记录）
 """
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Dict, Any, List
+import numpy as np
 from backend.config.settings import load_thresholds
 from backend.data.fetcher import get_sector_top_stocks, get_sector_earliest_limit_symbol
 
-@dataclass
+# 二线七项检查（输出 checks 的键顺序）与避雷原因编码
+_SECOND_LINE_CHECKS = ("turnover_rank", "mkt_cap_band", "distance_ma20", "distance_high", "rs", "net_inflow", "pe")
+_BLOCK_REASONS = (None, "avoid_st", "avoid_new_stock", "avoid_risk_flag")
+
+
+def _sort_by_score(items: List[Dict]) -> List[Dict]:
+    """按 score 降序、其次 turnover_rank 升序排序（缺 score 视为 0）；np.lexsort 稳定排序，与 list.sort 结果一致"""
+    n = len(items)
+    scores = np.fromiter((it.get("score", 0) for it in items), dtype=np.float64, count=n)
+    ranks = np.fromiter((it["turnover_rank"] for it in items), dtype=np.float64, count=n)
+    order = np.lexsort((ranks, -scores))
+    return [items[i] for i in order.tolist()]
+
+@dataclass(frozen=True, slots=True)
+class _FirstLineCfg:
+    top_n: int
+    min_strength: float
+    earliest_w: float
+    max_boards: int
+
+    @classmethod
+    def from_thresholds(cls, thresholds: dict) -> "_FirstLineCfg":
+        cfg = thresholds.get("first_line", {})
+        return cls(
+            top_n=int(cfg.get("top_turnover_n", 2)),
+            min_strength=float(cfg.get("strength_score_min", 0.80)),
+            earliest_w=float(cfg.get("earliest_limit_weight", 0.50)),
+            max_boards=int(cfg.get("max_consecutive_boards_for_entry", 2)),
+        )
+
+@dataclass(frozen=True, slots=True)
+class _SecondLineCfg:
+    rank_max: int
+    mc_min: float
+    mc_max: float
+    d_ma20_max: float
+    d_high_max: float
+    rs_min: float
+    inflow_min: float
+    pe_max: float
+    avoid_st: bool
+    avoid_new: int
+    avoid_risk: bool
+
+    @classmethod
+    def from_thresholds(cls, thresholds: dict) -> "_SecondLineCfg":
+        cfg = thresholds.get("second_line", {})
+        avoid_cfg = cfg.get("avoid", {}) or {}
+        return cls(
+            rank_max=int(cfg.get("turnover_rank_max", 8)),
+            mc_min=float(cfg.get("mkt_cap_min", 100)),
+            mc_max=float(cfg.get("mkt_cap_max", 5000)),
+            d_ma20_max=float(cfg.get("distance_ma20_max", 0.08)),
+            d_high_max=float(cfg.get("distance_high_max", 0.15)),
+            rs_min=float(cfg.get("rs_min", 0.75)),
+            inflow_min=float(cfg.get("net_inflow_min", 0.50)),
+            pe_max=float(cfg.get("pe_max", 60)),
+            avoid_st=bool(avoid_cfg.get("st", True)),
+            avoid_new=int(avoid_cfg.get("new_stock_days", 30)),
+            avoid_risk=bool(avoid_cfg.get("risk_flags", True)),
+        )
+
+@dataclass(frozen=True, slots=True)
 class StockSelector:
     thresholds: dict
+    # 阈值在构造时解析一次，identify_* 直接读字段
+    _first_cfg: _FirstLineCfg = field(init=False, repr=False)
+    _second_cfg: _SecondLineCfg = field(init=False, repr=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "_first_cfg", _FirstLineCfg.from_thresholds(self.thresholds))
+        object.__setattr__(self, "_second_cfg", _SecondLineCfg.from_thresholds(self.thresholds))
 
     @classmethod
     def load_from_config(cls):
         return cls(load_thresholds())
 
     def identify_first_line(self, sector: str = "AI") -> Dict[str, Any]:
-        cfg = self.thresholds.get("first_line", {})
-        top_n = int(cfg.get("top_turnover_n", 2))
-        min_strength = float(cfg.get("strength_score_min", 0.80))
-        earliest_w = float(cfg.get("earliest_limit_weight", 0.50))
-        max_boards = int(cfg.get("max_consecutive_boards_for_entry", 2))
+        c = self._first_cfg
+        top_n, min_strength, earliest_w, max_boards = c.top_n, c.min_strength, c.earliest_w, c.max_boards
 
         # 取板块候选（离线 stub）
         items: List[Dict] = get_sector_top_stocks(sector)
         earliest = get_sector_earliest_limit_symbol(sector)
 
-        # 先打标签
-        for it in items:
-            it["tags"] = []
-            if it["turnover_rank"] <= top_n:
-                it["tags"].append("top_turnover")
-            if it["intraday_strength"] >= min_strength:
-                it["tags"].append("strong_intraday")
-            if it["symbol"] == earliest["symbol"]:
-                it["tags"].append("earliest_limit")
-
-        # 计算综合评分（可简单线性加权；仅示意）
-        # score = 基础强度 + 最早涨停加权（有则加 earliest_w）
+        earliest_sym = earliest["symbol"]
+
+        # 单遍完成：打标签、计算综合评分、划分入选/连板拒绝
+        # score = 基础强度 + 最早涨停加权（有则加 earliest_w）（可简单线性加权；仅示意）
+        # 候选：满足（top_turnover 或 强度达标 或 最早涨停）之一；连板 >= max_boards 的只记录不入选
+        # 输出为新建记录，不改写上游返回的 items（上游结果可安全缓存复用）
+        selected, rejected_3b, evaluated = [], [], []
         for it in items:
-            score = it["intraday_strength"] + (earliest_w if "earliest_limit" in it["tags"] else 0.0)
-            it["score"] = round(min(score, 1.0), 3)  # 限制在 0~1
+            is_top = it["turnover_rank"] <= top_n
+            is_strong = it["intraday_strength"] >= min_strength
+            is_earliest = it["symbol"] == earliest_sym
+
+            tags = []
+            if is_top:
+                tags.append("top_turnover")
+            if is_strong:
+                tags.append("strong_intraday")
+            if is_earliest:
+                tags.append("earliest_limit")
+
+            score = it["intraday_strength"] + (earliest_w if is_earliest else 0.0)
+            rec = {**it, "tags": tags, "score": round(min(score, 1.0), 3)}  # score 限制在 0~1
+            evaluated.append(rec)
 
-        # 候选：满足（top_turnover 或 强度达标 或 最早涨停）之一
-        candidates = [it for it in items if it["tags"]]
-        # 入场约束过滤：连板 >= 3 的只记录不入选
-        selected = [it for it in candidates if it["consecutive_limit_days"] < max_boards]
-        rejected_3b = [it for it in candidates if it["consecutive_limit_days"] >= max_boards]
+            if tags:
+                if it["consecutive_limit_days"] < max_boards:
+                    selected.append(rec)
+                else:
+                    rejected_3b.append(rec)
 
         # 排序：按 score 降序、其次 turnover_rank 升序
-        selected.sort(key=lambda x: (-x["score"], x["turnover_rank"]))
+        selected = _sort_by_score(selected)
 
         summary = {
             "sector": sector,
@@ -70,7 +145,7 @@ class StockSelector:
             "summary": summary,
             "selected": selected,
             "rejected_due_to_3_boards_rule": rejected_3b,
-            "all_evaluated": items,
+            "all_evaluated": evaluated,
         }
 
     def identify_second_line(self, sector: str = "AI") -> Dict[str, Any]:
@@ -80,63 +155,63 @@ class StockSelector:
         """
         from backend.data.fetcher import get_second_line_candidates
 
-        cfg = self.thresholds.get("second_line", {})
-        rank_max   = int(cfg.get("turnover_rank_max", 8))
-        mc_min     = float(cfg.get("mkt_cap_min", 100))
-        mc_max     = float(cfg.get("mkt_cap_max", 5000))
-        d_ma20_max = float(cfg.get("distance_ma20_max", 0.08))
-        d_high_max = float(cfg.get("distance_high_max", 0.15))
-        rs_min     = float(cfg.get("rs_min", 0.75))
-        inflow_min = float(cfg.get("net_inflow_min", 0.50))
-        pe_max     = float(cfg.get("pe_max", 60))
-
-        avoid_cfg  = cfg.get("avoid", {}) or {}
-        avoid_st   = bool(avoid_cfg.get("st", True))
-        avoid_new  = int(avoid_cfg.get("new_stock_days", 30))
-        avoid_risk = bool(avoid_cfg.get("risk_flags", True))
+        c = self._second_cfg
+        rank_max, mc_min, mc_max = c.rank_max, c.mc_min, c.mc_max
+        d_ma20_max, d_high_max = c.d_ma20_max, c.d_high_max
+        rs_min, inflow_min, pe_max = c.rs_min, c.inflow_min, c.pe_max
+        avoid_st, avoid_new, avoid_risk = c.avoid_st, c.avoid_new, c.avoid_risk
 
         items: List[Dict] = get_second_line_candidates(sector)
         selected, rejected, evaluated = [], [], []
 
-        for it in items:
-            checks = {
-                "turnover_rank": it["turnover_rank"] <= rank_max,
-                "mkt_cap_band": (mc_min <= it["mkt_cap"] <= mc_max),
-                "distance_ma20": it["distance_ma20"] <= d_ma20_max,
-                "distance_high": it["distance_high"] <= d_high_max,
-                "rs": it["rs"] >= rs_min,
-                "net_inflow": it["net_inflow"] >= inflow_min,
-                "pe": it["pe"] <= pe_max,
-            }
-            pass_cnt = sum(1 for v in checks.values() if v)
-
-            # 硬性避雷
-            reason_block = None
-            if avoid_st and it["is_st"]:
-                reason_block = "avoid_st"
-            elif avoid_new and it["list_days"] <= avoid_new:
-                reason_block = "avoid_new_stock"
-            elif avoid_risk and it["has_risk_flag"]:
-                reason_block = "avoid_risk_flag"
-
-            rec = {**it, "checks": checks, "pass_count": pass_cnt, "blocked_by": reason_block}
-            evaluated.append(rec)
-
-            if reason_block:
-                rejected.append(rec)
-                continue
-
-            # 通过标准（示例：≥5 项成立）
-            if pass_cnt >= 5:
-                # 简单评分：通过项数 + 适度加权（例：RS、净流入各+0.2）
-                score = pass_cnt + (0.2 if checks["rs"] else 0.0) + (0.2 if checks["net_inflow"] else 0.0)
-                rec["score"] = round(score, 3)
-                selected.append(rec)
-            else:
-                rejected.append(rec)
+        if items:
+            # 逐列取成数组，七项阈值比较、计数、避雷原因、评分都在整列上一次算完
+            def col(key, dtype=float):
+                return np.array([it[key] for it in items], dtype=dtype)
+
+            mkt_cap = col("mkt_cap")
+            rs_ok = col("rs") >= rs_min
+            inflow_ok = col("net_inflow") >= inflow_min
+            checks_mat = np.column_stack([
+                col("turnover_rank") <= rank_max,
+                (mc_min <= mkt_cap) & (mkt_cap <= mc_max),
+                col("distance_ma20") <= d_ma20_max,
+                col("distance_high") <= d_high_max,
+                rs_ok,
+                inflow_ok,
+                col("pe") <= pe_max,
+            ])
+            pass_cnt = checks_mat.sum(axis=1)
+
+            # 硬性避雷（按优先级取第一个命中的原因；0 表示未被拦截）
+            block_code = np.select(
+                [col("is_st", bool) & avoid_st,
+                 (col("list_days") <= avoid_new) & bool(avoid_new),
+                 col("has_risk_flag", bool) & avoid_risk],
+                [1, 2, 3], default=0,
+            )
+            # 简单评分：通过项数 + 适度加权（例：RS、净流入各+0.2）
+            score = pass_cnt + np.where(rs_ok, 0.2, 0.0) + np.where(inflow_ok, 0.2, 0.0)
+
+            # 仅在组装输出时回到 Python 对象（bool/int/float，便于 JSON 序列化）
+            for it, row, cnt, code, sc in zip(items, checks_mat.tolist(), pass_cnt.tolist(),
+                                              block_code.tolist(), score.tolist()):
+                reason_block = _BLOCK_REASONS[code]
+                rec = {**it, "checks": dict(zip(_SECOND_LINE_CHECKS, row)),
+                       "pass_count": cnt, "blocked_by": reason_block}
+                evaluated.append(rec)
+
+                if reason_block:
+                    rejected.append(rec)
+                # 通过标准（示例：≥5 项成立）
+                elif cnt >= 5:
+                    rec["score"] = round(sc, 3)
+                    selected.append(rec)
+                else:
+                    rejected.append(rec)
 
         # 排序：score 降序，其次 turnover_rank 升序
-        selected.sort(key=lambda x: (-x.get("score", 0), x["turnover_rank"]))
+        selected = _sort_by_score(selected)
 
         summary = {
             "sector": sector,
@@ -1,78 +1,263 @@
 # -*- coding: utf-8 -*-
 """
-简单文件缓存（CSV 版）
+简单文件缓存
 - 仅缓存 OHLCV DataFrame，索引为日期（统一列名：open/high/low/close/volume）
-- 避免使用 parquet/feather（需要额外依赖），提高环境可移植性
+- 安装了 pyarrow 时存 Parquet（snappy），免去 CSV 的文本解析/类型推断/日期解析；
+  否则回退 CSV，保持环境可移植性
+- 文件按键的 blake2b 哈希分到 ohlcv/<xx>/ 下 256 个子目录，避免单目录文件过多
+- 读取时若分片路径不存在，回退读取 ohlcv/ 下平铺的旧缓存（同名 .parquet，或同名的旧 .csv；迁移期兼容）
+- 文件层之上有一层进程内 LRU（按 文件路径+mtime_ns 为键），同一进程反复读同一键时不再重复解析文件
 """
 from __future__ import annotations
+import hashlib
 import os
+import re
+import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 
+# 可选：pyarrow（Parquet 缓存；CSV 缓存也借用其 C++ 写出器）
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+
+# 缓存读写可能出现的 I/O / 解析类异常：调用方可按未命中处理；其余（如 TypeError）属编程错误，应直接抛出
+CACHE_IO_ERRORS = (OSError, ValueError, pa.ArrowException) if HAS_PYARROW else (OSError, ValueError)
+
 
 # 默认缓存根目录（可以根据需要改到 config 里）
 CACHE_ROOT = Path("data/cache")
 
+# 新写入缓存的文件后缀
+CACHE_SUFFIX = ".parquet" if HAS_PYARROW else ".csv"
+
+_OHLCV_COLS = ["open", "high", "low", "close", "volume"]
+# CSV 读取时的列类型：保持 float64，与 Parquet 读回及下游风控计算的精度一致
+_CSV_DTYPES = {c: "float64" for c in _OHLCV_COLS}
+
+# 进程内 LRU：(文件路径, mtime_ns) -> DataFrame；文件被改写后 mtime 变化，旧条目自然失效
+_MEM: "OrderedDict[tuple, pd.DataFrame]" = OrderedDict()
+_MEM_MAX = 256
+_MEM_LOCK = threading.Lock()
+
+
+def _mem_drop(fp: Path) -> None:
+    """剔除同一文件的全部旧版本（调用方持锁）"""
+    for k in [k for k in _MEM if k[0] == fp]:
+        del _MEM[k]
+
+
+def _mem_put(fp: Path, mtime_ns: int, df: pd.DataFrame) -> None:
+    """写入内存层：先剔除同一文件的旧版本，超出容量时淘汰最久未用的条目"""
+    with _MEM_LOCK:
+        _mem_drop(fp)
+        _MEM[(fp, mtime_ns)] = df
+        while len(_MEM) > _MEM_MAX:
+            _MEM.popitem(last=False)
+
+
+# 本进程已确认存在的目录：cache_path_for 每次读写都会经过，避免反复 mkdir 系统调用
+_DIRS_CREATED: set = set()
+
 
 def _ensure_dir(p: Path) -> None:
+    if p in _DIRS_CREATED:
+        return
     p.mkdir(parents=True, exist_ok=True)
+    _DIRS_CREATED.add(p)
+
+
+# ASCII 范围内需删除的字符（保留字母数字与 - _ . +）；预编译后在 C 层一次处理整串
+_UNSAFE_ASCII = re.compile(r"[^A-Za-z0-9_.+-]")
 
 
 def _sanitize(s: str) -> str:
     # 简单去除文件名中的不安全字符
+    if s.isascii():
+        return _UNSAFE_ASCII.sub("", s)
+    # 含非 ASCII（如中文名）时按 Unicode isalnum 逐字判断，口径不变
     return "".join(ch for ch in s if ch.isalnum() or ch in ("-", "_", ".", "+"))
 
 
 def make_ohlcv_cache_key(symbol: str, start: Optional[str], end: Optional[str], freq: str, provider: str) -> str:
-    # 统一的缓存键规则：ohlcv_{provider}_{symbol}_{start}_{end}_{freq}.csv
+    # 统一的缓存键规则：ohlcv_{provider}_{symbol}_{start}_{end}_{freq}{CACHE_SUFFIX}
     s = start or "none"
     e = end or "none"
-    base = f"ohlcv_{provider}_{symbol}_{s}_{e}_{freq}.csv"
+    base = f"ohlcv_{provider}_{symbol}_{s}_{e}_{freq}{CACHE_SUFFIX}"
     return _sanitize(base)
 
 
+def _shard(key: str) -> str:
+    """键所在的分片子目录名（00~ff）；用 blake2b 而非内置 hash，保证跨进程稳定"""
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=1).hexdigest()
+
+
 def cache_path_for(key: str) -> Path:
-    p = CACHE_ROOT / "ohlcv" / key
+    p = CACHE_ROOT / "ohlcv" / _shard(key) / key
     _ensure_dir(p.parent)
     return p
 
 
+def _legacy_paths(key: str):
+    """
+    回退路径：分片之前的平铺同名文件；parquet 键另有对应的旧 CSV（未装 pyarrow 时写入的分片 CSV、或更早的平铺 CSV）
+    """
+    root = CACHE_ROOT / "ohlcv"
+    yield root / key
+    if key.endswith(".parquet"):
+        csv_key = key[:-len(".parquet")] + ".csv"
+        yield root / _shard(csv_key) / csv_key
+        yield root / csv_key
+
+
 def get_df_if_fresh(key: str, max_age_seconds: int) -> Optional[pd.DataFrame]:
     """
     如果缓存文件存在且在 max_age_seconds 内，则读出 DataFrame；否则返回 None
     """
     fp = cache_path_for(key)
-    if not fp.exists():
-        return None
+    try:
+        st = fp.stat()
+    except OSError:
+        # 迁移期：分片路径找不到时读旧的平铺缓存
+        for fp in _legacy_paths(key):
+            try:
+                st = fp.stat()
+                break
+            except OSError:
+                continue
+        else:
+            return None
     # 简单 TTL 判断
-    age = time.time() - fp.stat().st_mtime
+    age = time.time() - st.st_mtime
     if age > max_age_seconds:
         return None
-    # 读 CSV（索引列为 t）
-    df = pd.read_csv(fp, dtype=float, parse_dates=["t"])
-    df = df.set_index("t")
+
+    # 内存层命中：返回副本，调用方修改不会污染缓存
+    mem_key = (fp, st.st_mtime_ns)
+    with _MEM_LOCK:
+        df = _MEM.get(mem_key)
+        if df is not None:
+            _MEM.move_to_end(mem_key)
+            return df.copy()
+
+    df = _read_file(fp)
+    _mem_put(fp, st.st_mtime_ns, df)
+    return df.copy()
+
+
+def _read_file(fp: Path) -> pd.DataFrame:
+    if fp.suffix == ".parquet":
+        # 列式读取只取需要的列；read_pandas 会带上索引列，DatetimeIndex 由 parquet 元数据还原
+        # memory_map：文件直接映射进进程，热读走页缓存；self_destruct：转 pandas 时逐列释放 Arrow 缓冲，免去双份内存
+        # 列仍转成 numpy float64（不用 ArrowDtype），下游指标/风控代码按 ndarray 处理
+        table = pq.read_pandas(fp, columns=_OHLCV_COLS, memory_map=True)
+        return table.to_pandas(self_destruct=True)
+    # 读 CSV：usecols 只解析需要的列、index_col 直接建索引，省去 set_index 与列切片；
+    # 日期按 ISO8601 走快速解析（日线/分钟线的写出格式都覆盖），不再逐个推断格式
+    df = pd.read_csv(fp, usecols=["t"] + _OHLCV_COLS, dtype=_CSV_DTYPES, engine="c",
+                     index_col="t", parse_dates=["t"], date_format="ISO8601")
     df.index.name = None  # 清除索引名称，保持与原始数据一致
-    # 列名按约定
-    df = df[["open", "high", "low", "close", "volume"]]
-    return df
+    # 列顺序按约定（usecols 不保证顺序）
+    return df[_OHLCV_COLS]
 
 
 def put_df(key: str, df: pd.DataFrame) -> Path:
     """
-    将 DataFrame 写入缓存 CSV，索引输出到列名 t
+    将 DataFrame 写入缓存：按键后缀写 Parquet（索引随文件保存）或 CSV（索引输出到列名 t）
+    Parquet 写入后同时放入内存层（与读回结果相同）；CSV 只剔除内存层旧版本，下次读取时再载入
     """
     fp = cache_path_for(key)
-    out = df.copy()
-    out = out[["open", "high", "low", "close", "volume"]].copy()
-    out = out.reset_index().rename(columns={"index": "t"})
-    out.to_csv(fp, index=False)
+    # 列选择本身已是新对象；已是 float 的列不再二次拷贝
+    out = df[_OHLCV_COLS].astype(float, copy=False)
+    if fp.suffix == ".parquet":
+        # 与 CSV 读回口径一致：索引为无名 DatetimeIndex，列全为 float
+        out.index = pd.DatetimeIndex(out.index, name=None, freq=None)
+        out.to_parquet(fp, engine="pyarrow", compression="snappy", index=True)
+        _mem_put(fp, fp.stat().st_mtime_ns, out)
+        return fp
+    if HAS_PYARROW:
+        # Arrow 的 CSV 写出器为纯 C++，数值格式化远快于 to_csv；浮点按最短往返精度输出，读回逐位一致
+        pacsv.write_csv(pa.Table.from_pandas(out.rename_axis("t").reset_index(), preserve_index=False), fp)
+    else:
+        out.to_csv(fp, index=True, index_label="t")
+    with _MEM_LOCK:
+        _mem_drop(fp)
     return fp
 
+def put_df_multi(key: str, frames: Dict[str, pd.DataFrame]) -> Path:
+    """
+    多标的合并缓存：把 {symbol: OHLCV DataFrame} 合成一个 Parquet 文件（如同一板块、同一区间的全部成分股）
+    symbol 列存为 Categorical（Parquet 中为字典编码），比逐行存字符串小得多；读取见 get_df_multi_if_fresh
+    """
+    if not HAS_PYARROW:
+        raise ImportError("多标的合并缓存需要安装 pyarrow")
+    if not frames:
+        raise ValueError("frames 不能为空")
+    fp = cache_path_for(key)
+    parts = []
+    for df in frames.values():
+        out = df[_OHLCV_COLS].astype(float, copy=False)
+        out.index = pd.DatetimeIndex(out.index, name=None, freq=None)
+        parts.append(out)
+    combined = pd.concat(parts)
+    symbols = list(frames)
+    codes = np.repeat(np.arange(len(symbols)), [len(p) for p in parts])
+    combined.insert(0, "symbol", pd.Categorical.from_codes(codes, categories=symbols))
+    combined.to_parquet(fp, engine="pyarrow", compression="snappy", index=True)
+    with _MEM_LOCK:
+        _mem_drop(fp)
+    return fp
+
+
+def get_df_multi_if_fresh(key: str, max_age_seconds: int, symbol: Optional[str] = None) -> Optional[pd.DataFrame]:
+    """
+    读取 put_df_multi 写入的合并缓存（过期或不存在返回 None）
+    - 指定 symbol：按 symbol 列做谓词下推，只解码该标的所在的数据，返回与 get_df_if_fresh 相同的 OHLCV 结构
+    - 不指定：返回全部行，含 Categorical 的 symbol 列
+    """
+    if not HAS_PYARROW:
+        return None
+    fp = cache_path_for(key)
+    try:
+        st = fp.stat()
+    except OSError:
+        return None
+    if time.time() - st.st_mtime > max_age_seconds:
+        return None
+    filters = [("symbol", "==", symbol)] if symbol is not None else None
+    table = pq.read_pandas(fp, columns=["symbol"] + _OHLCV_COLS, filters=filters, memory_map=True)
+    df = table.to_pandas(self_destruct=True)
+    if symbol is not None:
+        return df[_OHLCV_COLS]
+    return df
+
+
 # 在现有 cache.py 的基础上，可以添加以下便捷函数：
 
+def _iter_cache_files(cache_dir):
+    """
+    递归列出缓存目录下的全部缓存文件（新旧两种格式），产出 os.DirEntry
+    用 os.scandir 而非 rglob：不为每个条目构造 Path，且 entry.stat() 结果会被缓存
+    """
+    with os.scandir(cache_dir) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                yield from _iter_cache_files(entry.path)
+            elif entry.name.endswith((".parquet", ".csv")) and entry.is_file():
+                yield entry
+
+
 def clear_cache(provider: Optional[str] = None, max_age_hours: Optional[int] = None) -> int:
     """
     清理缓存文件
@@ -84,6 +269,10 @@ def clear_cache(provider: Optional[str] = None, max_age_hours: Optional[int] = N
     返回：
       清理的文件数量
     """
+    # 内存层一并清空（简单起见不按条件筛选）
+    with _MEM_LOCK:
+        _MEM.clear()
+
     cache_dir = CACHE_ROOT / "ohlcv"
     if not cache_dir.exists():
         return 0
@@ -91,19 +280,19 @@ def clear_cache(provider: Optional[str] = None, max_age_hours: Optional[int] = N
     count = 0
     current_time = time.time()
     
-    for file_path in cache_dir.rglob("*.csv"):
+    for entry in _iter_cache_files(cache_dir):
         # 按提供商过滤
-        if provider and f"_{provider}_" not in file_path.name:
+        if provider and f"_{provider}_" not in entry.name:
             continue
         
         # 按年龄过滤
         if max_age_hours:
-            file_age_hours = (current_time - file_path.stat().st_mtime) / 3600
+            file_age_hours = (current_time - entry.stat().st_mtime) / 3600
             if file_age_hours < max_age_hours:
                 continue
         
         try:
-            file_path.unlink()
+            os.unlink(entry.path)
             count += 1
         except Exception:
             pass
@@ -119,12 +308,12 @@ def get_cache_stats() -> dict:
     
     stats = {"total_files": 0, "total_size_mb": 0, "providers": {}}
     
-    for file_path in cache_dir.rglob("*.csv"):
+    for entry in _iter_cache_files(cache_dir):
         stats["total_files"] += 1
-        stats["total_size_mb"] += file_path.stat().st_size / (1024 * 1024)
+        stats["total_size_mb"] += entry.stat().st_size / (1024 * 1024)
         
         # 提取提供商信息
-        parts = file_path.name.split("_")
+        parts = entry.name.split("_")
         if len(parts) >= 2:
             provider = parts[1]
             stats["providers"][provider] = stats["providers"].get(provider, 0) + 1
@@ -141,6 +330,24 @@ def cache_ohlcv_get(symbol: str, start: str, end: str, freq: str = "1d",
     return get_df_if_fresh(key, max_age_hours * 3600)
 
 
+def cache_ohlcv_get_many(requests: List[Tuple[str, Optional[str], Optional[str], str, str]],
+                         max_age_hours: int = 1) -> Dict[str, Optional[pd.DataFrame]]:
+    """
+    批量缓存读取：requests 为 (symbol, start, end, freq, provider) 列表，返回 {symbol: DataFrame|None}
+    - 先一次算出全部缓存键，再用线程池并发读取（parquet/CSV 解析期间释放 GIL）
+    - 返回字典按输入顺序排列；同一 symbol 出现多次时以最后一条为准
+    """
+    keys = [make_ohlcv_cache_key(symbol, start, end, freq, provider)
+            for symbol, start, end, freq, provider in requests]
+    max_age_seconds = max_age_hours * 3600
+    if len(keys) <= 1:
+        frames = [get_df_if_fresh(k, max_age_seconds) for k in keys]
+    else:
+        with ThreadPoolExecutor(max_workers=min(8, len(keys))) as executor:
+            frames = list(executor.map(lambda k: get_df_if_fresh(k, max_age_seconds), keys))
+    return {req[0]: df for req, df in zip(requests, frames)}
+
+
 def cache_ohlcv_put(df: pd.DataFrame, symbol: str, start: str, end: str, 
                    freq: str = "1d", provider: str = "default") -> Path:
     """便捷的缓存写入"""
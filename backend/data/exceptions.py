@@ -17,10 +17,15 @@
 
 from __future__ import annotations
 
+import threading
+import time
 import traceback
+from collections import Counter, deque
 from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Any, Dict, List, Optional, Union
+from functools import cached_property
+from itertools import islice
+from typing import Any, Deque, Dict, List, Optional, Union
 from enum import Enum
 
 
@@ -32,7 +37,7 @@ class ErrorSeverity(Enum):
     CRITICAL = "critical" # 需要立即处理，如所有数据源失败
 
 
-@dataclass
+@dataclass(slots=True)
 class ErrorContext:
     """错误上下文信息"""
     provider: Optional[str] = None
@@ -55,26 +60,34 @@ class ErrorContext:
     primary_source: Optional[str] = None
     fallback_sources: List[str] = field(default_factory=list)
     
-    # 时间信息
-    timestamp: datetime = field(default_factory=datetime.now)
+    # 时间信息：只记 time.time_ns() 整数，datetime 等到输出时才构造
+    timestamp_ns: int = field(default_factory=time.time_ns)
     duration_ms: Optional[float] = None
     
+    @property
+    def timestamp(self) -> datetime:
+        """发生时间（本地时区，与原 datetime.now() 口径一致）"""
+        return datetime.fromtimestamp(self.timestamp_ns / 1e9)
+    
     def to_dict(self) -> Dict[str, Any]:
         """转换为字典格式，便于日志记录"""
+        start, end = self.start_date, self.end_date
+        requested, returned = self.requested_sessions, self.returned_sessions
         return {
             "provider": self.provider,
             "symbol": self.symbol,
-            "date_range": f"{self.start_date}~{self.end_date}" if self.start_date and self.end_date else None,
+            "date_range": f"{start}~{end}" if start and end else None,
             "freq": self.freq,
             "adjust": self.adjust,
             "operation": self.operation,
             "data_quality": {
-                "requested_sessions": self.requested_sessions,
-                "returned_sessions": self.returned_sessions,
+                "requested_sessions": requested,
+                "returned_sessions": returned,
                 "missing_sessions": self.missing_sessions,
                 "conflict_sessions": self.conflict_sessions,
                 "backfilled_sessions": self.backfilled_sessions,
-                "completeness_ratio": self.returned_sessions / max(1, self.requested_sessions),
+                # 同 returned / max(1, requested)：未声明请求数时按 1 计
+                "completeness_ratio": returned / (requested if requested > 1 else 1),
             },
             "source_info": {
                 "primary_source": self.primary_source,
@@ -143,13 +156,6 @@ class DataSourceError(Exception):
                 end_date=end_date,
                 **kwargs
             )
-        
-        # 如果有根本原因，记录其堆栈信息
-        self.root_cause_traceback = None
-        if root_cause:
-            self.root_cause_traceback = traceback.format_exception(
-                type(root_cause), root_cause, root_cause.__traceback__
-            )
     
     def get_error_code(self) -> str:
         """生成错误代码，便于快速识别"""
@@ -180,6 +186,14 @@ class DataSourceError(Exception):
         
         return " | ".join(parts)
     
+    @cached_property
+    def root_cause_traceback(self) -> Optional[List[str]]:
+        """根本原因的堆栈信息；首次访问时才格式化（重试中被吞掉的异常不必付出这笔开销）"""
+        rc = self.root_cause
+        if not rc:
+            return None
+        return traceback.format_exception(type(rc), rc, rc.__traceback__)
+    
     def get_detailed_info(self) -> Dict[str, Any]:
         """获取详细错误信息"""
         info = {
@@ -209,7 +223,7 @@ class ProviderError(DataSourceError):
         super().__init__(
             message, 
             provider=provider,
-            severity=kwargs.get('severity', ErrorSeverity.HIGH),
+            severity=kwargs.pop('severity', ErrorSeverity.HIGH),
             **kwargs
         )
 
@@ -363,44 +377,57 @@ def create_merge_error(
 
 # 错误统计和分析
 class ErrorCollector:
-    """错误收集器，用于统计和分析错误模式"""
+    """
+    错误收集器，用于统计和分析错误模式
+    - 只保留最近 maxlen 条错误（环形缓冲），长期运行的服务不会无限增长
+    - 按严重程度/提供商/操作类型的计数随增删增量维护，摘要无需重扫全部错误
+    """
+    
+    def __init__(self, maxlen: int = 1024):
+        self.errors: Deque[DataSourceError] = deque(maxlen=maxlen)
+        self._by_severity: Counter = Counter()
+        self._by_provider: Counter = Counter()
+        self._by_operation: Counter = Counter()
+        self._lock = threading.Lock()
     
-    def __init__(self):
-        self.errors: List[DataSourceError] = []
+    @staticmethod
+    def _keys(error: DataSourceError):
+        return error.severity.value, error.provider, error.context.operation
+    
+    def _count(self, error: DataSourceError, delta: int) -> None:
+        severity, provider, op = self._keys(error)
+        for counter, key in ((self._by_severity, severity),
+                             (self._by_provider, provider),
+                             (self._by_operation, op)):
+            if not key:
+                continue
+            counter[key] += delta
+            if counter[key] <= 0:
+                del counter[key]
     
     def add_error(self, error: DataSourceError) -> None:
-        """添加错误记录"""
-        self.errors.append(error)
+        """添加错误记录；缓冲已满时最旧的一条被挤出，其计数同步扣减"""
+        with self._lock:
+            if len(self.errors) == self.errors.maxlen:
+                self._count(self.errors[0], -1)
+            self.errors.append(error)
+            self._count(error, 1)
     
     def get_error_summary(self) -> Dict[str, Any]:
-        """获取错误摘要统计"""
-        if not self.errors:
-            return {"total": 0}
-        
-        summary = {
-            "total": len(self.errors),
-            "by_severity": {},
-            "by_provider": {},
-            "by_operation": {},
-            "recent_errors": []
-        }
-        
-        for error in self.errors:
-            # 按严重程度统计
-            severity = error.severity.value
-            summary["by_severity"][severity] = summary["by_severity"].get(severity, 0) + 1
-            
-            # 按提供商统计
-            if error.provider:
-                summary["by_provider"][error.provider] = summary["by_provider"].get(error.provider, 0) + 1
+        """获取错误摘要统计（基于缓冲内的最近错误）"""
+        with self._lock:
+            if not self.errors:
+                return {"total": 0}
             
-            # 按操作类型统计
-            if error.context.operation:
-                op = error.context.operation
-                summary["by_operation"][op] = summary["by_operation"].get(op, 0) + 1
+            # 最近的错误（最多5个）：按加入顺序从新到旧
+            recent_errors = list(islice(reversed(self.errors), 5))
+            summary = {
+                "total": len(self.errors),
+                "by_severity": dict(self._by_severity),
+                "by_provider": dict(self._by_provider),
+                "by_operation": dict(self._by_operation),
+            }
         
-        # 最近的错误（最多5个）
-        recent_errors = sorted(self.errors, key=lambda e: e.context.timestamp, reverse=True)[:5]
         summary["recent_errors"] = [
             {
                 "code": error.get_error_code(),
@@ -414,7 +441,11 @@ class ErrorCollector:
     
     def clear(self) -> None:
         """清空错误记录"""
-        self.errors.clear()
+        with self._lock:
+            self.errors.clear()
+            self._by_severity.clear()
+            self._by_provider.clear()
+            self._by_operation.clear()
 
 
 # 全局错误收集器实例
@@ -4,7 +4,7 @@
 返回的 value 单位/口径要与阈值一致（避免“数值正确但单位不一致”）。
 """
 from __future__ import annotations
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Optional, Tuple, Union
 from dataclasses import dataclass
 from pathlib import Path
 
@@ -12,10 +12,21 @@ import numpy as np
 import pandas as pd
 
 from .cache import (
+    CACHE_IO_ERRORS,
     make_ohlcv_cache_key,
+    cache_path_for,
     get_df_if_fresh,
     put_df,
 )
+from .exceptions import CacheError, ErrorSeverity, ProviderError, report_error
+
+# 可选：pyarrow 的 C++ CSV 读取器（列类型与日期在解析时一次定型）；未安装时回退 pandas
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
 
 # ---------------------
 # 配置（可日后迁到 config）
@@ -23,6 +34,15 @@ from .cache import (
 CSV_DATA_DIR = Path("data/ohlcv")  # 约定 CSV 数据目录
 DEFAULT_CACHE_TTL = 60 * 60 * 12   # 12 小时
 
+if HAS_PYARROW:
+    # t 直接解析为 ns 时间戳（同 pd.to_datetime 的口径），价格列定为 float64；v 仍按内容推断
+    # 单线程读：日线文件通常只有几千行，线程池调度开销反而大于解析本身
+    _CSV_READ_OPTS = pacsv.ReadOptions(use_threads=False)
+    _CSV_CONVERT_OPTS = pacsv.ConvertOptions(column_types={
+        "t": pa.timestamp("ns"),
+        "o": pa.float64(), "h": pa.float64(), "l": pa.float64(), "c": pa.float64(),
+    })
+
 def get_vix() -> Dict:
     # TODO: 接入真实数据后替换
     return {"value": 18.4, "source": "stub"}
@@ -138,7 +158,7 @@ def get_second_line_candidates(sector: str) -> List[Dict]:
 @dataclass
 class FetchMeta:
     """用于测试与排障的元信息"""
-    source: str                 # "provider" 或 "cache"
+    source: str                 # "provider" / "cache" / "cache_stale"（provider 失败时的过期缓存）
     provider: str               # "csv"/"stub"
     cache_key: Optional[str]    # 实际使用的缓存键（可能为 None）
     cache_path: Optional[str]   # 实际缓存路径（可能为 None）
@@ -151,10 +171,13 @@ def _normalize_df(df: pd.DataFrame) -> pd.DataFrame:
     输入允许两种列风格：
       1) t, o, h, l, c, v
       2) 索引为日期，列为 open/high/low/close/volume
+    各 loader 只在读入时调用一次，get_ohlcv 不再对 loader 的输出重复规范化
     """
     if "t" in df.columns:
         df = df.rename(columns={"o": "open", "h": "high", "l": "low", "c": "close", "v": "volume"})
-        df["t"] = pd.to_datetime(df["t"])
+        # 读取时已解析为时间戳（pyarrow 路径）就不再过一遍 to_datetime
+        if not pd.api.types.is_datetime64_any_dtype(df["t"]):
+            df["t"] = pd.to_datetime(df["t"])
         df = df.set_index("t")
     # 保证列顺序
     need = ["open", "high", "low", "close", "volume"]
@@ -162,17 +185,23 @@ def _normalize_df(df: pd.DataFrame) -> pd.DataFrame:
         if col not in df.columns:
             raise ValueError(f"缺少列: {col}")
     df = df[need].copy()
-    # 索引排序并去重
-    df = df[~df.index.duplicated(keep="last")].sort_index()
+    # 索引去重并排序；已唯一/已有序时跳过（两项检查都是 C 层单遍扫描）
+    if not df.index.is_unique:
+        df = df[~df.index.duplicated(keep="last")]
+    if not df.index.is_monotonic_increasing:
+        df = df.sort_index()
     return df
 
 
-def _slice(df: pd.DataFrame, start: Optional[str], end: Optional[str]) -> pd.DataFrame:
-    if start:
-        df = df[df.index >= pd.to_datetime(start)]
-    if end:
-        df = df[df.index <= pd.to_datetime(end)]
-    return df
+def _slice(df: pd.DataFrame, start, end) -> pd.DataFrame:
+    """
+    按 [start, end] 闭区间切片；start/end 可为日期字符串或 Timestamp
+    索引已由 _normalize_df 排序，二分定位边界后 iloc 切片，不生成整列布尔掩码
+    """
+    idx = df.index
+    lo = idx.searchsorted(pd.Timestamp(start), side="left") if start else 0
+    hi = idx.searchsorted(pd.Timestamp(end), side="right") if end else len(idx)
+    return df.iloc[lo:hi]
 
 
 def _load_from_csv(symbol: str) -> pd.DataFrame:
@@ -183,7 +212,16 @@ def _load_from_csv(symbol: str) -> pd.DataFrame:
     fp = CSV_DATA_DIR / f"{symbol}.csv"
     if not fp.exists():
         raise FileNotFoundError(f"CSV 数据不存在: {fp}")
-    df = pd.read_csv(fp)
+    df = None
+    if HAS_PYARROW:
+        try:
+            df = pacsv.read_csv(fp, read_options=_CSV_READ_OPTS,
+                                convert_options=_CSV_CONVERT_OPTS).to_pandas()
+        except pa.ArrowInvalid:
+            # 日期带时区/格式不规整等：交给 pandas 按原逻辑推断
+            pass
+    if df is None:
+        df = pd.read_csv(fp)
     df = _normalize_df(df)
     return df
 
@@ -197,77 +235,152 @@ def _load_from_stub(symbol: str, start: Optional[str], end: Optional[str]) -> pd
     # 日历：用自然日，便于和之前 demo 对齐（需要交易日历时再引入 exchange_calendars）
     t = pd.date_range(s, e, freq="D")
     n = len(t)
-    # 基础价格（缓慢上行）
-    base = 10 + np.linspace(0, 5, n)
-    noise = np.random.RandomState(7).normal(0, 0.05, size=n)  # 固定 seed 便于测试稳定
-    close = base + noise
-    open_ = close * (1 + np.random.RandomState(8).normal(0, 0.002, size=n))
-    high = np.maximum(open_, close) + 0.1
-    low = np.minimum(open_, close) - 0.1
-    vol = np.random.RandomState(9).randint(1000, 3000, size=n)
-
-    df = pd.DataFrame(
-        {"open": open_, "high": high, "low": low, "close": close, "volume": vol},
-        index=t,
-    )
+    rng = np.random.default_rng(7)  # 固定 seed 便于测试稳定；单一随机流
+    # 价格四列写进同一块 (n, 4) 缓冲，全部原地计算，不产生中间数组
+    arr = np.empty((n, 4))
+    open_, high, low, close = arr[:, 0], arr[:, 1], arr[:, 2], arr[:, 3]
+    tmp = np.empty(n)
+    # 基础价格（缓慢上行）+ 噪声
+    close[:] = np.linspace(0, 5, n)
+    close += 10
+    rng.standard_normal(n, out=tmp)
+    tmp *= 0.05
+    close += tmp
+    # open = close * (1 + N(0, 0.002))
+    rng.standard_normal(n, out=tmp)
+    tmp *= 0.002
+    tmp += 1
+    np.multiply(close, tmp, out=open_)
+    np.maximum(open_, close, out=high)
+    high += 0.1
+    np.minimum(open_, close, out=low)
+    low -= 0.1
+
+    df = pd.DataFrame(arr, columns=["open", "high", "low", "close"], index=t, copy=False)
+    df["volume"] = rng.integers(1000, 3000, size=n)
+    # 列序/有序唯一索引本就符合规范，无需再经 _normalize_df
     return df
 
 
+def _get_stale(cache_key: str, provider: str, symbol: str) -> Optional[pd.DataFrame]:
+    """读取缓存而不论新旧；缓存本身出错时上报并视为没有"""
+    try:
+        return get_df_if_fresh(cache_key, max_age_seconds=float("inf"))
+    except CACHE_IO_ERRORS as e:
+        report_error(CacheError("读取过期缓存失败", cache_operation="get",
+                                provider=provider, symbol=symbol, root_cause=e))
+        return None
+
+
+def _cache_get(cache_key: str, provider: str, symbol: str, cache_ttl: int) -> Optional[pd.DataFrame]:
+    """读取新鲜缓存；缓存故障按未命中处理：上报后照常走 provider，不让缓存拖垮取数"""
+    try:
+        return get_df_if_fresh(cache_key, max_age_seconds=cache_ttl)
+    except CACHE_IO_ERRORS as e:
+        report_error(CacheError("读取缓存失败", cache_operation="get",
+                                provider=provider, symbol=symbol, root_cause=e))
+        return None
+
+
+def _load_from_provider(provider: str, symbol: str, start: Optional[str], end: Optional[str]) -> pd.DataFrame:
+    """返回已规范化的帧（列 open/high/low/close/volume，索引有序去重），区间裁剪由调用方统一做"""
+    if provider == "csv":
+        return _load_from_csv(symbol)
+    return _load_from_stub(symbol, start, end)
+
+
 def get_ohlcv(
     symbol: str,
     start: Optional[str] = None,
     end: Optional[str] = None,
     freq: str = "1d",
-    provider: str = "csv",
+    provider: Union[str, List[str]] = "csv",
     use_cache: bool = True,
     cache_ttl: int = DEFAULT_CACHE_TTL,
     with_meta: bool = False,
 ) -> pd.DataFrame | Tuple[pd.DataFrame, FetchMeta]:
     """
     统一获取 OHLCV
-    - provider: "csv"（生产/联调时读你准备的 CSV），"stub"（测试/演示）
+    - provider: "csv"（生产/联调时读你准备的 CSV），"stub"（测试/演示）；
+      也可传优先级列表如 ["csv", "stub"]：按序尝试，首个成功即返回并缓存，全部失败时抛 ProviderError
     - 目前仅支持 freq="1d"
-    - use_cache=True 时会在 data/cache/ 下按键值缓存
-    - with_meta=True 时返回 (df, meta)
+    - use_cache=True 时会在 data/cache/ 下按键值缓存（每个 provider 各自一份）
+    - with_meta=True 时返回 (df, meta)，meta.provider 为实际命中的 provider
     """
     if freq != "1d":
         raise NotImplementedError("仅实现日线 freq='1d'（后续可扩展）")
 
-    cache_key = None
-    cache_path = None
-
-    if use_cache:
-        cache_key = make_ohlcv_cache_key(symbol, start, end, freq, provider)
-        cached = get_df_if_fresh(cache_key, max_age_seconds=cache_ttl)
-        if cached is not None:
-            df = cached.copy()
-            meta = FetchMeta(source="cache", provider=provider, cache_key=cache_key,
-                             cache_path=str(Path("data/cache/ohlcv") / cache_key), rows=len(df))
-            return (df, meta) if with_meta else df
-
-    # 走真实 provider
-    if provider == "csv":
-        df = _load_from_csv(symbol)
-        df = _slice(df, start, end)
-    elif provider == "stub":
-        df = _load_from_stub(symbol, start, end)
-    else:
-        raise ValueError(f"未知 provider: {provider}")
-
-    # 仅保留需要的列并排序
-    df = _normalize_df(df)
-    df = _slice(df, start, end)
-
-    # 落盘缓存
+    chain = [provider] if isinstance(provider, str) else list(provider)
+    if not chain:
+        raise ValueError("provider 列表为空")
+    for p in chain:
+        if p not in ("csv", "stub"):
+            raise ValueError(f"未知 provider: {p}")
+
+    # 起止日期只解析一次，各 provider 共用
+    ts_start = pd.Timestamp(start) if start else None
+    ts_end = pd.Timestamp(end) if end else None
+
+    # 按优先级逐个 provider：先查它的缓存，未命中再取数；首个成功即短路返回
+    errs: List[Tuple[str, Exception]] = []
+    for p in chain:
+        cache_key = make_ohlcv_cache_key(symbol, start, end, freq, p) if use_cache else None
+        if use_cache:
+            cached = _cache_get(cache_key, p, symbol, cache_ttl)
+            if cached is not None:
+                meta = FetchMeta(source="cache", provider=p, cache_key=cache_key,
+                                 cache_path=str(cache_path_for(cache_key)), rows=len(cached))
+                return (cached, meta) if with_meta else cached
+
+        try:
+            df = _load_from_provider(p, symbol, start, end)
+        except Exception as e:
+            errs.append((p, e))
+            continue
+
+        # provider 已给出规范化的帧，这里只按区间裁剪
+        df = _slice(df, ts_start, ts_end)
+
+        # 落盘缓存
+        cache_path = None
+        if use_cache:
+            try:
+                cache_path = str(put_df(cache_key, df))
+            except CACHE_IO_ERRORS as e:
+                # 写缓存失败只上报，不影响本次返回
+                report_error(CacheError("写入缓存失败", cache_operation="put",
+                                        provider=p, symbol=symbol, root_cause=e))
+
+        meta = FetchMeta(
+            source="provider",
+            provider=p,
+            cache_key=cache_key,
+            cache_path=cache_path,
+            rows=len(df),
+        )
+        return (df, meta) if with_meta else df
+
+    # 降级可用：全部 provider 失败时按同样顺序找过期缓存（不看 TTL），都没有才抛出
     if use_cache:
-        cache_key = make_ohlcv_cache_key(symbol, start, end, freq, provider)
-        cache_path = str(put_df(cache_key, df))
-
-    meta = FetchMeta(
-        source="provider",
-        provider=provider,
-        cache_key=cache_key,
-        cache_path=cache_path,
-        rows=len(df),
-    )
-    return (df, meta) if with_meta else df
\ No newline at end of file
+        for p, e in errs:
+            cache_key = make_ohlcv_cache_key(symbol, start, end, freq, p)
+            stale = _get_stale(cache_key, p, symbol)
+            if stale is None:
+                continue
+            report_error(ProviderError("数据源获取失败，已返回过期缓存", provider=p,
+                                       symbol=symbol, start_date=start, end_date=end,
+                                       severity=ErrorSeverity.MEDIUM, root_cause=e,
+                                       operation="fetch", fallback_sources=chain[1:]))
+            meta = FetchMeta(source="cache_stale", provider=p, cache_key=cache_key,
+                             cache_path=str(cache_path_for(cache_key)), rows=len(stale))
+            return (stale, meta) if with_meta else stale
+
+    # 单个 provider 保持原样抛出原始异常；列表时汇总为 ProviderError
+    if isinstance(provider, str):
+        raise errs[0][1]
+    raise ProviderError(
+        "所有数据源均获取失败: " + "; ".join(f"{p}: {e}" for p, e in errs),
+        provider=chain[0], symbol=symbol, start_date=start, end_date=end,
+        root_cause=errs[0][1], operation="fetch",
+        primary_source=chain[0], fallback_sources=chain[1:],
+    ) from errs[0][1]
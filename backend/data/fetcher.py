@@ -22,9 +22,11 @@ from __future__ import annotations
 
 import os, random, math
 import time, datetime
+import copy
 import json
 import logging
 import logging.config
+from functools import lru_cache
 from pathlib import Path
 from dataclasses import dataclass, field
 from typing import Dict, List, Optional, Union, Any, Iterable
@@ -34,6 +36,12 @@ from datetime import datetime as dt
 import yaml
 import pandas as pd
 
+# 优先用 libyaml 的 C 解析器（比纯 Python 的 SafeLoader 快数倍）；未编译 libyaml 时回退
+try:
+    from yaml import CSafeLoader as _SafeLoader
+except ImportError:
+    from yaml import SafeLoader as _SafeLoader
+
 try:
     import akshare as ak
 except ImportError:
@@ -45,7 +53,7 @@ def setup_logging() -> None:
     cfg_path = Path("config/logging.yaml")
     if cfg_path.exists():
         with cfg_path.open("r", encoding="utf-8") as f:
-            config = yaml.safe_load(f) or {}
+            config = yaml.load(f, Loader=_SafeLoader) or {}
         Path("logs").mkdir(exist_ok=True)
         logging.config.dictConfig(config)
     else:
@@ -64,12 +72,12 @@ from backend.data.providers.tushare_provider import TuShareProvider
 from backend.data.providers.csv_provider import CsvProvider
 
 from backend.data.merge import merge_ohlcv
-from backend.data.cache import cache_ohlcv_get, cache_ohlcv_put
+from backend.data.cache import CACHE_IO_ERRORS, get_df_if_fresh, make_ohlcv_cache_key, put_df
 from backend.data.normalize import to_internal, get_sessions_index
 
 # 异常/错误上报（第12步）
 from backend.data.exceptions import (
-    DataSourceError, ErrorContext, ErrorSeverity,
+    DataSourceError, ErrorContext, ErrorSeverity, CacheError,
     create_provider_error, report_error, get_global_error_summary
 )
 
@@ -85,6 +93,13 @@ except Exception:
 # =========================
 # 配置对象
 # =========================
+@lru_cache(maxsize=8)
+def _load_yaml_cached(path_str: str, mtime_ns: int, size: int) -> dict:
+    """按 (路径, mtime_ns, 文件大小) 缓存 YAML 解析结果；文件被修改后自动重新解析"""
+    with open(path_str, "r", encoding="utf-8") as f:
+        return yaml.load(f, Loader=_SafeLoader) or {}
+
+
 @dataclass
 class FetchConfig:
     """数据获取配置（可由 YAML 加载）。"""
@@ -109,11 +124,14 @@ class FetchConfig:
     def from_yaml(cls, config_path: str | Path) -> "FetchConfig":
         """从 YAML 加载配置，不存在则使用默认。"""
         p = Path(config_path)
-        if not p.exists():
+        try:
+            st = p.stat()
+        except OSError:
             logger.warning("未找到数据提供商配置 %s，使用默认值。", p)
             return cls()
         try:
-            data = yaml.safe_load(p.read_text(encoding="utf-8")) or {}
+            # 深拷贝：配置对象持有的嵌套字典不与缓存共享
+            data = copy.deepcopy(_load_yaml_cached(str(p), st.st_mtime_ns, st.st_size))
             return cls(
                 provider_priority=data.get("provider_priority", cls().provider_priority),
                 provider_configs=data.get("provider_configs", {}),
@@ -168,7 +186,8 @@ class DataFetcher:
 
     def _cache_key(self, provider: str, symbol: str, start: str, end: str,
                    freq: str, adjust: str) -> str:
-        return f"{provider}:{symbol}:{start}:{end}:{freq}:{adjust}"
+        # 复权口径并入 provider 段，沿用 cache.py 的统一键规则（含后缀与文件名清洗）
+        return make_ohlcv_cache_key(symbol, start, end, freq, f"{provider}-{adjust}")
 
     def _log_data_quality(self, merged_df: pd.DataFrame, by_provider_rows: Dict[str, int]) -> None:
         """记录合并结果的质量信息（缺失补行数、各来源占比等）。"""
@@ -191,6 +210,24 @@ class DataFetcher:
         except Exception:
             logger.debug("记录合并元信息失败。")
 
+    # ---------- 缓存读写（故障按未命中处理）----------
+    def _cache_get(self, key: str, freq: str, symbol: str) -> Optional[pd.DataFrame]:
+        """读缓存；I/O 或解析失败上报并视为未命中，继续走数据源（编程错误照常抛出）"""
+        try:
+            return get_df_if_fresh(key, max_age_seconds=self.cfg.cache_ttl_hours.get(freq, 1) * 3600)
+        except CACHE_IO_ERRORS as e:
+            logger.warning("读取缓存失败，按未命中处理: %s err=%s", key, e)
+            report_error(CacheError("读取缓存失败", cache_operation="get", symbol=symbol, root_cause=e))
+            return None
+
+    def _cache_put(self, key: str, df: pd.DataFrame, symbol: str) -> None:
+        """写缓存；I/O 失败只上报，不影响本次返回"""
+        try:
+            put_df(key, df)
+        except CACHE_IO_ERRORS as e:
+            logger.warning("写入缓存失败: %s err=%s", key, e)
+            report_error(CacheError("写入缓存失败", cache_operation="put", symbol=symbol, root_cause=e))
+
     # ---------- 核心能力：按优先级拉取并合并 ----------
     def get_ohlcv(self,
                   symbol: str,
@@ -210,7 +247,7 @@ class DataFetcher:
         # 先看最终合并缓存（以合并后的 key 命名）
         final_key = self._cache_key("merged", internal, start, end, freq, adjust)
         if self.cfg.enable_cache:
-            hit = cache_ohlcv_get(final_key, ttl_hours=self.cfg.cache_ttl_hours.get(freq, 1))
+            hit = self._cache_get(final_key, freq, internal)
             if hit is not None and isinstance(hit, pd.DataFrame) and not hit.empty:
                 logger.info("缓存命中（合并结果）: %s", final_key)
                 return hit.copy()
@@ -228,14 +265,14 @@ class DataFetcher:
             ck = self._cache_key(name, internal, start, end, freq, adjust)
             df = None
             if self.cfg.enable_cache:
-                df = cache_ohlcv_get(ck, ttl_hours=self.cfg.cache_ttl_hours.get(freq, 1))
+                df = self._cache_get(ck, freq, internal)
 
             if df is None:
                 try:
                     df = prov.fetch_ohlcv(internal, start, end, freq=freq, adjust=adjust)
                     # 单源缓存
                     if self.cfg.enable_cache and isinstance(df, pd.DataFrame) and not df.empty:
-                        cache_ohlcv_put(ck, df)
+                        self._cache_put(ck, df, internal)
                 except Exception as e:
                     # 记录并继续下一个源
                     ctx = ErrorContext(provider=name, symbol=internal, endpoint="fetch_ohlcv")
@@ -267,7 +304,7 @@ class DataFetcher:
 
         # 合并结果写缓存
         if self.cfg.enable_cache:
-            cache_ohlcv_put(final_key, merged_df)
+            self._cache_put(final_key, merged_df, internal)
 
         logger.info("get_ohlcv 完成: symbol=%s rows=%s cost=%.3fs",
                     internal, merged_df.shape[0], time.time() - t0)
@@ -46,6 +46,7 @@
 
 from __future__ import annotations
 import re
+from functools import lru_cache
 from typing import Optional, Tuple
 import pandas as pd
 import exchange_calendars as xcals
@@ -247,8 +248,6 @@ def get_sessions_index(start: str | pd.Timestamp,
       exchange_calendars 的 sessions_in_range 要求传入“无时区（tz-naive）”的日期；
       因此这里显式去掉任何可能携带的时区信息，并只保留“日期”。
     """
-    cal = xcals.get_calendar(calendar_name)
-
     # —— 将输入统一为“无时区 + 日期”的 Timestamp ——
     def _to_naive_day(x) -> pd.Timestamp:
         ts = pd.Timestamp(x)
@@ -257,8 +256,19 @@ def get_sessions_index(start: str | pd.Timestamp,
             ts = ts.tz_localize(None)
         return ts.normalize()
 
-    start_naive = _to_naive_day(start)
-    end_naive   = _to_naive_day(end)
+    # 浅拷贝：共享底层只读数据（不复制日期数组），但 name 等元数据各自独立，调用方修改不会污染缓存
+    return _sessions_in_range(_to_naive_day(start), _to_naive_day(end), calendar_name).copy()
+
+
+@lru_cache(maxsize=32)
+def _sessions_in_range(start_naive: pd.Timestamp,
+                       end_naive: pd.Timestamp,
+                       calendar_name: str) -> pd.DatetimeIndex:
+    """
+    按 (起, 止, 日历) 缓存交易日索引：批量导出/取数时各标的共用同一区间，只解析一次日历。
+    返回的是缓存中的同一对象（name 等属性可被改写），不要直接交给调用方，经 get_sessions_index 取用。
+    """
+    cal = xcals.get_calendar(calendar_name)
 
     # —— 生成交易日会话区间（传入必须为 tz-naive）——
     sessions = cal.sessions_in_range(start_naive, end_naive)
@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+"""
+生产环境 WSGI 入口（gunicorn + gevent）
+
+    gunicorn -k gevent -w 1 --worker-connections 1000 -b 0.0.0.0:5000 backend.wsgi:app
+
+- 必须在导入任何网络库之前打 gevent 补丁，行情拉取（requests/akshare）才会在等待 I/O 时让出协程
+- /trades/*、/paper/* 的耗时主要在数据拉取的网络等待上，由 gevent 协程并发承载
+- 纸上交易状态保存在进程内存中，多 worker 会各自持有一份；默认 1 个 worker
+"""
+from gevent import monkey
+monkey.patch_all()
+
+from backend.app import app  # noqa: E402
@@ -20,6 +20,14 @@ import shutil
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import time
 
+# 可选：pyarrow 的 Parquet 列式输出
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
 # 配置日志
 logger = logging.getLogger(__name__)
 
@@ -35,7 +43,8 @@ class ZiplineCsvWriter:
                  output_dir: Union[str, Path],
                  data_fetcher=None,
                  batch_size: int = 50,
-                 max_workers: int = 4):
+                 max_workers: int = 4,
+                 output_format: str = 'csv'):
         """
         初始化Zipline CSV生成器
         
@@ -44,7 +53,16 @@ class ZiplineCsvWriter:
             data_fetcher: 数据获取器实例，如果为None则使用默认获取器
             batch_size: 批处理大小
             max_workers: 最大并发工作线程数
+            output_format: 输出格式，'csv'（Zipline csvdir 默认）或 'parquet'（snappy 压缩列式存储，需要 pyarrow）
         """
+        if output_format not in ('csv', 'parquet'):
+            raise ValueError(f"不支持的输出格式: {output_format}")
+        if output_format == 'parquet' and not HAS_PYARROW:
+            raise ImportError("输出 parquet 需要安装 pyarrow")
+        
+        self.output_format = output_format
+        self.file_suffix = f".{output_format}"
+        
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
         
@@ -363,7 +381,7 @@ class ZiplineCsvWriter:
         """生成输出文件路径"""
         # 清理文件名，替换不合法字符
         safe_symbol = symbol.replace('/', '_').replace('\\', '_').replace('.', '_')
-        return self.output_dir / f"{safe_symbol}.csv"
+        return self.output_dir / f"{safe_symbol}{self.file_suffix}"
     
     def _convert_to_zipline_format(self, data: pd.DataFrame, symbol: str) -> pd.DataFrame:
         """转换数据为Zipline格式"""
@@ -500,10 +518,16 @@ class ZiplineCsvWriter:
         }
     
     def _write_csv_file(self, data: pd.DataFrame, file_path: Path):
-        """写入CSV文件"""
+        """写入CSV文件（output_format='parquet' 时写入 Parquet）"""
         # 确保输出目录存在
         file_path.parent.mkdir(parents=True, exist_ok=True)
         
+        if self.output_format == 'parquet':
+            table = pa.Table.from_pandas(data, preserve_index=False)
+            pq.write_table(table, str(file_path.with_suffix('.parquet')), compression='snappy')
+            logger.debug(f"Parquet文件已写入: {file_path}")
+            return
+        
         # 写入CSV，使用Zipline兼容的格式
         data.to_csv(
             file_path,
@@ -567,7 +591,7 @@ class ZiplineCsvWriter:
         Returns:
             Dict[str, Any]: 更新结果
         """
-        csv_files = list(self.output_dir.glob("*.csv"))
+        csv_files = list(self.output_dir.glob(f"*{self.file_suffix}"))
         
         if not csv_files:
             logger.info("输出目录中没有找到CSV文件")
@@ -603,7 +627,7 @@ class ZiplineCsvWriter:
         stats = self.stats.copy()
         
         # 添加目录信息
-        csv_files = list(self.output_dir.glob("*.csv"))
+        csv_files = list(self.output_dir.glob(f"*{self.file_suffix}"))
         stats['total_csv_files'] = len(csv_files)
         stats['output_directory'] = str(self.output_dir)
         
@@ -615,7 +639,7 @@ class ZiplineCsvWriter:
     
     def validate_output_directory(self) -> Dict[str, Any]:
         """验证输出目录状态"""
-        csv_files = list(self.output_dir.glob("*.csv"))
+        csv_files = list(self.output_dir.glob(f"*{self.file_suffix}"))
         
         validation_result = {
             'directory_exists': self.output_dir.exists(),
@@ -648,6 +672,12 @@ class ZiplineCsvWriter:
             # 检查文件完整性
             for csv_file in csv_files[:10]:  # 只检查前10个文件
                 try:
+                    if self.output_format == 'parquet':
+                        # 只读文件元数据
+                        meta = pq.read_metadata(csv_file)
+                        if meta.num_rows == 0 or 'date' not in meta.schema.names:
+                            validation_result['corrupted_files'].append(csv_file.name)
+                        continue
                     df = pd.read_csv(csv_file, nrows=1)  # 只读第一行
                     if df.empty or 'date' not in df.columns:
                         validation_result['corrupted_files'].append(csv_file.name)
@@ -669,7 +699,7 @@ class ZiplineCsvWriter:
         Returns:
             Dict[str, Any]: 清理结果
         """
-        csv_files = list(self.output_dir.glob("*.csv"))
+        csv_files = list(self.output_dir.glob(f"*{self.file_suffix}"))
         files_to_delete = []
         
         current_time = datetime.now()
@@ -258,8 +258,12 @@ start_backend() {
     cd "$PROJECT_ROOT"
     source "$VENV_DIR/bin/activate"
     
-    # 检查是否有app.py文件
-    if [ -f "$BACKEND_DIR/app.py" ]; then
+    # 优先使用 gunicorn + gevent（I/O 密集接口并发），否则回退到开发服务器
+    if [ -f "$BACKEND_DIR/wsgi.py" ] && python -c "import gunicorn, gevent" > /dev/null 2>&1; then
+        # 纸上交易状态在进程内，worker 数默认 1，由 gevent 协程承载并发
+        nohup gunicorn -k gevent -w ${BACKEND_WORKERS:-1} --worker-connections 1000 \
+            -b 0.0.0.0:$BACKEND_PORT backend.wsgi:app > "$LOG_DIR/backend.log" 2>&1 &
+    elif [ -f "$BACKEND_DIR/app.py" ]; then
         cd "$BACKEND_DIR"
         nohup python app.py > "$LOG_DIR/backend.log" 2>&1 &
     else
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+批量接口一致性测试
+---------------------------------
+校验批量版与逐只调用的结果逐项一致（浮点按位相等）：
+  1) entry_signals.evaluate_signals_batch  vs  evaluate_signal
+     - 四种 mode、不等长 K 线（按长度分组堆叠）、含不带 ohlcv 的条目（走离线 stub）
+  2) RiskManager.evaluate_trade_gates_batch  vs  evaluate_trade_gates
+     - 不同板块 / 有无 price
+
+运行方式（项目根目录）：
+  export PYTHONPATH=$(pwd)
+  python tests/step_tests/run_batch_parity_tests.py
+"""
+
+import math
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from backend.core.entry_signals import evaluate_signal, evaluate_signals_batch
+from backend.core.risk_manager import RiskManager
+
+MODES = ("breakout", "pullback", "reversal", "follow")
+
+
+def _print_pass(name, extra=""):
+    msg = f"[PASS] {name}"
+    if extra:
+        msg += f" {extra}"
+    print(msg)
+
+
+def _print_fail(name, extra=""):
+    msg = f"[FAIL] {name}"
+    if extra:
+        msg += f" - {extra}"
+    print(msg)
+    sys.exit(1)
+
+
+def _same(a, b) -> bool:
+    """递归比较；NaN 与 NaN 视为相等，其余浮点要求完全相等"""
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(_same(a[k], b[k]) for k in a)
+    if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+        return len(a) == len(b) and all(_same(x, y) for x, y in zip(a, b))
+    if isinstance(a, float) and isinstance(b, float) and math.isnan(a) and math.isnan(b):
+        return True
+    return a == b
+
+
+def _random_ohlcv(rng: np.random.Generator, n: int) -> dict:
+    """随机游走日线（t/o/h/l/c/v 字典，与接口 payload 相同）"""
+    t = pd.bdate_range("2024-01-01", periods=n).strftime("%Y-%m-%d").tolist()
+    close = 10.0 * np.cumprod(1 + rng.normal(0.002, 0.02, n))
+    open_ = close * (1 + rng.normal(0, 0.005, n))
+    high = np.maximum(open_, close) * (1 + rng.uniform(0, 0.01, n))
+    low = np.minimum(open_, close) * (1 - rng.uniform(0, 0.01, n))
+    vol = rng.integers(1000, 5000, n)
+    return {"t": t, "o": open_.tolist(), "h": high.tolist(), "l": low.tolist(),
+            "c": close.tolist(), "v": vol.tolist()}
+
+
+def _signal_payloads(rng: np.random.Generator) -> list:
+    payloads = []
+    for i, n in enumerate([30, 45, 60, 30, 45, 60, 80, 30, 21, 60]):
+        for mode in MODES:
+            p = {"symbol": f"S{i:03d}", "mode": mode, "ohlcv": _random_ohlcv(rng, n)}
+            if i % 3 == 0:
+                p["intraday"] = {"first2h_vol_ratio": float(rng.uniform(0.3, 0.8)),
+                                 "close_spike_ratio": float(rng.uniform(0.05, 0.3))}
+            payloads.append(p)
+    # 不带 ohlcv：走离线 stub K 线
+    payloads.append({"symbol": "STUB", "mode": "breakout"})
+    payloads.append({"symbol": "STUB", "mode": "pullback", "ohlcv": None})
+    return payloads
+
+
+def test_signals_batch_parity():
+    rng = np.random.default_rng(20240101)
+    payloads = _signal_payloads(rng)
+    batch = evaluate_signals_batch(payloads)
+    if len(batch) != len(payloads):
+        _print_fail("signals.batch_len", f"期望 {len(payloads)}，得到 {len(batch)}")
+    for i, (p, got) in enumerate(zip(payloads, batch)):
+        want = evaluate_signal(p)
+        if not _same(want, got):
+            _print_fail("signals.batch_parity", f"#{i} symbol={p['symbol']} mode={p['mode']}")
+    n_pass = sum(bool(r.get("pass")) for r in batch)
+    _print_pass("signals.batch_parity", f"payloads={len(payloads)} pass={n_pass}")
+
+
+# 板块轮动数据用固定的离线值：fetcher 中的实现依赖网络/按分钟变化的随机数，
+# 会让逐只调用与批量调用拿到不同输入（与被测的批量逻辑无关）
+_SECTOR_STUBS = {
+    "get_sector_strength": lambda sector: {"sector": sector, "rank": 3, "rank_change": 6, "score": 0.82},
+    "get_sector_breadth": lambda sector: {"sector": sector, "pct": 0.63},
+    "get_sector_time_continuation": lambda sector: {"sector": sector, "days": 2},
+    "get_sector_capital_ratio": lambda sector: {"sector": sector, "ratio": 0.58},
+    "get_sector_endorsements": lambda sector: {"sector": sector, "lupang": True, "etf_creation": True,
+                                               "northbound": True, "count": 3},
+    "get_hidden_funds": lambda sector: {"sector": sector, "score": 0.72},
+}
+
+
+def test_gates_batch_parity():
+    from backend.core import sector_rotation
+    orig = {name: getattr(sector_rotation, name) for name in _SECTOR_STUBS}
+    for name, fn in _SECTOR_STUBS.items():
+        setattr(sector_rotation, name, fn)
+    try:
+        _check_gates_batch_parity()
+    finally:
+        for name, fn in orig.items():
+            setattr(sector_rotation, name, fn)
+
+
+def _check_gates_batch_parity():
+    rm = RiskManager.load_from_config()
+    payloads = [
+        {"symbol": "002415", "sector": "AI", "price": 11.95},
+        {"symbol": "002415", "sector": "AI"},
+        {"symbol": "600000", "sector": "银行", "price": 8.2},
+        {"symbol": "300750", "sector": "新能源", "price": 0},
+        {"symbol": "000001"},
+        {},
+    ]
+    batch = rm.evaluate_trade_gates_batch(payloads)
+    if len(batch) != len(payloads):
+        _print_fail("gates.batch_len", f"期望 {len(payloads)}，得到 {len(batch)}")
+    for i, (p, got) in enumerate(zip(payloads, batch)):
+        want = rm.evaluate_trade_gates(p)
+        if not _same(want, got):
+            _print_fail("gates.batch_parity", f"#{i} payload={p}")
+    _print_pass("gates.batch_parity", f"payloads={len(payloads)}")
+
+
+def main():
+    test_signals_batch_parity()
+    test_gates_batch_parity()
+    print("\n=== SUMMARY ===")
+    print("ALL TESTS PASSED")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except SystemExit:
+        raise
+    except Exception as e:
+        _print_fail("unexpected", repr(e))
@@ -9,6 +9,7 @@
 4. 统计信息功能
 5. 便捷接口
 6. 多提供商支持
+7. 多标的合并缓存（put_df_multi / get_df_multi_if_fresh）
 """
 
 import os
@@ -30,7 +31,8 @@ from backend.data.cache import (
     cache_path_for, 
     get_df_if_fresh, 
     put_df,
-    CACHE_ROOT
+    CACHE_ROOT,
+    CACHE_SUFFIX
 )
 
 # 尝试导入增强功能（如果已添加）
@@ -74,7 +76,7 @@ def test_cache_key_generation():
     
     # 基本键生成
     key = make_ohlcv_cache_key("TEST001", "2024-01-01", "2024-01-10", "1d", "akshare")
-    expected = "ohlcv_akshare_TEST001_2024-01-01_2024-01-10_1d.csv"
+    expected = f"ohlcv_akshare_TEST001_2024-01-01_2024-01-10_1d{CACHE_SUFFIX}"
     assert key == expected, f"缓存键不匹配: {key} != {expected}"
     
     # 测试特殊字符清理
@@ -180,7 +182,8 @@ def test_file_path_generation():
     
     # 检查目录会被自动创建
     # 这里不实际创建，只检查逻辑
-    assert path.parent.name == "ohlcv", "父目录应为 ohlcv"
+    assert path.parent.parent.name == "ohlcv", "分片目录应位于 ohlcv 下"
+    assert len(path.parent.name) == 2, "分片目录名应为两位十六进制"
     
     print("✓ 文件路径生成正常")
 
@@ -411,6 +414,49 @@ def test_multi_provider():
             cache_module.CACHE_ROOT = original_cache_root
 
 
+def test_multi_symbol_cache():
+    """测试多标的合并缓存（put_df_multi / get_df_multi_if_fresh）"""
+    print("测试11: 多标的合并缓存")
+    import backend.data.cache as cache_module
+    if not cache_module.HAS_PYARROW:
+        print("✓ 跳过（未安装 pyarrow）")
+        return
+    
+    original_cache_root = cache_module.CACHE_ROOT
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache_module.CACHE_ROOT = Path(tmp_dir)
+        
+        try:
+            frames = {
+                "MS001": create_test_data("MS001", 5, 10.0),
+                "MS002": create_test_data("MS002", 8, 20.0),
+                "MS003": create_test_data("MS003", 3, 30.0),
+            }
+            key = make_ohlcv_cache_key("SECTOR_AI", "2024-01-01", "2024-01-10", "1d", "multi")
+            cache_module.put_df_multi(key, frames)
+            
+            # 按 symbol 读回单个标的：与写入的帧一致
+            for sym, df in frames.items():
+                got = cache_module.get_df_multi_if_fresh(key, max_age_seconds=3600, symbol=sym)
+                assert got is not None, f"{sym} 读取失败"
+                pd.testing.assert_frame_equal(df, got, check_dtype=False, check_freq=False)
+            
+            # 不指定 symbol：全部行，symbol 列为 Categorical
+            full = cache_module.get_df_multi_if_fresh(key, max_age_seconds=3600)
+            assert len(full) == sum(len(df) for df in frames.values()), "合并行数不符"
+            assert isinstance(full["symbol"].dtype, pd.CategoricalDtype), "symbol 列应为 Categorical"
+            assert list(full["symbol"].cat.categories) == list(frames), "symbol 类别不符"
+            
+            # 过期读取返回 None
+            assert cache_module.get_df_multi_if_fresh(key, max_age_seconds=-1, symbol="MS001") is None, "过期缓存应返回 None"
+            
+            print("✓ 多标的合并缓存正常")
+            
+        finally:
+            cache_module.CACHE_ROOT = original_cache_root
+
+
 def main():
     print("开始增强版缓存模块测试...")
     print(f"增强功能可用: {HAS_ENHANCEMENTS}")
@@ -423,6 +469,7 @@ def main():
         test_file_path_generation,
         test_data_format_consistency,
         test_missing_file_handling,
+        test_multi_symbol_cache,
     ]
     
     passed = 0
@@ -454,7 +501,7 @@ def main():
     print(f"\n=== 测试结果 ===")
     print(f"通过: {passed}")
     print(f"失败: {failed}")
-    total_tests = 6 + (4 if HAS_ENHANCEMENTS else 0)
+    total_tests = len(basic_tests) + (4 if HAS_ENHANCEMENTS else 0)
     print(f"总计: {total_tests}")
     
     if failed == 0:
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Zipline 导出：列式中间缓存（parquet / feather）流程测试
+---------------------------------
+流程：cache_format 非 csv + final_for_ingest=False 导出 → 只生成中间缓存
+      → validate_zipline_compatibility 校验中间缓存（非 CSV 分支）
+      → materialize_for_ingest 生成 ingest CSV → 再次校验 CSV，且与缓存内容一致
+
+数据源用离线构造的日线替换 zipline_export.get_ohlcv，不依赖网络/真实 Provider。
+
+运行方式（项目根目录）：
+  export PYTHONPATH=$(pwd)
+  python tests/step_tests/run_zipline_export_format_tests.py
+"""
+
+import sys
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from backend.backtest import zipline_export
+from backend.backtest.zipline_export import ZiplineExporter, HAS_PYARROW
+from backend.data.normalize import get_sessions_index
+
+START, END = "2024-01-02", "2024-02-29"
+SYMBOLS = ["600000.XSHG", "000001.XSHE"]
+
+
+def _print_pass(name, extra=""):
+    msg = f"[PASS] {name}"
+    if extra:
+        msg += f" {extra}"
+    print(msg)
+
+
+def _print_fail(name, extra=""):
+    msg = f"[FAIL] {name}"
+    if extra:
+        msg += f" - {extra}"
+    print(msg)
+    sys.exit(1)
+
+
+def _fake_get_ohlcv(symbol, start, end, freq="1d", adjust="pre"):
+    """按交易日历生成递增价格的日线（high>=max(open,close)，low<=min(open,close)）"""
+    ses = get_sessions_index(start, end, "XSHG")
+    n = len(ses)
+    seed = sum(map(ord, symbol))
+    close = 10.0 + seed % 7 + np.arange(n) * 0.05
+    return pd.DataFrame({
+        "open": close - 0.02,
+        "high": close + 0.10,
+        "low": close - 0.10,
+        "close": close,
+        "volume": 1000.0 + np.arange(n) * 10,
+    }, index=ses)
+
+
+def _run_format(fmt: str, out_dir: Path):
+    suffix = zipline_export._CACHE_SUFFIX[fmt]
+    exporter = ZiplineExporter(output_dir=str(out_dir), cache_format=fmt)
+
+    # 1) 只写中间缓存，不生成 CSV
+    for sym in SYMBOLS:
+        if not exporter.export_single_symbol(sym, START, END, final_for_ingest=False):
+            _print_fail(f"{fmt}.export", sym)
+    caches = sorted(out_dir.glob(f"*{suffix}"))
+    if len(caches) != len(SYMBOLS) or list(out_dir.glob("*.csv")):
+        _print_fail(f"{fmt}.cache_only", f"缓存={[p.name for p in caches]} csv={list(out_dir.glob('*.csv'))}")
+    _print_pass(f"{fmt}.cache_only", f"files={len(caches)}")
+
+    # 2) 无 CSV 时校验走中间缓存分支
+    if not exporter.validate_zipline_compatibility():
+        _print_fail(f"{fmt}.validate_cache")
+    _print_pass(f"{fmt}.validate_cache")
+
+    # 3) 物化为 ingest CSV，并与缓存内容一致
+    n = exporter.materialize_for_ingest()
+    if n != len(SYMBOLS):
+        _print_fail(f"{fmt}.materialize", f"期望 {len(SYMBOLS)} 个，得到 {n}")
+    for cache_file in caches:
+        csv_file = cache_file.with_suffix(".csv")
+        if not csv_file.exists():
+            _print_fail(f"{fmt}.materialize", f"缺少 {csv_file.name}")
+        a = exporter._read_exported(cache_file)
+        b = pd.read_csv(csv_file, dtype={"date": str})
+        if list(b.columns) != list(a.columns) or not a["date"].equals(b["date"]):
+            _print_fail(f"{fmt}.roundtrip", f"{csv_file.name} 列或日期不一致")
+        num = ["open", "high", "low", "close", "volume"]
+        if not np.allclose(a[num].to_numpy(float), b[num].to_numpy(float), rtol=0, atol=1e-4):
+            _print_fail(f"{fmt}.roundtrip", f"{csv_file.name} 数值不一致")
+    _print_pass(f"{fmt}.materialize", f"csv={n}")
+
+    # 4) 生成 CSV 后校验走 CSV 分支
+    if not exporter.validate_zipline_compatibility():
+        _print_fail(f"{fmt}.validate_csv")
+    _print_pass(f"{fmt}.validate_csv")
+
+
+def main():
+    if not HAS_PYARROW:
+        print("[SKIP] 未安装 pyarrow，列式缓存格式不可用")
+        return
+
+    orig = zipline_export.get_ohlcv
+    zipline_export.get_ohlcv = _fake_get_ohlcv
+    tmp = Path(tempfile.mkdtemp(prefix="zl_fmt_"))
+    try:
+        for fmt in ("parquet", "feather"):
+            _run_format(fmt, tmp / fmt)
+    finally:
+        zipline_export.get_ohlcv = orig
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    print("\n=== SUMMARY ===")
+    print("ALL TESTS PASSED")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except SystemExit:
+        raise
+    except Exception as e:
+        _print_fail("unexpected", repr(e))